@@ -0,0 +1,578 @@
+"""
+Benchmarks for the PWI4 clients: command latency, status throughput,
+transports, parsing cost and memory.
+
+With no --url a local LD_PWI_Simulator is started to run against:
+    python LD_Benchmark.py --output run.json
+    python LD_Benchmark.py --output new.json --compare run.json
+or point it at a real PWI4 (or anything else speaking its HTTP API):
+    python LD_Benchmark.py commands --url http://127.0.0.1:8220 -n 200
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import math
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+
+import requests
+
+import LD_Planewave
+import LD_Planewave_Async
+import LD_PWI_Simulator
+import LD_PWI_Status
+import LD_Transport
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "planewave_python"))
+import pwi4_client
+
+log = logging.getLogger(__name__)
+
+# A /status reply as PWI4 sends it, for benchmarks that don't need a server.
+SAMPLE_STATUS = b"""pwi4.version=4.0.13 beta 12
+site.latitude_degs=51.4585
+site.longitude_degs=-2.6021
+site.height_meters=51
+site.lmst_hours=14.1254093842
+mount.is_connected=true
+mount.geometry=0
+mount.ra_apparent_hours=14.1263377
+mount.dec_apparent_degs=51.4585312
+mount.ra_j2000_hours=14.1119843
+mount.dec_j2000_degs=51.5506731
+mount.target_ra_apparent_hours=14.1263377
+mount.target_dec_apparent_degs=51.4585312
+mount.altitude_degs=89.9986271
+mount.azimuth_degs=179.9813654
+mount.is_slewing=false
+mount.is_tracking=true
+mount.field_angle_here_degs=-0.0186346
+mount.field_angle_at_target_degs=-0.0186346
+mount.field_angle_rate_at_target_degs_per_sec=0.0041782
+mount.path_angle_at_target_degs=0
+mount.path_angle_rate_at_target_degs_per_sec=0
+mount.axis0.is_enabled=true
+mount.axis0.rms_error_arcsec=0.0512
+mount.axis0.dist_to_target_arcsec=0.0031
+mount.axis0.servo_error_arcsec=0.0214
+mount.axis0.position_degs=179.9813654
+mount.axis1.is_enabled=true
+mount.axis1.rms_error_arcsec=0.0473
+mount.axis1.dist_to_target_arcsec=0.0022
+mount.axis1.servo_error_arcsec=-0.0118
+mount.axis1.position_degs=89.9986271
+mount.model.filename=DefaultModel.pxp
+mount.model.num_points_total=42
+mount.model.num_points_enabled=40
+mount.model.rms_error_arcsec=11.362
+focuser.is_connected=true
+focuser.is_enabled=true
+focuser.position=10340.5
+focuser.is_moving=false
+rotator.is_connected=true
+rotator.is_enabled=true
+rotator.mech_position_degs=120.442
+rotator.field_angle_degs=120.423
+rotator.is_moving=false
+rotator.is_slewing=false
+m3.port=1
+autofocus.is_running=false
+autofocus.success=true
+autofocus.best_position=10338.2
+autofocus.tolerance=4.1
+"""
+
+
+def Tracking_Statuses(count=100, interval=0.1):
+    """
+    count /status bodies like SAMPLE_STATUS, interval seconds apart while
+    tracking: the LST, the mount's position, field angle and servo errors
+    move on from one to the next, as they do between real polls.
+    """
+    base = dict(line.split("=", 1) for line in SAMPLE_STATUS.decode().splitlines())
+    bodies = []
+    for i in range(count):
+        t = i * interval
+        values = dict(base)
+        altitude = f"{89.9986271 - 0.0041 * t:.7f}"
+        azimuth = f"{179.9813654 + 0.0042 * t:.7f}"
+        values["site.lmst_hours"] = f"{14.1254093842 + t * 1.00273790935 / 3600:.10f}"
+        values["mount.altitude_degs"] = values["mount.axis1.position_degs"] = altitude
+        values["mount.azimuth_degs"] = values["mount.axis0.position_degs"] = azimuth
+        values["mount.field_angle_here_degs"] = f"{-0.0186346 + 0.0041782 * t:.7f}"
+        for axis in ("axis0", "axis1"):
+            values[f"mount.{axis}.servo_error_arcsec"] = f"{0.02 * math.sin(i):.4f}"
+            values[f"mount.{axis}.dist_to_target_arcsec"] = f"{abs(0.003 * math.cos(i)):.4f}"
+        bodies.append("\n".join(f"{key}={value}" for key, value in values.items()).encode())
+    return bodies
+
+
+def Original_Update(status, response):
+    """
+    LD_PWI_Status.Update as it was before the table-driven parser, every
+    value converted by its property setter on every update. Kept as the
+    reference point for Bench_Parse.
+    """
+    string_Status = {}
+    for line in response.splitlines():
+        dotted_Keys, value = line.decode().split("=")
+        string_Status[dotted_Keys] = value
+
+    status.version = string_Status["pwi4.version"]
+
+    status.site.latitude = string_Status["site.latitude_degs"]
+    status.site.longitude = string_Status["site.longitude_degs"]
+    status.site.height = string_Status["site.height_meters"]
+    status.site.lst = string_Status["site.lmst_hours"]
+
+    status.mount.is_connected = string_Status["mount.is_connected"]
+    status.mount.geometry = string_Status["mount.geometry"]
+    status.mount.ra_apparent = string_Status["mount.ra_apparent_hours"]
+    status.mount.dec_apparent = string_Status["mount.dec_apparent_degs"]
+    status.mount.ra_j2000 = string_Status["mount.ra_j2000_hours"]
+    status.mount.dec_j2000 = string_Status["mount.dec_j2000_degs"]
+    status.mount.target_ra_apparent = string_Status["mount.target_ra_apparent_hours"]
+    status.mount.target_dec_apparent = string_Status["mount.target_dec_apparent_degs"]
+    status.mount.altitude = string_Status["mount.altitude_degs"]
+    status.mount.azimuth = string_Status["mount.azimuth_degs"]
+    status.mount.is_slewing = string_Status["mount.is_slewing"]
+    status.mount.is_tracking = string_Status["mount.is_tracking"]
+    status.mount.field_angle_here = string_Status["mount.field_angle_here_degs"]
+    status.mount.field_angle_target = string_Status["mount.field_angle_at_target_degs"]
+    status.mount.field_angle_rate_target = string_Status["mount.field_angle_rate_at_target_degs_per_sec"]
+    status.mount.path_angle_target = string_Status["mount.path_angle_at_target_degs"]
+    status.mount.path_angle_rate_target = string_Status["mount.path_angle_rate_at_target_degs_per_sec"]
+
+    status.mount.axis0.is_enabled = string_Status["mount.axis0.is_enabled"]
+    status.mount.axis0.rms_error = string_Status["mount.axis0.rms_error_arcsec"]
+    status.mount.axis0.dist_to_target = string_Status["mount.axis0.dist_to_target_arcsec"]
+    status.mount.axis0.servo_error = string_Status["mount.axis0.servo_error_arcsec"]
+    status.mount.axis0.position = string_Status["mount.axis0.position_degs"]
+
+    status.mount.axis1.is_enabled = string_Status["mount.axis1.is_enabled"]
+    status.mount.axis1.rms_error = string_Status["mount.axis1.rms_error_arcsec"]
+    status.mount.axis1.dist_to_target = string_Status["mount.axis1.dist_to_target_arcsec"]
+    status.mount.axis1.servo_error = string_Status["mount.axis1.servo_error_arcsec"]
+    status.mount.axis1.position = string_Status["mount.axis1.position_degs"]
+
+    status.mount.model.filename = string_Status["mount.model.filename"]
+    status.mount.model.n_points_total = string_Status["mount.model.num_points_total"]
+    status.mount.model.n_points_enabled = string_Status["mount.model.num_points_enabled"]
+    status.mount.model.rms_error = string_Status["mount.model.rms_error_arcsec"]
+
+    status.focuser.is_connected = string_Status["focuser.is_connected"]
+    status.focuser.is_enabled = string_Status["focuser.is_enabled"]
+    status.focuser.position = string_Status["focuser.position"]
+    status.focuser.is_moving = string_Status["focuser.is_moving"]
+
+    status.rotator.is_connected = string_Status["rotator.is_connected"]
+    status.rotator.is_enabled = string_Status["rotator.is_enabled"]
+    status.rotator.mech_position = string_Status["rotator.mech_position_degs"]
+    status.rotator.field_angle = string_Status["rotator.field_angle_degs"]
+    status.rotator.is_moving = string_Status["rotator.is_moving"]
+    status.rotator.is_slewing = string_Status["rotator.is_slewing"]
+
+    status.m3.port = string_Status["m3.port"]
+
+    status.autofocus.is_running = string_Status["autofocus.is_running"]
+    status.autofocus.success = string_Status["autofocus.success"]
+    status.autofocus.best_position = string_Status["autofocus.best_position"]
+    status.autofocus.tolerance = string_Status["autofocus.tolerance"]
+
+
+def Summarise(times):
+    """
+    Reduce a list of round trip times (seconds) to a dict of statistics
+    in milliseconds.
+    """
+    times_Ms = sorted(t * 1000 for t in times)
+    percentiles = statistics.quantiles(times_Ms, n=100, method="inclusive")
+    return {
+        "n": len(times_Ms),
+        "mean_ms": statistics.fmean(times_Ms),
+        "p50_ms": percentiles[49],
+        "p95_ms": percentiles[94],
+        "p99_ms": percentiles[98],
+        "max_ms": times_Ms[-1],
+        }
+
+
+def Time_Calls(func, n):
+    """
+    Call func() n times, return the list of how long each call took.
+    """
+    times = []
+    for _ in range(n):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def Bench_Session(base_Url, n=200):
+    """
+    Compare Status() round trips made with a bare requests.get (a new TCP
+    connection per call, how _SendMsg used to work) against the pooled
+    keep-alive session in LD_Planewave.
+    """
+    ip_Address, port = base_Url.rsplit(":", 1)
+    status_Url = f"{base_Url}/status"
+
+    bare = Time_Calls(lambda: requests.get(status_Url), n)
+
+    mount = LD_Planewave.LD_Planewave(ip_Address, port)
+    pooled = Time_Calls(mount.Status, n)
+    mount.Close()
+
+    return {
+        "bare_requests_get": Summarise(bare),
+        "keep_alive_session": Summarise(pooled),
+        }
+
+
+def Bench_Commands(base_Url, n=200):
+    """
+    Round trip latency percentiles for each command, through LD_Planewave
+    and through pwi4_client.PWI4.
+    """
+    ip_Address, port = base_Url.rsplit(":", 1)
+    host = ip_Address.split("//")[-1]
+
+    mount = LD_Planewave.LD_Planewave(ip_Address, port)
+    pwi4 = pwi4_client.PWI4(host, int(port))
+
+    commands = {
+        "LD_Planewave": {
+            "status": mount.Status,
+            "connect": mount.Connect,
+            "enable": lambda: mount.Enable(0),
+            "goto_alt_az": lambda: mount.Goto_AltAz(45, 180),
+            "tracking_on": mount.Tracking_On,
+            "stop": mount.Stop,
+            },
+        "pwi4_client.PWI4": {
+            "status": pwi4.status,
+            "connect": pwi4.mount_connect,
+            "enable": lambda: pwi4.mount_enable(0),
+            "goto_alt_az": lambda: pwi4.mount_goto_alt_az(45, 180),
+            "tracking_on": pwi4.mount_tracking_on,
+            "stop": pwi4.mount_stop,
+            },
+        }
+
+    report = {}
+    for client, client_Commands in commands.items():
+        for name, command in client_Commands.items():
+            report[f"{client} {name}"] = Summarise(Time_Calls(command, n))
+    mount.Close()
+    return report
+
+
+def Count_Calls(func, callers, duration):
+    """
+    Call func() from `callers` threads at once, as fast as possible, for
+    duration seconds. Returns the total calls per second.
+    """
+    counts = [0] * callers
+    stop = threading.Event()
+
+    def Caller(index):
+        while not stop.is_set():
+            func(index)
+            counts[index] += 1
+
+    threads = [threading.Thread(target=Caller, args=(i,)) for i in range(callers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - start)
+
+
+def Bench_Throughput(base_Url, concurrency=(1, 8), duration=2.0):
+    """
+    Sustained Status() calls per second with 1 and N callers at once: N
+    threads sharing one LD_Planewave, N threads with a PWI4 each, and N
+    tasks sharing one LD_Planewave_Async.
+    """
+    ip_Address, port = base_Url.rsplit(":", 1)
+    host = ip_Address.split("//")[-1]
+
+    async def Async_Rate(callers):
+        async with LD_Planewave_Async.LD_Planewave_Async(ip_Address, port,
+                                                         pool_Size=callers) as mount:
+            count = 0
+            deadline = time.perf_counter() + duration
+
+            async def Caller():
+                nonlocal count
+                while time.perf_counter() < deadline:
+                    await mount.Status()
+                    count += 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*[Caller() for _ in range(callers)])
+            return count / (time.perf_counter() - start)
+
+    report = {}
+    for callers in concurrency:
+        mount = LD_Planewave.LD_Planewave(ip_Address, port, pool_Size=callers)
+        rate = Count_Calls(lambda i: mount.Status(), callers, duration)
+        report[f"LD_Planewave x{callers}"] = {"callers": callers, "requests_per_sec": rate}
+        mount.Close()
+
+        clients = [pwi4_client.PWI4(host, int(port)) for _ in range(callers)]
+        rate = Count_Calls(lambda i: clients[i].status(), callers, duration)
+        report[f"pwi4_client.PWI4 x{callers}"] = {"callers": callers, "requests_per_sec": rate}
+
+        rate = asyncio.run(Async_Rate(callers))
+        report[f"LD_Planewave_Async x{callers}"] = {"callers": callers, "requests_per_sec": rate}
+
+    return report
+
+
+def Bench_Transports(base_Url, n=200, callers=8, duration=2.0):
+    """
+    Status() round trips and throughput through LD_Planewave (and
+    pwi4_client.PWI4) with each LD_Transport backend, to pick the quickest
+    for a deployment. The asyncio one goes through LD_Planewave_Async.
+    """
+    ip_Address, port = base_Url.rsplit(":", 1)
+    host = ip_Address.split("//")[-1]
+
+    async def Async_Times(mount):
+        times = []
+        for _ in range(n):
+            start = time.perf_counter()
+            await mount.Status()
+            times.append(time.perf_counter() - start)
+        return times
+
+    async def Async_Rate(mount):
+        count = 0
+        deadline = time.perf_counter() + duration
+
+        async def Caller():
+            nonlocal count
+            while time.perf_counter() < deadline:
+                await mount.Status()
+                count += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*[Caller() for _ in range(callers)])
+        return count / (time.perf_counter() - start)
+
+    async def Async_Bench():
+        async with LD_Planewave_Async.LD_Planewave_Async(ip_Address, port,
+                                                         pool_Size=callers) as mount:
+            return await Async_Times(mount), await Async_Rate(mount)
+
+    report = {}
+    for name in LD_Transport.TRANSPORTS:
+        mount = LD_Planewave.LD_Planewave(ip_Address, port, pool_Size=callers,
+                                          transport=name)
+        report[f"LD_Planewave {name}"] = Summarise(Time_Calls(mount.Status, n))
+        rate = Count_Calls(lambda i: mount.Status(), callers, duration)
+        report[f"LD_Planewave {name} x{callers}"] = {"callers": callers,
+                                                     "requests_per_sec": rate}
+        mount.Close()
+
+        transport = LD_Transport.Make_Transport(name, pool_Size=callers)
+        pwi4 = pwi4_client.PWI4(host, int(port), transport=transport)
+        report[f"pwi4_client.PWI4 {name}"] = Summarise(Time_Calls(pwi4.status, n))
+        transport.Close()
+
+    times, rate = asyncio.run(Async_Bench())
+    report["LD_Planewave_Async asyncio"] = Summarise(times)
+    report[f"LD_Planewave_Async asyncio x{callers}"] = {"callers": callers,
+                                                        "requests_per_sec": rate}
+
+    return report
+
+
+def Bench_Parse(n=20000):
+    """
+    CPU cost of turning a status body into an object once the reply has
+    arrived: LD_PWI_Status.Update (polling a tracking mount, with nothing
+    changed, and into a new object every time) against the original
+    Update and pwi4_client's status_text_to_dict + PWI4Status.__init__.
+    """
+    bodies = Tracking_Statuses()
+    status = LD_PWI_Status.LD_PWI_Status()
+    status.Update(bodies[-1])
+    start = time.perf_counter()
+    for i in range(n):
+        status.Update(bodies[i % len(bodies)])
+    per_Tracking = (time.perf_counter() - start) / n
+
+    status = LD_PWI_Status.LD_PWI_Status()
+    status.Update(SAMPLE_STATUS)
+    start = time.perf_counter()
+    for _ in range(n):
+        status.Update(SAMPLE_STATUS)
+    per_Update = (time.perf_counter() - start) / n
+
+    # Every poll a fresh object, no incremental updates.
+    start = time.perf_counter()
+    for _ in range(n):
+        LD_PWI_Status.LD_PWI_Status().Update(SAMPLE_STATUS)
+    per_Fresh = (time.perf_counter() - start) / n
+
+    status = LD_PWI_Status.LD_PWI_Status()
+    start = time.perf_counter()
+    for i in range(n):
+        Original_Update(status, bodies[i % len(bodies)])
+    per_Original = (time.perf_counter() - start) / n
+
+    pwi4 = pwi4_client.PWI4()
+    start = time.perf_counter()
+    for _ in range(n):
+        pwi4.parse_status(SAMPLE_STATUS)
+    per_PWI4 = (time.perf_counter() - start) / n
+
+    return {
+        "LD_PWI_Status.Update (tracking)": {"n": n, "mean_us": per_Tracking * 1e6},
+        "LD_PWI_Status.Update (unchanged)": {"n": n, "mean_us": per_Update * 1e6},
+        "LD_PWI_Status.Update (fresh)": {"n": n, "mean_us": per_Fresh * 1e6},
+        "Original LD_PWI_Status.Update": {"n": n, "mean_us": per_Original * 1e6},
+        "PWI4Status.__init__": {"n": n, "mean_us": per_PWI4 * 1e6},
+        }
+
+
+def Bench_Memory(n=10000):
+    """
+    Bytes of memory held per LD_PWI_Status snapshot (as published by the
+    poller), for working out how many can be kept for telemetry.
+    """
+    live = LD_PWI_Status.LD_PWI_Status()
+    live.Update(SAMPLE_STATUS)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+
+    snapshots = [live.Copy() for _ in range(n)]
+
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    held = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return {"LD_PWI_Status snapshot": {"n": n, "bytes_each": held / n}}
+
+
+def Print_Report(report):
+    for name, stats in report.items():
+        print(f"{name}:")
+        print("\t" + ", ".join(f"{k} = {v:.3f}" if isinstance(v, float) else f"{k} = {v}"
+                               for k, v in stats.items()))
+
+
+# The figure compared between runs, and whether bigger is better.
+HEADLINE_STATS = {"mean_ms": False, "mean_us": False, "bytes_each": False,
+                  "requests_per_sec": True}
+
+
+def Compare_Reports(old, new):
+    """
+    Print the headline figure of every result in both reports and how the
+    new run compares.
+    """
+    for group, results in new["results"].items():
+        for name, stats in results.items():
+            old_Stats = old["results"].get(group, {}).get(name)
+            if old_Stats is None:
+                continue
+            for stat, bigger_Better in HEADLINE_STATS.items():
+                if stat in stats and stat in old_Stats and old_Stats[stat]:
+                    ratio = stats[stat] / old_Stats[stat]
+                    better = ratio > 1 if bigger_Better else ratio < 1
+                    print(f"{name} {stat}: {old_Stats[stat]:.3f} -> {stats[stat]:.3f} "
+                          f"(x{ratio:.2f}, {'better' if better else 'worse'})")
+
+
+BENCHMARKS = ["session", "commands", "throughput", "transports", "parse", "memory"]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("benchmarks", nargs="*",
+                        help=f"Which of {', '.join(BENCHMARKS)} to run (default all)")
+    parser.add_argument("--url", default=None,
+                        help="Base URL of the PWI4 server (default: start a simulator)")
+    parser.add_argument("-n", type=int, default=200,
+                        help="Number of requests per latency measurement")
+    parser.add_argument("--callers", type=int, default=8,
+                        help="Concurrent callers for the throughput benchmark")
+    parser.add_argument("--duration", type=float, default=2.0,
+                        help="Seconds per throughput measurement")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Latency injected by the simulator (seconds)")
+    parser.add_argument("--output", help="Write the report to this JSON file")
+    parser.add_argument("--compare", help="Compare against an earlier JSON report")
+    args = parser.parse_args()
+    benchmarks = args.benchmarks or BENCHMARKS
+    for name in benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"Unknown benchmark {name}")
+
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+    simulator = None
+    base_Url = args.url
+    if base_Url is None:
+        simulator = LD_PWI_Simulator.LD_PWI_Simulator(port=0, latency=args.latency,
+                                                      auto_Connect=True)
+        simulator.Start()
+        base_Url = simulator.base_Url
+
+    results = {}
+    if "session" in benchmarks:
+        results["session"] = Bench_Session(base_Url, args.n)
+    if "commands" in benchmarks:
+        results["commands"] = Bench_Commands(base_Url, args.n)
+    if "throughput" in benchmarks:
+        results["throughput"] = Bench_Throughput(base_Url, (1, args.callers), args.duration)
+    if "transports" in benchmarks:
+        results["transports"] = Bench_Transports(base_Url, args.n, args.callers, args.duration)
+    if "parse" in benchmarks:
+        results["parse"] = Bench_Parse()
+    if "memory" in benchmarks:
+        results["memory"] = Bench_Memory()
+
+    if simulator is not None:
+        simulator.Stop()
+
+    for group, report in results.items():
+        print(f"===== {group} =====")
+        Print_Report(report)
+
+    full_Report = {
+        "meta": {
+            "time": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "url": args.url or "simulator",
+            "simulator_latency": args.latency if simulator else None,
+            "n": args.n,
+            },
+        "results": results,
+        }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(full_Report, f, indent=2)
+        log.info(f"Report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            Compare_Reports(json.load(f), full_Report)
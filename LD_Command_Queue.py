@@ -0,0 +1,244 @@
+import collections
+import concurrent.futures
+import logging
+import sys
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# The AXIS names /mount/offset accepts and what can be done to each, see
+# LD_Planewave.Mount_Offset.
+OFFSET_AXES = ("ra", "dec", "axis0", "axis1", "path", "transverse")
+ADD = "add_arcsec"
+SET_RATE = "set_rate_arcsec_per_sec"
+STOP_RATE = "stop_rate"
+RESET = "reset"
+
+
+def _Split_Offset_Key(key):
+    """
+    "axis0_add_arcsec" -> ("axis0", "add_arcsec")
+    """
+    axis, _, action = key.partition("_")
+    if axis not in OFFSET_AXES or action not in (ADD, SET_RATE, STOP_RATE, RESET):
+        raise ValueError(f"Unknown offset {key}")
+    return axis, action
+
+
+def Merge_Offsets(pending, new):
+    """
+    One set of /mount/offset parameters doing the same as sending pending
+    then new, or None if they can't be combined. Position offsets on the
+    same axis add up and a later rate replaces an earlier one. A reset
+    wipes out what came before it on that axis, but nothing can follow a
+    reset in the same request as PWI4 doesn't say which it does first.
+    """
+    merged = dict(pending)
+    pending_Actions = collections.defaultdict(set)
+    for key in pending:
+        axis, action = _Split_Offset_Key(key)
+        pending_Actions[axis].add(action)
+
+    new_Actions = collections.defaultdict(dict)
+    for key, value in new.items():
+        axis, action = _Split_Offset_Key(key)
+        new_Actions[axis][action] = value
+
+    for axis, actions in new_Actions.items():
+        earlier = pending_Actions.get(axis, set())
+
+        if RESET in actions:
+            if len(actions) > 1:
+                # Reset and something else in one go, keep them apart.
+                return None
+            for action in earlier:
+                del merged[f"{axis}_{action}"]
+            merged[f"{axis}_{RESET}"] = actions[RESET]
+            continue
+
+        if RESET in earlier:
+            return None
+
+        if ADD in actions:
+            key = f"{axis}_{ADD}"
+            merged[key] = float(merged.get(key, 0.0)) + float(actions[ADD])
+        if SET_RATE in actions or STOP_RATE in actions:
+            merged.pop(f"{axis}_{SET_RATE}", None)
+            merged.pop(f"{axis}_{STOP_RATE}", None)
+            for action in (SET_RATE, STOP_RATE):
+                if action in actions:
+                    merged[f"{axis}_{action}"] = actions[action]
+
+    return merged
+
+
+class _Entry:
+    """
+    A command waiting to be sent and the futures of everyone whose
+    request it carries.
+    """
+
+    __slots__ = ("method_Name", "args", "kwargs", "futures")
+
+    def __init__(self, method_Name, args, kwargs):
+        self.method_Name = method_Name
+        self.args = args
+        self.kwargs = kwargs
+        self.futures = []
+
+
+class LD_Command_Queue:
+    """
+    Send commands to one mount without waiting for each reply. Commands
+    go to PWI4 one at a time in the order they were submitted, from a
+    background thread, and each submit returns a concurrent.futures.Future
+    of the reply.
+
+    Offsets submitted while earlier ones are still waiting are merged
+    into a single /mount/offset request (see Merge_Offsets), so a burst of
+    small guiding corrections costs about one round trip rather than one
+    each. Only offsets next to each other in the queue are merged, so
+    offsets never jump over any other command.
+
+        queue = LD_Command_Queue(myMount)
+        for correction in corrections:
+            queue.Offset(axis0_add_arcsec=correction)
+        queue.Flush()
+    """
+
+    def __init__(self, mount):
+        self.mount = mount
+
+        self._pending = collections.deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._busy = False
+
+        # How many offsets were submitted and how many requests they took.
+        self.offsets_Submitted = 0
+        self.offsets_Sent = 0
+
+        self._thread = threading.Thread(target=self._Run, name="LD_Command_Queue",
+                                        daemon=True)
+        self._thread.start()
+
+    def Submit(self, method_Name, *args, **kwargs):
+        """
+        Queue LD_Planewave.<method_Name>(*args, **kwargs). Returns a
+        Future of what it returns.
+        """
+        future = concurrent.futures.Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Command queue is closed")
+            entry = _Entry(method_Name, args, kwargs)
+            entry.futures.append(future)
+            self._pending.append(entry)
+            self._condition.notify_all()
+        return future
+
+    def Offset(self, **kwargs):
+        """
+        Queue a Mount_Offset(**kwargs), merged with the offset queued just
+        before it if that hasn't been sent yet. Returns a Future of the
+        reply to the request that carried it.
+        """
+        for key in kwargs:
+            _Split_Offset_Key(key)
+
+        future = concurrent.futures.Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Command queue is closed")
+            self.offsets_Submitted += 1
+
+            last = self._pending[-1] if self._pending else None
+            if last is not None and last.method_Name == "Mount_Offset":
+                merged = Merge_Offsets(last.kwargs, kwargs)
+                if merged is not None:
+                    last.kwargs = merged
+                    last.futures.append(future)
+                    return future
+
+            entry = _Entry("Mount_Offset", (), dict(kwargs))
+            entry.futures.append(future)
+            self._pending.append(entry)
+            self._condition.notify_all()
+        return future
+
+    def Flush(self, timeout=None):
+        """
+        Wait until everything submitted so far has been sent and answered.
+        Raises TimeoutError after timeout seconds.
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: not self._pending and not self._busy,
+                                            timeout):
+                raise TimeoutError(f"Commands still queued after {timeout} s")
+
+    def Close(self, cancel=False):
+        """
+        Stop taking commands and wait for the queued ones to go, or with
+        cancel=True cancel those not yet sent.
+        """
+        with self._condition:
+            self._closed = True
+            if cancel:
+                while self._pending:
+                    for future in self._pending.popleft().futures:
+                        future.cancel()
+            self._condition.notify_all()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_Info):
+        self.Close()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _Run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._closed)
+                if not self._pending:
+                    return
+                entry = self._pending.popleft()
+                self._busy = True
+                if entry.method_Name == "Mount_Offset":
+                    self.offsets_Sent += 1
+
+            futures = [future for future in entry.futures
+                       if future.set_running_or_notify_cancel()]
+            try:
+                result = getattr(self.mount, entry.method_Name)(*entry.args, **entry.kwargs)
+            except Exception as e:
+                log.warning(f"{entry.method_Name} failed: {e}")
+                for future in futures:
+                    future.set_exception(e)
+            else:
+                for future in futures:
+                    future.set_result(result)
+
+            with self._condition:
+                self._busy = False
+                self._condition.notify_all()
+
+
+if __name__ == "__main__":
+    import LD_Planewave
+
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+    myMount = LD_Planewave.LD_Planewave("http://127.0.0.1", "8220")
+
+    with LD_Command_Queue(myMount) as queue:
+        queue.Submit("Tracking_On")
+        start = time.perf_counter()
+        for _ in range(100):
+            queue.Offset(axis0_add_arcsec=0.5, axis1_add_arcsec=-0.2)
+        queue.Flush()
+        print(f"{queue.offsets_Submitted} offsets in {queue.offsets_Sent} requests, "
+              f"{time.perf_counter() - start:.3f} s")
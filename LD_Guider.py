@@ -0,0 +1,510 @@
+"""
+Closed loop guiding: take a frame, measure how far the stars have drifted,
+work out a correction and send it as a mount offset, over and over.
+
+The stages run in their own threads so they overlap. While one frame is
+being measured the next is already being taken, and offsets go out through
+an LD_Command_Queue so the loop never waits on PWI4. Corrections sent after
+a frame was taken are allowed for when that frame is measured, so the
+overlap doesn't make the loop over-correct.
+
+    guider = LD_Guider(myMount, interval=2)
+    guider.Calibrate()
+    guider.Start()
+    ...
+    guider.Stop()
+    print(guider.Stats())
+
+Frames come from the mount's virtual camera (LD_Planewave.Take_Image) by
+default, or any callable returning a FITS file (e.g. pwi4_client's
+virtualcamera_take_image) or a 2D array.
+"""
+
+import collections
+import logging
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+
+import LD_Command_Queue
+import LD_Metrics
+
+log = logging.getLogger(__name__)
+
+# Where the time for each frame goes:
+#     capture: taking the image
+#     measure: decoding it and finding the stars
+#     control: turning the star positions into a correction
+#     offset: from queueing the correction to PWI4 replying
+STAGES = ("capture", "measure", "control", "offset")
+
+# FITS BITPIX to the big endian dtype of the data.
+_FITS_DTYPES = {8: ">u1", 16: ">i2", 32: ">i4", 64: ">i8", -32: ">f4", -64: ">f8"}
+
+
+def Read_FITS(data):
+    """
+    The primary image of a FITS file (bytes) as a 2D float64 array, with
+    BZERO and BSCALE applied.
+    """
+    header = {}
+    position = 0
+    while True:
+        block = data[position:position + 2880]
+        if len(block) < 2880:
+            raise ValueError("FITS header has no END")
+        position += 2880
+        for start in range(0, 2880, 80):
+            card = block[start:start + 80].decode("ascii")
+            key = card[:8].strip()
+            if key == "END":
+                break
+            if card[8:10] == "= ":
+                header[key] = card[10:].split("/", 1)[0].strip()
+        else:
+            continue
+        break
+
+    bitpix = int(header["BITPIX"])
+    if int(header["NAXIS"]) != 2:
+        raise ValueError(f"Expected a 2D image, FITS has NAXIS={header['NAXIS']}")
+    width, height = int(header["NAXIS1"]), int(header["NAXIS2"])
+
+    image = np.frombuffer(data, _FITS_DTYPES[bitpix], width * height, position)
+    image = image.reshape(height, width).astype(np.float64)
+    scale = float(header.get("BSCALE", 1))
+    zero = float(header.get("BZERO", 0))
+    if scale != 1:
+        image *= scale
+    if zero:
+        image += zero
+    return image
+
+
+def Background(image):
+    """
+    Sky level and noise (median and a MAD based sigma) of an image.
+    """
+    level = np.median(image)
+    noise = 1.4826 * np.median(np.abs(image - level))
+    return level, max(noise, 1e-6)
+
+
+def Find_Stars(image, count=5, threshold=8.0, border=10, min_Separation=10):
+    """
+    Positions (x, y) of up to count of the brightest stars, as a (n, 2)
+    array. Stars are local maxima at least threshold sigma above the sky,
+    away from the edge and from each other.
+    """
+    level, noise = Background(image)
+    centre = image[1:-1, 1:-1]
+    peaks = centre > level + threshold * noise
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            if dy or dx:
+                neighbour = image[1 + dy:image.shape[0] - 1 + dy, 1 + dx:image.shape[1] - 1 + dx]
+                peaks &= centre >= neighbour
+
+    y, x = np.nonzero(peaks)
+    y += 1
+    x += 1
+    inside = ((x >= border) & (x < image.shape[1] - border)
+              & (y >= border) & (y < image.shape[0] - border))
+    x, y = x[inside], y[inside]
+    order = np.argsort(image[y, x])[::-1]
+
+    stars = []
+    for i in order:
+        if all((x[i] - sx) ** 2 + (y[i] - sy) ** 2 >= min_Separation ** 2 for sx, sy in stars):
+            stars.append((x[i], y[i]))
+            if len(stars) == count:
+                break
+    return np.array([Centroid(image, sx, sy, level=level)[:2] for sx, sy in stars]).reshape(-1, 2)
+
+
+def Centroid(image, x, y, radius=4, level=None):
+    """
+    Flux weighted centre (x, y, flux) of the light within radius pixels of
+    (x, y), above the sky level.
+    """
+    if level is None:
+        level = Background(image)[0]
+    x0, y0 = int(round(x)), int(round(y))
+    y_Low, y_High = max(y0 - radius, 0), min(y0 + radius + 1, image.shape[0])
+    x_Low, x_High = max(x0 - radius, 0), min(x0 + radius + 1, image.shape[1])
+    box = np.clip(image[y_Low:y_High, x_Low:x_High] - level, 0, None)
+    flux = box.sum()
+    if flux <= 0:
+        return float(x), float(y), 0.0
+    ys, xs = np.mgrid[y_Low:y_High, x_Low:x_High]
+    return (xs * box).sum() / flux, (ys * box).sum() / flux, flux
+
+
+def Locate_Stars(image, guesses, search_Radius=20, radius=4, threshold=5.0):
+    """
+    Where each star near guesses ((n, 2) x, y) is now: the brightest pixel
+    within search_Radius, centroided. Returns an (n, 2) array with NaN for
+    stars that weren't found.
+    """
+    level, noise = Background(image)
+    height, width = image.shape
+    found = np.full((len(guesses), 2), np.nan)
+    for i, (x, y) in enumerate(guesses):
+        x0, y0 = int(round(x)), int(round(y))
+        y_Low, y_High = max(y0 - search_Radius, 0), min(y0 + search_Radius + 1, height)
+        x_Low, x_High = max(x0 - search_Radius, 0), min(x0 + search_Radius + 1, width)
+        if y_Low >= y_High or x_Low >= x_High:
+            continue
+        window = image[y_Low:y_High, x_Low:x_High]
+        peak_y, peak_x = np.unravel_index(np.argmax(window), window.shape)
+        if window[peak_y, peak_x] < level + threshold * noise:
+            continue
+        found[i] = Centroid(image, x_Low + peak_x, y_Low + peak_y, radius, level)[:2]
+    return found
+
+
+def Frame_Shift(reference, image):
+    """
+    (dx, dy) pixels image is shifted by relative to reference, from the
+    peak of their cross-correlation. For shifts too big to follow stars
+    across, e.g. while calibrating.
+    """
+    a = reference - np.median(reference)
+    b = image - np.median(image)
+    correlation = np.fft.irfft2(np.fft.rfft2(b) * np.conj(np.fft.rfft2(a)), a.shape)
+    peak_y, peak_x = np.unravel_index(np.argmax(correlation), correlation.shape)
+
+    def Refine(values, peak):
+        # Parabola through the peak and its neighbours, for subpixel shifts.
+        left = values[(peak - 1) % len(values)]
+        right = values[(peak + 1) % len(values)]
+        centre = values[peak]
+        bend = left - 2 * centre + right
+        return peak + (0.5 * (left - right) / bend if bend else 0.0)
+
+    dx = Refine(correlation[peak_y, :], peak_x)
+    dy = Refine(correlation[:, peak_x], peak_y)
+    # Shifts past half the frame wrap round to negative ones.
+    height, width = a.shape
+    if dx > width / 2:
+        dx -= width
+    if dy > height / 2:
+        dy -= height
+    return dx, dy
+
+
+class PID_Axis:
+    """
+    PID controller for one axis. Takes the error (arcsec) and returns the
+    correction to apply (arcsec, the opposite sign). smoothing (0 to <1)
+    low pass filters the error first, to stop the loop chasing seeing.
+    """
+
+    def __init__(self, kp=0.7, ki=0.0, kd=0.0, smoothing=0.0, max_Integral=60.0):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.smoothing = smoothing
+        self.max_Integral = max_Integral
+        self.Reset()
+
+    def Reset(self):
+        self.filtered = None
+        self.integral = 0.0
+        self.last_Error = None
+
+    def Update(self, error, dt):
+        if self.filtered is None:
+            self.filtered = error
+        else:
+            self.filtered = self.smoothing * self.filtered + (1 - self.smoothing) * error
+        error = self.filtered
+
+        self.integral = min(max(self.integral + error * dt, -self.max_Integral), self.max_Integral)
+        derivative = 0.0 if self.last_Error is None or dt <= 0 else (error - self.last_Error) / dt
+        self.last_Error = error
+        return -(self.kp * error + self.ki * self.integral + self.kd * derivative)
+
+
+# One measured frame: when it was taken, how far the stars had moved from
+# the reference (pixels), that as an axis error (arcsec, allowing for
+# corrections still on their way) and the correction sent for it.
+Guide_Frame = collections.namedtuple(
+    "Guide_Frame", ["time", "dx", "dy", "error0", "error1", "correction0", "correction1", "stars"])
+
+
+class LD_Guider:
+    """
+    Guides the mount on the stars in its camera's frames, sending
+    corrections as axis0/axis1 offsets.
+
+    A frame is taken every interval seconds (or as fast as the camera
+    allows if that's slower). The first frame after Start() is the
+    reference: its brightest stars are the guide stars and the loop keeps
+    them where they were. If measuring falls behind the camera, stale
+    frames are dropped rather than queued.
+
+    calibration is the 2x2 matrix of pixels moved per arcsec of axis0
+    (first column) and axis1 (second column) offset, as found by
+    Calibrate(). Corrections smaller than min_Move arcsec aren't sent and
+    bigger than max_Move are cut down to it.
+    """
+
+    def __init__(self, mount, camera=None, interval=1.0, calibration=None,
+                 guide_Stars=5, search_Radius=20, kp=0.7, ki=0.1, kd=0.0, smoothing=0.0,
+                 min_Move=0.05, max_Move=30.0, command_Queue=None):
+        self.mount = mount
+        self.camera = camera if camera is not None else mount.Take_Image
+        self.interval = interval
+        self.calibration = None if calibration is None else np.asarray(calibration, float)
+        self.guide_Stars = guide_Stars
+        self.search_Radius = search_Radius
+        self.min_Move = min_Move
+        self.max_Move = max_Move
+        self.controllers = (PID_Axis(kp, ki, kd, smoothing), PID_Axis(kp, ki, kd, smoothing))
+
+        # Offsets go out through this, one made here is closed by Stop()
+        # and made again by Start().
+        self._own_Queue = command_Queue is None
+        self.command_Queue = command_Queue or LD_Command_Queue.LD_Command_Queue(mount)
+        self._queue_Closed = False
+
+        self.stage_Times = {stage: LD_Metrics.Histogram() for stage in STAGES}
+        self.frames = collections.deque(maxlen=1000)
+        self.frames_Dropped = 0
+        self.frames_Lost = 0
+
+        # Corrections (arcsec on axis0, axis1) sent so far, and those PWI4
+        # has acknowledged.
+        self._lock = threading.Lock()
+        self._commanded = np.zeros(2)
+        self._applied = np.zeros(2)
+
+        self._captured = queue.Queue(maxsize=1)
+        self._stop = threading.Event()
+        self._threads = []
+        self.reference = None
+        self.stars = None
+        # When the last measured frame was taken.
+        self._last_Time = None
+
+    def _Observe(self, stage, seconds):
+        with self._lock:
+            self.stage_Times[stage].Observe(seconds)
+
+    def Capture(self):
+        """
+        Take one frame with the camera, as a float64 array.
+        """
+        frame = self.camera()
+        frame = getattr(frame, "content", frame)
+        if isinstance(frame, (bytes, bytearray)):
+            return Read_FITS(bytes(frame))
+        return np.asarray(frame, np.float64)
+
+    def Calibrate(self, step_Arcsec=20.0, settle=1.0):
+        """
+        Find how the image moves for offsets on each axis by offsetting
+        each axis by step_Arcsec and back, and keep it as
+        self.calibration. Run it with the mount tracking the field and
+        the guider stopped.
+        """
+        reference = self.Capture()
+        columns = []
+        for axis in ("axis0", "axis1"):
+            self.mount.Mount_Offset(**{f"{axis}_add_arcsec": step_Arcsec})
+            time.sleep(settle)
+            columns.append(np.array(Frame_Shift(reference, self.Capture())) / step_Arcsec)
+            self.mount.Mount_Offset(**{f"{axis}_add_arcsec": -step_Arcsec})
+            time.sleep(settle)
+
+        calibration = np.column_stack(columns)
+        if abs(np.linalg.det(calibration)) < 1e-3:
+            raise RuntimeError(f"Calibration failed, the offsets didn't move the image "
+                               f"in different directions: {calibration.tolist()}")
+        log.info(f"Calibrated, pixels per arcsec of axis0/axis1 offset {calibration.tolist()}")
+        self.calibration = calibration
+        return calibration
+
+    def Start(self):
+        if self.calibration is None:
+            raise RuntimeError("Guider isn't calibrated, call Calibrate() first")
+        for controller in self.controllers:
+            controller.Reset()
+        self.reference = self.stars = None
+        self._last_Time = None
+        if self._queue_Closed:
+            self.command_Queue = LD_Command_Queue.LD_Command_Queue(self.mount)
+            self._queue_Closed = False
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._Capture_Loop, name="LD_Guider capture", daemon=True),
+            threading.Thread(target=self._Measure_Loop, name="LD_Guider measure", daemon=True),
+            ]
+        for thread in self._threads:
+            thread.start()
+
+    def Stop(self):
+        """
+        Stop guiding and wait for the corrections already sent.
+        """
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._own_Queue:
+            self.command_Queue.Close()
+            self._queue_Closed = True
+        else:
+            self.command_Queue.Flush()
+
+    def __enter__(self):
+        self.Start()
+        return self
+
+    def __exit__(self, *exc_Info):
+        self.Stop()
+
+    def Stats(self):
+        """
+        Per stage timings (seconds) and frame counts.
+        """
+        with self._lock:
+            stages = {stage: {"count": histogram.count,
+                              "mean": histogram.total / histogram.count,
+                              "p50": histogram.Quantile(0.5),
+                              "p95": histogram.Quantile(0.95)}
+                      for stage, histogram in self.stage_Times.items() if histogram.count}
+        return {"stages": stages,
+                "frames": len(self.frames),
+                "dropped": self.frames_Dropped,
+                "lost": self.frames_Lost,
+                "offsets_Submitted": self.command_Queue.offsets_Submitted,
+                "offsets_Sent": self.command_Queue.offsets_Sent}
+
+    def _Capture_Loop(self):
+        next_Frame = time.monotonic()
+        while not self._stop.is_set():
+            with self._lock:
+                applied = self._applied.copy()
+            taken = time.time()
+            start = time.perf_counter()
+            try:
+                frame = self.Capture()
+            except Exception as e:
+                log.warning(f"Capture failed: {e}")
+                frame = None
+            else:
+                self._Observe("capture", time.perf_counter() - start)
+
+            if frame is not None:
+                try:
+                    self._captured.put_nowait((taken, applied, frame))
+                except queue.Full:
+                    # Measuring is behind, swap the waiting frame for this newer one.
+                    try:
+                        self._captured.get_nowait()
+                        self.frames_Dropped += 1
+                    except queue.Empty:
+                        pass
+                    self._captured.put_nowait((taken, applied, frame))
+
+            next_Frame = max(next_Frame + self.interval, time.monotonic())
+            self._stop.wait(next_Frame - time.monotonic())
+
+    def _Measure_Loop(self):
+        while not self._stop.is_set():
+            try:
+                taken, applied, frame = self._captured.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                self._Process_Frame(taken, applied, frame)
+            except Exception as e:
+                # Keep guiding on the next frame rather than quietly dying.
+                log.exception(f"Guiding on frame taken at {taken} failed: {e}")
+
+    def _Process_Frame(self, taken, applied, frame):
+        """
+        Measure one frame, work out the correction and send it.
+        """
+        start = time.perf_counter()
+        if self.reference is None:
+            self.reference = Find_Stars(frame, self.guide_Stars)
+            self.stars = self.reference.copy()
+            self._Observe("measure", time.perf_counter() - start)
+            if len(self.reference) == 0:
+                log.warning("No guide stars in the reference frame, trying the next")
+                self.reference = None
+            else:
+                log.info(f"Guiding on {len(self.reference)} stars")
+            self._last_Time = taken
+            return
+
+        found = Locate_Stars(frame, self.stars, self.search_Radius)
+        good = ~np.isnan(found[:, 0])
+        self._Observe("measure", time.perf_counter() - start)
+        if not good.any():
+            self.frames_Lost += 1
+            log.warning("Lost the guide stars")
+            return
+        self.stars[good] = found[good]
+        dx, dy = np.median(found[good] - self.reference[good], axis=0)
+
+        start = time.perf_counter()
+        with self._lock:
+            in_Flight = self._commanded - applied
+        # The frame shows the axes as if offset by this much, plus
+        # whatever has been sent since it was taken.
+        error = np.linalg.solve(self.calibration, (dx, dy)) + in_Flight
+        dt = taken - self._last_Time
+        self._last_Time = taken
+        correction = np.array([controller.Update(e, dt)
+                               for controller, e in zip(self.controllers, error)])
+        correction = np.clip(correction, -self.max_Move, self.max_Move)
+        correction[np.abs(correction) < self.min_Move] = 0.0
+        self._Observe("control", time.perf_counter() - start)
+
+        if correction.any():
+            self._Send(correction)
+        self.frames.append(Guide_Frame(taken, float(dx), float(dy), *error.tolist(),
+                                       *correction.tolist(), int(good.sum())))
+
+    def _Send(self, correction):
+        with self._lock:
+            self._commanded += correction
+        sent = time.perf_counter()
+        future = self.command_Queue.Offset(axis0_add_arcsec=correction[0],
+                                           axis1_add_arcsec=correction[1])
+
+        def Done(future):
+            if (future.cancelled() or future.exception() is not None
+                    or getattr(future.result(), "status_code", 200) != 200):
+                # Never went or PWI4 refused it, so stop counting on it.
+                with self._lock:
+                    self._commanded -= correction
+                return
+            with self._lock:
+                self._applied += correction
+                self.stage_Times["offset"].Observe(time.perf_counter() - sent)
+
+        future.add_done_callback(Done)
+
+
+if __name__ == "__main__":
+    import LD_Planewave
+
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+    myMount = LD_Planewave.LD_Planewave("http://127.0.0.1", "8220")
+    myMount.Tracking_On()
+
+    guider = LD_Guider(myMount, interval=1.0)
+    guider.Calibrate()
+    with guider:
+        time.sleep(30)
+    for frame in list(guider.frames)[-5:]:
+        print(frame)
+    print(guider.Stats())
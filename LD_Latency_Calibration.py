@@ -0,0 +1,246 @@
+"""
+Keeping a followed satellite where its TLE says it is, despite the time
+differences between us and PWI4.
+
+PWI4 works out where a satellite is from its own clock, so if that clock is
+off the mount leads or lags the satellite by the same amount of time, which
+for a LEO satellite overhead is arcminutes per second. The old TCP
+protocol's settimeoffset (old/PlanewaveTCP.SetTimeOffset) was the cure.
+
+Measure() times /status round trips and compares PWI4's local sidereal
+time (site.lmst_hours) with ours, giving the latency and how far PWI4's
+clock is ahead of ours. While following a TLE, Follow_TLE() keeps comparing
+where the mount is with where the satellite is, as LD_MyTLE predicts it, to
+estimate how many seconds the mount is ahead along the track (its lead).
+It cancels the lead with path offsets that are redone as the satellite's
+speed changes, or with a time offset if given an LD_Planewave_TCP.
+
+    calibration = LD_Latency_Calibration(myMount)
+    print(calibration.Measure())
+    calibration.Follow_TLE(iss)
+    ...
+    calibration.Stop()
+"""
+
+import collections
+import logging
+import math
+import statistics
+import sys
+import threading
+import time
+
+import LD_MyTLE
+import LD_Planewave
+
+log = logging.getLogger(__name__)
+
+# Sidereal hours per solar hour.
+SIDEREAL_RATE = 1.00273790935
+
+# Round trip times in seconds and how far PWI4's clock is ahead of ours,
+# estimated from the quickest round trips (so it's good to about
+# round_Trip_Min / 2).
+Latency = collections.namedtuple(
+    "Latency", ["round_Trip_Min", "round_Trip_Median", "round_Trip_Max", "clock_Offset"])
+
+# One comparison of the mount with the satellite: the along and across
+# track errors (arcsec, positive is ahead/to the left of the direction of
+# travel), the satellite's speed (arcsec/sec), the lead that error means
+# (seconds) and the lead being compensated for when it was measured.
+Track_Sample = collections.namedtuple(
+    "Track_Sample", ["time", "along", "cross", "speed", "lead", "compensation"])
+
+
+def Host_LST(unix_Time, longitude_Degrees):
+    """
+    Local mean sidereal time (hours) at a unix time by our clock.
+    """
+    return (math.degrees(float(LD_MyTLE.GMST(unix_Time))) / 15 + longitude_Degrees / 15) % 24
+
+
+def Track_Error(tle, status, when, site=None):
+    """
+    How far the mount in status is from where tle puts the satellite at
+    unix time when. Returns along track, cross track error (arcsec) and
+    the satellite's speed (arcsec/sec) as seen from the site.
+    """
+    if site is None:
+        site = status.site
+    alt, az, _ = tle.AltAz([when, when + 1.0], site)
+    cos_Alt = math.cos(math.radians(alt[0]))
+    up = (alt[1] - alt[0]) * 3600
+    east = ((az[1] - az[0] + 180) % 360 - 180) * cos_Alt * 3600
+    speed = math.hypot(up, east)
+    if speed == 0:
+        return 0.0, 0.0, 0.0
+
+    error_Up = (status.mount.altitude - alt[0]) * 3600
+    error_East = ((status.mount.azimuth - az[0] + 180) % 360 - 180) * cos_Alt * 3600
+    along = (error_Up * up + error_East * east) / speed
+    cross = (error_Up * east - error_East * up) / speed
+    return along, cross, speed
+
+
+class LD_Latency_Calibration:
+    """
+    Latency and clock offset measurement for one mount (an LD_Planewave),
+    and compensation while following satellites.
+
+    time_Client is an LD_Planewave_TCP connected to the same PWI, to
+    compensate with its time offset rather than path offsets. Every
+    interval seconds the lead estimate moves gain of the way towards what
+    was measured. It's only measured while the mount isn't slewing and
+    the cross track error is under max_Cross arcsec, i.e. it's actually on
+    the satellite.
+    """
+
+    def __init__(self, mount, time_Client=None, interval=0.5, gain=0.3, max_Cross=120.0):
+        self.mount = mount
+        self.time_Client = time_Client
+        self.interval = interval
+        self.gain = gain
+        self.max_Cross = max_Cross
+
+        self.latency = None
+        self.tle = None
+        # Seconds the mount is thought to be ahead of the satellite, and
+        # the path offset (arcsec) or time offset (seconds) sent to cancel it.
+        self.lead = 0.0
+        self.path_Offset = 0.0
+        self.time_Offset = 0.0
+        self.samples = collections.deque(maxlen=10000)
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def Measure(self, samples=20):
+        """
+        Time samples /status requests. Returns (and keeps as self.latency)
+        a Latency.
+        """
+        round_Trips = []
+        offsets = []
+        for _ in range(samples):
+            sent = time.time()
+            start = time.perf_counter()
+            status = self.mount.Status()
+            round_Trip = time.perf_counter() - start
+            # PWI4 most likely made the status half way through.
+            ours = Host_LST(sent + round_Trip / 2, status.site.longitude)
+            difference = (status.site.lst - ours + 12) % 24 - 12
+            round_Trips.append(round_Trip)
+            offsets.append(difference * 3600 / SIDEREAL_RATE)
+
+        # The quickest quarter of the round trips have the least room for
+        # the reply to have been delayed one way more than the other.
+        quickest = sorted(range(samples), key=round_Trips.__getitem__)[:max(1, samples // 4)]
+        self.latency = Latency(min(round_Trips), statistics.median(round_Trips), max(round_Trips),
+                               statistics.median(offsets[i] for i in quickest))
+        log.info(f"Round trip {1000 * self.latency.round_Trip_Median:.1f} ms, "
+                 f"PWI4's clock is {1000 * self.latency.clock_Offset:+.1f} ms from ours")
+        return self.latency
+
+    def Follow_TLE(self, tle):
+        """
+        Follow a satellite (any format LD_Planewave.Follow_TLE takes) and
+        keep compensating for the lead until Stop(). The clock offset from
+        Measure(), run first if it hasn't been, is the starting estimate of
+        the lead.
+        """
+        self.Stop()
+        if self.latency is None:
+            self.Measure()
+        if not isinstance(tle, LD_MyTLE.LD_MyTLE):
+            payload = LD_Planewave.TLE_Payload(tle)
+            tle = LD_MyTLE.LD_MyTLE([payload["line0"], payload["line1"], payload["line2"]])
+        self.tle = tle
+
+        self.mount.Follow_TLE(tle)
+        self.lead = self.latency.clock_Offset
+        self.path_Offset = 0.0
+        self.time_Offset = 0.0
+        self._Compensate()
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._Loop, name="LD_Latency_Calibration",
+                                        daemon=True)
+        self._thread.start()
+
+    def Stop(self):
+        """
+        Stop compensating and take the offsets back off.
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        if self.time_Client is not None:
+            self.time_Client.Set_Time_Offset(0.0)
+        else:
+            self.mount.Mount_Offset(path_reset=0)
+        self.path_Offset = self.time_Offset = 0.0
+
+    def _Compensate(self, speed=None):
+        """
+        Send whatever offset now cancels self.lead.
+        """
+        if self.time_Client is not None:
+            if abs(-self.lead - self.time_Offset) >= 0.001:
+                self.time_Offset = -self.lead
+                self.time_Client.Set_Time_Offset(self.time_Offset)
+            return
+
+        if speed is None:
+            _, _, speed = Track_Error(self.tle, self.mount.Status(), time.time())
+        # The same lead is more arcsec when the satellite is moving faster.
+        change = -self.lead * speed - self.path_Offset
+        if abs(change) >= 0.1:
+            self.mount.Mount_Offset(path_add_arcsec=change)
+            self.path_Offset += change
+
+    def _Loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                start = time.perf_counter()
+                received = time.time()
+                status = self.mount.Status()
+                round_Trip = time.perf_counter() - start
+                if status.mount.is_slewing:
+                    continue
+
+                # When the status was made, by our clock.
+                made = received + round_Trip / 2
+                along, cross, speed = Track_Error(self.tle, status, made)
+                if speed == 0 or math.isnan(along):
+                    continue
+                # What's left after the compensation already in place.
+                residual = along / speed
+                self.samples.append(Track_Sample(made, along, cross, speed, residual, self.lead))
+                if abs(cross) > self.max_Cross:
+                    continue
+
+                self.lead += self.gain * residual
+                self._Compensate(speed)
+            except Exception as e:
+                log.warning(f"Tracking compensation failed: {e}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+    myMount = LD_Planewave.LD_Planewave("http://127.0.0.1", "8220")
+
+    calibration = LD_Latency_Calibration(myMount)
+    print(calibration.Measure())
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as f:
+            calibration.Follow_TLE(LD_MyTLE.Parse_TLEs(f.read())[0])
+        try:
+            while True:
+                time.sleep(5)
+                sample = calibration.samples[-1]
+                print(f"lead {calibration.lead:+.3f} s, along {sample.along:+.1f}\", "
+                      f"cross {sample.cross:+.1f}\"")
+        except KeyboardInterrupt:
+            calibration.Stop()
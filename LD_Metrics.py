@@ -0,0 +1,211 @@
+import bisect
+import threading
+import time
+
+import requests.adapters
+import urllib3
+
+# Histogram bucket upper bounds in seconds (Prometheus "le" values)
+BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+
+# Where the time for a request goes:
+#     connect: opening a TCP connection (0 when a keep-alive one is reused)
+#     server: sending the request and reading the reply, i.e. the network
+#             and PWI4 itself
+#     parse: turning the reply into a status object
+PHASES = ("connect", "server", "parse")
+
+
+class Histogram:
+    """
+    Counts of observations per bucket, plus their sum.
+    """
+
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def Observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def Cumulative(self):
+        """
+        (le, count) pairs as Prometheus wants them, ending with +Inf.
+        """
+        running = 0
+        out = []
+        for le, count in zip((*BUCKETS, float("inf")), self.counts):
+            running += count
+            out.append((le, running))
+        return out
+
+    def Quantile(self, q):
+        """
+        Estimate of the q quantile: the upper bound of the bucket it's in.
+        """
+        if self.count == 0:
+            return None
+        wanted = q * self.count
+        for le, running in self.Cumulative():
+            if running >= wanted:
+                return le
+
+
+class Endpoint_Metrics:
+    __slots__ = ("requests", "errors", "phases")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.phases = {phase: Histogram() for phase in PHASES}
+
+
+class LD_Metrics:
+    """
+    Per endpoint request and error counts, and a latency histogram for
+    each phase of a request (see PHASES). Cheap enough to leave on: a
+    request costs a lock and a few bisects.
+
+    Read it back with Snapshot() (a dict) or Prometheus() (text exposition
+    format, e.g. to serve on /metrics).
+    """
+
+    def __init__(self, prefix="pwi4"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.endpoints = {}
+
+    def _Endpoint(self, endpoint):
+        metrics = self.endpoints.get(endpoint)
+        if metrics is None:
+            metrics = self.endpoints.setdefault(endpoint, Endpoint_Metrics())
+        return metrics
+
+    def Record_Request(self, endpoint, error=False):
+        with self._lock:
+            metrics = self._Endpoint(endpoint)
+            metrics.requests += 1
+            if error:
+                metrics.errors += 1
+
+    def Observe(self, endpoint, phase, seconds):
+        with self._lock:
+            self._Endpoint(endpoint).phases[phase].Observe(seconds)
+
+    def Reset(self):
+        with self._lock:
+            self.endpoints = {}
+
+    def Snapshot(self):
+        """
+        Everything recorded so far as plain dicts (times in seconds).
+        """
+        with self._lock:
+            snapshot = {}
+            for endpoint, metrics in self.endpoints.items():
+                phases = {}
+                for phase, histogram in metrics.phases.items():
+                    if histogram.count == 0:
+                        continue
+                    phases[phase] = {
+                        "count": histogram.count,
+                        "sum": histogram.total,
+                        "mean": histogram.total / histogram.count,
+                        "p50": histogram.Quantile(0.5),
+                        "p95": histogram.Quantile(0.95),
+                        "buckets": dict(zip((*BUCKETS, "+Inf"), histogram.counts)),
+                        }
+                snapshot[endpoint] = {
+                    "requests": metrics.requests,
+                    "errors": metrics.errors,
+                    "phases": phases,
+                    }
+            return snapshot
+
+    def Prometheus(self):
+        """
+        The metrics in the Prometheus text exposition format.
+        """
+        prefix = self.prefix
+        lines = [
+            f"# HELP {prefix}_requests_total Requests made to PWI4.",
+            f"# TYPE {prefix}_requests_total counter",
+            ]
+        with self._lock:
+            endpoints = sorted(self.endpoints.items())
+            for endpoint, metrics in endpoints:
+                lines.append(f'{prefix}_requests_total{{endpoint="{endpoint}"}} {metrics.requests}')
+
+            lines += [
+                f"# HELP {prefix}_errors_total Requests to PWI4 that failed.",
+                f"# TYPE {prefix}_errors_total counter",
+                ]
+            for endpoint, metrics in endpoints:
+                lines.append(f'{prefix}_errors_total{{endpoint="{endpoint}"}} {metrics.errors}')
+
+            lines += [
+                f"# HELP {prefix}_request_phase_seconds Time spent in each phase of a request.",
+                f"# TYPE {prefix}_request_phase_seconds histogram",
+                ]
+            for endpoint, metrics in endpoints:
+                for phase, histogram in metrics.phases.items():
+                    if histogram.count == 0:
+                        continue
+                    labels = f'endpoint="{endpoint}",phase="{phase}"'
+                    for le, running in histogram.Cumulative():
+                        le = "+Inf" if le == float("inf") else repr(le)
+                        lines.append(f'{prefix}_request_phase_seconds_bucket{{{labels},le="{le}"}} {running}')
+                    lines.append(f"{prefix}_request_phase_seconds_sum{{{labels}}} {histogram.total}")
+                    lines.append(f"{prefix}_request_phase_seconds_count{{{labels}}} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+
+### Timing connection setup inside the transports ###
+
+# Time spent opening connections on this thread since it was last taken.
+_connect_Time = threading.local()
+
+
+def Take_Connect_Time():
+    """
+    Seconds this thread has spent opening connections since the last call.
+    """
+    seconds = getattr(_connect_Time, "seconds", 0.0)
+    _connect_Time.seconds = 0.0
+    return seconds
+
+
+def Add_Connect_Time(seconds):
+    """
+    Note that this thread spent seconds opening a connection.
+    """
+    _connect_Time.seconds = getattr(_connect_Time, "seconds", 0.0) + seconds
+
+
+class _Timed_HTTPConnection(urllib3.connection.HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        Add_Connect_Time(time.perf_counter() - start)
+
+
+class _Timed_HTTPConnectionPool(urllib3.HTTPConnectionPool):
+    ConnectionCls = _Timed_HTTPConnection
+
+
+class Timed_HTTPAdapter(requests.adapters.HTTPAdapter):
+    """
+    HTTPAdapter whose plain http connections note how long they took to
+    open, for Take_Connect_Time().
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = dict(
+            self.poolmanager.pool_classes_by_scheme, http=_Timed_HTTPConnectionPool)
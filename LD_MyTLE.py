@@ -0,0 +1,631 @@
+"""
+Two line element sets (TLEs) and where the satellites they describe are.
+
+LD_MyTLE is one TLE, what LD_Planewave.Follow_TLE takes. TLE_Array holds
+many as one NumPy array per orbital element and propagates them all over
+many times in one go:
+
+    satellites = TLE_Array.From_File("active.txt")
+    times = time.time() + np.arange(0, 8 * 3600, 10)
+    alt, az, distance = satellites.AltAz(times, myMount.status.site)
+    # alt[i, j] is satellite i at times[j]
+
+Propagation is SGP4 (the model TLEs are made for, following Vallado et al.
+"Revisiting Spacetrack Report #3", 2006, WGS72 constants) vectorised over
+satellites and times. Only the near earth part is implemented: satellites
+with periods of 225 minutes or more (GPS, geostationary, Molniya...) need
+the SDP4 deep space terms and come out as NaN.
+
+Positions are in the TEME frame SGP4 works in, turned into alt/az by
+rotating by Greenwich mean sidereal time. UT1-UTC and polar motion are
+ignored, which costs well under the accuracy of a TLE.
+"""
+
+import calendar
+import logging
+import math
+import sys
+import time
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# WGS72, which TLEs are fitted with.
+MU = 398600.8  # km^3/s^2
+EARTH_RADIUS = 6378.135  # km
+XKE = 60.0 / math.sqrt(EARTH_RADIUS ** 3 / MU)  # sqrt(mu) in earth radii^1.5/min
+J2 = 0.001082616
+J3 = -0.00000253881
+J4 = -0.00000165597
+J3OJ2 = J3 / J2
+# Earth radii/min to km/s.
+VELOCITY_SCALE = EARTH_RADIUS * XKE / 60.0
+
+# WGS84, for the site.
+WGS84_RADIUS = 6378.137  # km
+WGS84_FLATTENING = 1 / 298.257223563
+
+# Orbits this long (minutes) or longer need the deep space terms.
+DEEP_SPACE_PERIOD = 225.0
+
+# Why propagation failed, as in Vallado's code. 0 is fine.
+ERRORS = {
+    1: "eccentricity out of range",
+    2: "mean motion below zero",
+    4: "semi-latus rectum below zero",
+    6: "decayed",
+    7: "deep space orbit, not supported",
+    }
+
+# Columns of TLE_Array.elements.
+ELEMENT_NAMES = ("norad_Id", "epoch", "inclination", "raan", "eccentricity",
+                 "arg_Perigee", "mean_Anomaly", "mean_Motion", "bstar")
+
+_TWO_PI = 2 * math.pi
+_X2O3 = 2.0 / 3.0
+
+
+def Checksum(line):
+    """
+    The TLE checksum of a line: digits add their value, "-" adds 1,
+    modulo 10, over the first 68 characters.
+    """
+    total = 0
+    for character in line[:68]:
+        if character.isdigit():
+            total += int(character)
+        elif character == "-":
+            total += 1
+    return total % 10
+
+
+def _Implied_Decimal(field):
+    """
+    TLE fields like " 13653-5" (0.13653e-5) to a float.
+    """
+    field = field.strip()
+    if not field:
+        return 0.0
+    sign = -1.0 if field[0] == "-" else 1.0
+    field = field.lstrip("+-")
+    mantissa, exponent = field[:-2], field[-2:]
+    return sign * float(f"0.{mantissa.strip()}") * 10 ** int(exponent)
+
+
+def Epoch_To_Unix(year, day):
+    """
+    A TLE epoch (two digit year, fractional day of year starting at 1) as
+    a unix time.
+    """
+    year += 2000 if year < 57 else 1900
+    return calendar.timegm((year, 1, 1, 0, 0, 0)) + (day - 1) * 86400.0
+
+
+def Unix_To_Julian(unix_Time):
+    return np.asarray(unix_Time, float) / 86400.0 + 2440587.5
+
+
+def GMST(unix_Time):
+    """
+    Greenwich mean sidereal time (radians) at unix times, the rotation
+    from TEME to earth fixed (IAU 1982, as SGP4 uses).
+    """
+    unix_Time = np.asarray(unix_Time, float)
+    centuries = (unix_Time / 86400.0 + 2440587.5 - 2451545.0) / 36525.0
+    seconds = (((-6.2e-6 * centuries + 0.093104) * centuries
+                + (876600.0 * 3600 + 8640184.812866)) * centuries + 67310.54841)
+    return np.radians(seconds / 240.0) % _TWO_PI
+
+
+class LD_MyTLE:
+    """
+    One TLE. Takes a string of two or three lines, or a list of them. The
+    name (line 0) is optional.
+
+        iss = LD_MyTLE(["ISS (ZARYA)", line1, line2])
+        myMount.Follow_TLE(iss)
+    """
+
+    def __init__(self, tle):
+        if isinstance(tle, str):
+            tle = tle.strip("\n").split("\n")
+        lines = [line.rstrip() for line in tle]
+        if len(lines) == 2:
+            lines.insert(0, "")
+        if len(lines) != 3 or not lines[1].startswith("1 ") or not lines[2].startswith("2 "):
+            raise ValueError(f"Not a TLE: {tle}")
+
+        self.name = lines[0].strip()
+        self.line1 = lines[1]
+        self.line2 = lines[2]
+        for line in (self.line1, self.line2):
+            if len(line) >= 69 and line[68].isdigit() and int(line[68]) != Checksum(line):
+                log.warning(f"Bad checksum on TLE line {line}")
+
+        line1, line2 = self.line1, self.line2
+        self.norad_Id = int(line1[2:7])
+        self.classification = line1[7]
+        self.designator = line1[9:17].strip()
+        self.epoch = Epoch_To_Unix(int(line1[18:20]), float(line1[20:32]))
+        # Derivatives of the mean motion (rev/day^2 and rev/day^3), SGP4
+        # doesn't use them.
+        self.ndot = float(line1[33:43])
+        self.nddot = _Implied_Decimal(line1[44:52])
+        self.bstar = _Implied_Decimal(line1[53:61])
+
+        self.inclination = float(line2[8:16])  # degrees
+        self.raan = float(line2[17:25])  # degrees
+        self.eccentricity = float(f"0.{line2[26:33].strip()}")
+        self.arg_Perigee = float(line2[34:42])  # degrees
+        self.mean_Anomaly = float(line2[43:51])  # degrees
+        self.mean_Motion = float(line2[52:63])  # rev/day
+
+    def __str__(self):
+        return "\n".join(self.Lines())
+
+    def __repr__(self):
+        return f"LD_MyTLE({self.name!r}, NORAD {self.norad_Id})"
+
+    def Lines(self):
+        return [self.name, self.line1, self.line2]
+
+    @property
+    def Dict(self):
+        """
+        The TLE as the line0, line1, line2 parameters PWI4 wants.
+        """
+        return {"line0": self.name, "line1": self.line1, "line2": self.line2}
+
+    @property
+    def period(self):
+        """
+        Orbital period in minutes.
+        """
+        return 1440.0 / self.mean_Motion
+
+    def Propagate(self, times):
+        """
+        TEME position (km) and velocity (km/s) at unix times, see
+        TLE_Array.Propagate.
+        """
+        position, velocity, _ = TLE_Array([self]).Propagate(times)
+        return position[0], velocity[0]
+
+    def AltAz(self, times, site):
+        """
+        Altitude, azimuth (degrees) and distance (km) from site at unix
+        times, see TLE_Array.AltAz.
+        """
+        alt, az, distance = TLE_Array([self]).AltAz(times, site)
+        return alt[0], az[0], distance[0]
+
+
+def Parse_TLEs(text):
+    """
+    Every TLE in text (two or three line format, as Celestrak and
+    Space-Track give them) as LD_MyTLEs.
+    """
+    tles = []
+    name = ""
+    lines = [line.rstrip() for line in text.splitlines() if line.strip()]
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith("1 ") and i + 1 < len(lines) and lines[i + 1].startswith("2 "):
+            tles.append(LD_MyTLE([name, line, lines[i + 1]]))
+            name = ""
+            i += 2
+        else:
+            name = line
+            i += 1
+    return tles
+
+
+class TLE_Array:
+    """
+    Many TLEs as arrays, one per element (see ELEMENT_NAMES, angles in
+    radians, mean motion in radians/minute), for propagating together.
+    The SGP4 set up for every satellite is done once, here.
+    """
+
+    def __init__(self, tles):
+        self.tles = list(tles)
+        self.names = [tle.name for tle in self.tles]
+
+        def Column(name, dtype=float):
+            return np.array([getattr(tle, name) for tle in self.tles], dtype)
+
+        self.norad_Id = Column("norad_Id", np.int64)
+        self.epoch = Column("epoch")
+        self.inclination = np.radians(Column("inclination"))
+        self.raan = np.radians(Column("raan"))
+        self.eccentricity = Column("eccentricity")
+        self.arg_Perigee = np.radians(Column("arg_Perigee"))
+        self.mean_Anomaly = np.radians(Column("mean_Anomaly"))
+        self.mean_Motion = Column("mean_Motion") * _TWO_PI / 1440.0
+        self.bstar = Column("bstar")
+
+        self._Init()
+        if self.deep_Space.any():
+            log.warning(f"{int(self.deep_Space.sum())} of {len(self)} TLEs are deep space "
+                        "orbits, they won't be propagated")
+
+    @classmethod
+    def From_Text(cls, text):
+        return cls(Parse_TLEs(text))
+
+    @classmethod
+    def From_File(cls, filename):
+        with open(filename) as f:
+            return cls.From_Text(f.read())
+
+    def __len__(self):
+        return len(self.tles)
+
+    def __getitem__(self, index):
+        """
+        A TLE_Array of some of the satellites (index is anything that
+        indexes a NumPy array).
+        """
+        indices = np.arange(len(self))[index]
+        return TLE_Array([self.tles[i] for i in np.atleast_1d(indices)])
+
+    @property
+    def elements(self):
+        """
+        All the elements as one (n, len(ELEMENT_NAMES)) float64 array.
+        """
+        return np.column_stack([getattr(self, name).astype(float) for name in ELEMENT_NAMES])
+
+    def _Init(self):
+        """
+        The time independent SGP4 terms (Vallado's initl and sgp4init).
+        """
+        ecco = self.eccentricity
+        inclo = self.inclination
+        argpo = self.arg_Perigee
+        no_Kozai = self.mean_Motion
+        bstar = self.bstar
+
+        eccsq = ecco * ecco
+        omeosq = 1.0 - eccsq
+        rteosq = np.sqrt(omeosq)
+        cosio = np.cos(inclo)
+        cosio2 = cosio * cosio
+
+        # Un-Kozai the mean motion.
+        ak = (XKE / no_Kozai) ** _X2O3
+        d1 = 0.75 * J2 * (3.0 * cosio2 - 1.0) / (rteosq * omeosq)
+        delta = d1 / (ak * ak)
+        adel = ak * (1.0 - delta * delta - delta * (1.0 / 3.0 + 134.0 * delta * delta / 81.0))
+        delta = d1 / (adel * adel)
+        no = no_Kozai / (1.0 + delta)
+
+        ao = (XKE / no) ** _X2O3
+        sinio = np.sin(inclo)
+        po = ao * omeosq
+        con42 = 1.0 - 5.0 * cosio2
+        con41 = -con42 - cosio2 - cosio2
+        posq = po * po
+        rp = ao * (1.0 - ecco)
+
+        self.deep_Space = _TWO_PI / no >= DEEP_SPACE_PERIOD
+
+        # Perigees under 220 km get the simpler drag model.
+        self.simple = rp < 220.0 / EARTH_RADIUS + 1.0
+
+        # Atmospheric density parameters, adjusted for low perigees.
+        perigee = (rp - 1.0) * EARTH_RADIUS
+        sfour = np.where(perigee < 156.0, np.where(perigee < 98.0, 20.0, perigee - 78.0), 78.0)
+        qzms24 = ((120.0 - sfour) / EARTH_RADIUS) ** 4
+        sfour = sfour / EARTH_RADIUS + 1.0
+
+        pinvsq = 1.0 / posq
+        tsi = 1.0 / (ao - sfour)
+        eta = ao * ecco * tsi
+        etasq = eta * eta
+        eeta = ecco * eta
+        psisq = np.abs(1.0 - etasq)
+        coef = qzms24 * tsi ** 4
+        coef1 = coef / psisq ** 3.5
+        cc2 = coef1 * no * (ao * (1.0 + 1.5 * etasq + eeta * (4.0 + etasq))
+                            + 0.375 * J2 * tsi / psisq * con41 * (8.0 + 3.0 * etasq * (8.0 + etasq)))
+        cc1 = bstar * cc2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cc3 = np.where(ecco > 1.0e-4, -2.0 * coef * tsi * J3OJ2 * no * sinio / ecco, 0.0)
+        x1mth2 = 1.0 - cosio2
+        cc4 = 2.0 * no * coef1 * ao * omeosq * (
+            eta * (2.0 + 0.5 * etasq) + ecco * (0.5 + 2.0 * etasq)
+            - J2 * tsi / (ao * psisq) * (
+                -3.0 * con41 * (1.0 - 2.0 * eeta + etasq * (1.5 - 0.5 * eeta))
+                + 0.75 * x1mth2 * (2.0 * etasq - eeta * (1.0 + etasq)) * np.cos(2.0 * argpo)))
+        cc5 = 2.0 * coef1 * ao * omeosq * (1.0 + 2.75 * (etasq + eeta) + eeta * etasq)
+
+        cosio4 = cosio2 * cosio2
+        temp1 = 1.5 * J2 * pinvsq * no
+        temp2 = 0.5 * temp1 * J2 * pinvsq
+        temp3 = -0.46875 * J4 * pinvsq * pinvsq * no
+        mdot = (no + 0.5 * temp1 * rteosq * con41
+                + 0.0625 * temp2 * rteosq * (13.0 - 78.0 * cosio2 + 137.0 * cosio4))
+        argpdot = (-0.5 * temp1 * con42 + 0.0625 * temp2 * (7.0 - 114.0 * cosio2 + 395.0 * cosio4)
+                   + temp3 * (3.0 - 36.0 * cosio2 + 49.0 * cosio4))
+        xhdot1 = -temp1 * cosio
+        nodedot = xhdot1 + (0.5 * temp2 * (4.0 - 19.0 * cosio2)
+                            + 2.0 * temp3 * (3.0 - 7.0 * cosio2)) * cosio
+        with np.errstate(divide="ignore", invalid="ignore"):
+            xmcof = np.where(ecco > 1.0e-4, -_X2O3 * coef * bstar / eeta, 0.0)
+        # Avoid dividing by zero for inclinations of exactly 180 degrees.
+        xlcof = -0.25 * J3OJ2 * sinio * (3.0 + 5.0 * cosio) / np.where(
+            np.abs(cosio + 1.0) > 1.5e-12, 1.0 + cosio, 1.5e-12)
+
+        cc1sq = cc1 * cc1
+        d2 = 4.0 * ao * tsi * cc1sq
+        temp = d2 * tsi * cc1 / 3.0
+        d3 = (17.0 * ao + sfour) * temp
+        d4 = 0.5 * temp * ao * tsi * (221.0 * ao + 31.0 * sfour) * cc1
+        full = ~self.simple
+
+        self._sgp4 = {
+            "no": no, "ecco": ecco, "inclo": inclo, "nodeo": self.raan, "argpo": argpo,
+            "mo": self.mean_Anomaly, "bstar": bstar, "eta": eta,
+            "mdot": mdot, "argpdot": argpdot, "nodedot": nodedot,
+            "nodecf": 3.5 * omeosq * xhdot1 * cc1, "t2cof": 1.5 * cc1,
+            "cc1": cc1, "cc4": cc4, "cc5": cc5,
+            "omgcof": bstar * cc3 * np.cos(argpo), "xmcof": xmcof,
+            "delmo": (1.0 + eta * np.cos(self.mean_Anomaly)) ** 3,
+            "sinmao": np.sin(self.mean_Anomaly),
+            "xlcof": xlcof, "aycof": -0.5 * J3OJ2 * sinio,
+            "con41": con41, "x1mth2": x1mth2, "x7thm1": 7.0 * cosio2 - 1.0,
+            # Only used by the full drag model.
+            "full": full.astype(float),
+            "d2": np.where(full, d2, 0.0), "d3": np.where(full, d3, 0.0),
+            "d4": np.where(full, d4, 0.0),
+            "t3cof": np.where(full, d2 + 2.0 * cc1sq, 0.0),
+            "t4cof": np.where(full, 0.25 * (3.0 * d3 + cc1 * (12.0 * d2 + 10.0 * cc1sq)), 0.0),
+            "t5cof": np.where(full, 0.2 * (3.0 * d4 + 12.0 * cc1 * d3 + 6.0 * d2 * d2
+                                           + 15.0 * cc1sq * (2.0 * d2 + cc1sq)), 0.0),
+            }
+
+    def Propagate(self, times, chunk_Elements=1_000_000):
+        """
+        TEME positions (km) and velocities (km/s) of every satellite at
+        every unix time, as (satellites, times, 3) arrays, and a
+        (satellites, times) array of error codes (see ERRORS, 0 is fine).
+        Failed points are NaN.
+
+        times can also be a (satellites, times) array, a row of times per
+        satellite. Satellites are done chunk_Elements points at a time to
+        keep the temporary arrays a sensible size.
+        """
+        times = np.asarray(times, float)
+        per_Satellite = times.ndim == 2
+        n_Times = times.shape[-1] if times.ndim else 1
+        times = times.reshape(len(self), n_Times) if per_Satellite else times.reshape(1, n_Times)
+
+        position = np.empty((len(self), n_Times, 3))
+        velocity = np.empty((len(self), n_Times, 3))
+        errors = np.zeros((len(self), n_Times), np.int8)
+        step = max(1, chunk_Elements // max(n_Times, 1))
+        for start in range(0, len(self), step):
+            chunk = slice(start, start + step)
+            terms = {name: value[chunk, None] for name, value in self._sgp4.items()}
+            chunk_Times = times[chunk] if per_Satellite else times
+            minutes = (chunk_Times - self.epoch[chunk, None]) / 60.0
+            position[chunk], velocity[chunk], errors[chunk] = _SGP4(terms, minutes)
+
+        errors[self.deep_Space] = 7
+        failed = errors != 0
+        position[failed] = np.nan
+        velocity[failed] = np.nan
+        return position, velocity, errors
+
+    def AltAz(self, times, site):
+        """
+        Altitude, azimuth (degrees, north through east) and distance (km)
+        of every satellite from site at every unix time, each a
+        (satellites, times) array. site is an LD_PWI_Status.Site_Status
+        (e.g. myMount.status.site) or (latitude, longitude, height)
+        in degrees, degrees east and metres.
+        """
+        times = np.asarray(times, float)
+        position, _, _ = self.Propagate(times)
+        return Topocentric(position, times, site)
+
+
+def _SGP4(terms, t):
+    """
+    Vallado's sgp4() for near earth orbits. terms are the _Init arrays as
+    columns, t the minutes since epoch. Returns position (km), velocity
+    (km/s) and error codes.
+    """
+    (no, ecco, inclo, nodeo, argpo, mo, bstar, eta) = (
+        terms[name] for name in ("no", "ecco", "inclo", "nodeo", "argpo", "mo", "bstar", "eta"))
+    full = terms["full"]
+
+    # Secular gravity and drag.
+    xmdf = mo + terms["mdot"] * t
+    argpdf = argpo + terms["argpdot"] * t
+    nodedf = nodeo + terms["nodedot"] * t
+    t2 = t * t
+    nodem = nodedf + terms["nodecf"] * t2
+    tempa = 1.0 - terms["cc1"] * t
+    tempe = bstar * terms["cc4"] * t
+    templ = terms["t2cof"] * t2
+
+    # Extra drag terms, zero for the simple model.
+    delomg = terms["omgcof"] * t
+    delm = terms["xmcof"] * ((1.0 + eta * np.cos(xmdf)) ** 3 - terms["delmo"])
+    correction = (delomg + delm) * full
+    mm = xmdf + correction
+    argpm = argpdf - correction
+    t3 = t2 * t
+    t4 = t3 * t
+    tempa = tempa - terms["d2"] * t2 - terms["d3"] * t3 - terms["d4"] * t4
+    tempe = tempe + bstar * terms["cc5"] * (np.sin(mm) - terms["sinmao"]) * full
+    templ = templ + terms["t3cof"] * t3 + t4 * (terms["t4cof"] + t * terms["t5cof"])
+
+    errors = np.zeros(np.broadcast(t, no).shape, np.int8)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        am = (XKE / no) ** _X2O3 * tempa * tempa
+        nm = XKE / am ** 1.5
+        em = ecco - tempe
+        errors[(em >= 1.0) | (em < -0.001)] = 1
+        errors[nm <= 0.0] = 2
+        em = np.maximum(em, 1.0e-6)
+        mm = mm + no * templ
+        xlm = mm + argpm + nodem
+
+        nodem = np.fmod(nodem, _TWO_PI)
+        argpm = np.fmod(argpm, _TWO_PI)
+        xlm = np.fmod(xlm, _TWO_PI)
+        mm = np.fmod(xlm - argpm - nodem, _TWO_PI)
+
+        sinim = np.sin(inclo)
+        cosim = np.cos(inclo)
+
+        # Long period periodics.
+        axnl = em * np.cos(argpm)
+        temp = 1.0 / (am * (1.0 - em * em))
+        aynl = em * np.sin(argpm) + temp * terms["aycof"]
+        xl = mm + argpm + nodem + temp * terms["xlcof"] * axnl
+
+        # Kepler's equation.
+        u = np.fmod(xl - nodem, _TWO_PI)
+        eo1 = u
+        for _ in range(10):
+            sineo1 = np.sin(eo1)
+            coseo1 = np.cos(eo1)
+            tem5 = (u - aynl * coseo1 + axnl * sineo1 - eo1) / (1.0 - coseo1 * axnl - sineo1 * aynl)
+            tem5 = np.clip(tem5, -0.95, 0.95)
+            eo1 = eo1 + tem5
+            if np.nanmax(np.abs(tem5), initial=0.0) < 1.0e-12:
+                break
+        sineo1 = np.sin(eo1)
+        coseo1 = np.cos(eo1)
+
+        # Short period periodics.
+        ecose = axnl * coseo1 + aynl * sineo1
+        esine = axnl * sineo1 - aynl * coseo1
+        el2 = axnl * axnl + aynl * aynl
+        pl = am * (1.0 - el2)
+        errors[(pl < 0.0) & (errors == 0)] = 4
+        rl = am * (1.0 - ecose)
+        rdotl = np.sqrt(am) * esine / rl
+        rvdotl = np.sqrt(pl) / rl
+        betal = np.sqrt(1.0 - el2)
+        temp = esine / (1.0 + betal)
+        sinu = am / rl * (sineo1 - aynl - axnl * temp)
+        cosu = am / rl * (coseo1 - axnl + aynl * temp)
+        su = np.arctan2(sinu, cosu)
+        sin2u = (cosu + cosu) * sinu
+        cos2u = 1.0 - 2.0 * sinu * sinu
+        temp = 1.0 / pl
+        temp1 = 0.5 * J2 * temp
+        temp2 = temp1 * temp
+
+        con41 = terms["con41"]
+        x1mth2 = terms["x1mth2"]
+        mrt = rl * (1.0 - 1.5 * temp2 * betal * con41) + 0.5 * temp1 * x1mth2 * cos2u
+        su = su - 0.25 * temp2 * terms["x7thm1"] * sin2u
+        xnode = nodem + 1.5 * temp2 * cosim * sin2u
+        xinc = inclo + 1.5 * temp2 * cosim * sinim * cos2u
+        mvt = rdotl - nm * temp1 * x1mth2 * sin2u / XKE
+        rvdot = rvdotl + nm * temp1 * (x1mth2 * cos2u + 1.5 * con41) / XKE
+
+        # Orientation vectors.
+        sinsu, cossu = np.sin(su), np.cos(su)
+        snod, cnod = np.sin(xnode), np.cos(xnode)
+        sini, cosi = np.sin(xinc), np.cos(xinc)
+        xmx = -snod * cosi
+        xmy = cnod * cosi
+        ux = xmx * sinsu + cnod * cossu
+        uy = xmy * sinsu + snod * cossu
+        uz = sini * sinsu
+        vx = xmx * cossu - cnod * sinsu
+        vy = xmy * cossu - snod * sinsu
+        vz = sini * cossu
+
+        position = np.stack([ux, uy, uz], axis=-1) * (mrt * EARTH_RADIUS)[..., None]
+        velocity = (np.stack([ux, uy, uz], axis=-1) * mvt[..., None]
+                    + np.stack([vx, vy, vz], axis=-1) * rvdot[..., None]) * VELOCITY_SCALE
+
+    errors[(mrt < 1.0) & (errors == 0)] = 6
+    errors[~np.isfinite(mrt) & (errors == 0)] = 1
+    return position, velocity, errors
+
+
+def Site_Position(latitude, longitude, height):
+    """
+    Earth fixed position (km) of a site, from WGS84 latitude, longitude
+    (degrees, east positive) and height (metres).
+    """
+    lat, lon = math.radians(latitude), math.radians(longitude)
+    e2 = WGS84_FLATTENING * (2 - WGS84_FLATTENING)
+    n = WGS84_RADIUS / math.sqrt(1 - e2 * math.sin(lat) ** 2)
+    h = height / 1000.0
+    return np.array([(n + h) * math.cos(lat) * math.cos(lon),
+                     (n + h) * math.cos(lat) * math.sin(lon),
+                     (n * (1 - e2) + h) * math.sin(lat)])
+
+
+def Site_Coordinates(site):
+    """
+    (latitude, longitude, height) of an LD_PWI_Status.Site_Status or of a
+    tuple of them.
+    """
+    if hasattr(site, "latitude"):
+        return site.latitude, site.longitude, site.height
+    latitude, longitude, height = site
+    return latitude, longitude, height
+
+
+def Topocentric(position, times, site):
+    """
+    Altitude, azimuth (degrees) and distance (km) from site of TEME
+    positions (..., times, 3) at unix times. site as for TLE_Array.AltAz.
+    """
+    latitude, longitude, height = Site_Coordinates(site)
+    theta = GMST(times)
+    cos_Theta, sin_Theta = np.cos(theta), np.sin(theta)
+
+    # TEME to earth fixed is a rotation about z by GMST.
+    x = cos_Theta * position[..., 0] + sin_Theta * position[..., 1]
+    y = -sin_Theta * position[..., 0] + cos_Theta * position[..., 1]
+    z = position[..., 2]
+
+    site_X, site_Y, site_Z = Site_Position(latitude, longitude, height)
+    dx, dy, dz = x - site_X, y - site_Y, z - site_Z
+
+    lat, lon = math.radians(latitude), math.radians(longitude)
+    sin_Lat, cos_Lat = math.sin(lat), math.cos(lat)
+    sin_Lon, cos_Lon = math.sin(lon), math.cos(lon)
+    east = -sin_Lon * dx + cos_Lon * dy
+    north = -sin_Lat * cos_Lon * dx - sin_Lat * sin_Lon * dy + cos_Lat * dz
+    up = cos_Lat * cos_Lon * dx + cos_Lat * sin_Lon * dy + sin_Lat * dz
+
+    alt = np.degrees(np.arctan2(up, np.hypot(east, north)))
+    az = np.degrees(np.arctan2(east, north)) % 360.0
+    return alt, az, np.sqrt(dx * dx + dy * dy + dz * dz)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
+
+    iss = LD_MyTLE(["ISS (ZARYA)",
+                    "1 25544U 98067A   20140.34419374 -.00000374  00000-0  13653-5 0  9990",
+                    "2 25544  51.6433 131.2277 0001338 330.3524 173.1622 15.49372617227549"])
+    print(iss.Dict)
+
+    site = (51.4585, -2.6021, 51.0)
+    times = iss.epoch + np.arange(0, 86400, 60)
+    alt, az, distance = iss.AltAz(times, site)
+    for t, a, z, d in zip(times, alt, az, distance):
+        if a > 0:
+            print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(t))} "
+                  f"alt {a:6.2f} az {z:6.2f} range {d:7.1f} km")
+
+    satellites = TLE_Array([iss] * 5000)
+    start = time.perf_counter()
+    alt, az, distance = satellites.AltAz(iss.epoch + np.arange(0, 8 * 3600, 60), site)
+    print(f"{alt.size} positions in {time.perf_counter() - start:.2f} s")
@@ -0,0 +1,333 @@
+"""
+A local gateway that is the only client of PWI4, for sites where several
+programs want the mount at once.
+
+It polls /status at a fixed rate and answers every client's /status from
+that cache, so PWI4 sees one poller however many programs are watching.
+Any other request (commands) is passed through to PWI4 one at a time and
+the reply handed back unchanged. It speaks the same HTTP API as PWI4 so
+LD_Planewave and pwi4_client just point at it instead.
+
+Clients that want every status sample can subscribe to /events, a
+Server-Sent Events stream with one event per new status (see Events()).
+/metrics has the gateway's request metrics for PWI4 in Prometheus format.
+
+    python LD_PWI_Gateway.py --pwi4 http://192.168.1.10:8220 --port 8221 --rate 10
+"""
+
+import argparse
+import http.server
+import logging
+import socket
+import sys
+import threading
+import time
+import urllib.parse
+
+import requests
+
+import LD_PWI_Status
+import LD_Planewave
+
+log = logging.getLogger(__name__)
+
+# Seconds between keep-alive comments on an idle event stream, so clients
+# and proxies can tell a quiet stream from a dead one.
+HEARTBEAT = 15
+# Missed polls after which the cached status is too old to hand out, e.g.
+# because PWI4 has gone away.
+STALE_POLLS = 5
+
+
+class LD_PWI_Gateway:
+    """
+    Caching, serialising front end for one PWI4. mount_Kwargs go to the
+    LD_Planewave used to talk to PWI4. A cached status older than
+    stale_Polls poll intervals isn't handed out, not counting time the
+    poller spent queued behind a slow command (PWI4 is busy, not gone).
+    """
+
+    def __init__(self, ip_Address="http://127.0.0.1", port="8220",
+                 host="127.0.0.1", listen_Port=8221, rate_Hz=10, stale_Polls=STALE_POLLS,
+                 **mount_Kwargs):
+        self.mount = LD_Planewave.LD_Planewave(ip_Address, port, **mount_Kwargs)
+        self.host = host
+        self.listen_Port = listen_Port
+        self.rate_Hz = rate_Hz
+        self.max_Age = stale_Polls / rate_Hz
+
+        # Only one command goes to PWI4 at a time.
+        self._command_Lock = threading.Lock()
+
+        # The newest /status body, how many there have been and when the
+        # newest arrived. Waiters on _condition are woken by each new one.
+        self._condition = threading.Condition()
+        self._body = None
+        self._sequence = 0
+        self._received = None
+        # Seconds the poller has waited for _command_Lock since the newest
+        # status, and when its current wait started (None if not waiting).
+        self._poll_Waited = 0.0
+        self._poll_Wait_Start = None
+
+        self._stop = threading.Event()
+        self.server = None
+        self._poller = None
+
+    def Start(self):
+        gateway = self
+
+        class Handler(_Request_Handler):
+            gw = gateway
+
+        self._stop.clear()
+        self._poller = threading.Thread(target=self._Poll_Loop, name="LD_PWI_Gateway poller",
+                                        daemon=True)
+        self._poller.start()
+
+        self.server = http.server.ThreadingHTTPServer((self.host, self.listen_Port), Handler)
+        self.server.daemon_threads = True
+        self.listen_Port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       name="LD_PWI_Gateway", daemon=True)
+        self.thread.start()
+        log.info(f"Gateway to {self.mount.base_Url} on {self.base_Url}")
+
+    def Stop(self):
+        self._stop.set()
+        # Wake any event streams so they notice.
+        with self._condition:
+            self._condition.notify_all()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.thread.join()
+            self.server = None
+        if self._poller is not None:
+            self._poller.join()
+            self._poller = None
+        self.mount.Close()
+
+    def __enter__(self):
+        self.Start()
+        return self
+
+    def __exit__(self, *exc_Info):
+        self.Stop()
+
+    @property
+    def base_Url(self):
+        return f"http://{self.host}:{self.listen_Port}"
+
+    def _Publish(self, body):
+        with self._condition:
+            self._body = body
+            self._sequence += 1
+            self._received = time.monotonic()
+            self._poll_Waited = 0.0
+            self._condition.notify_all()
+
+    def _Take_Status(self, response):
+        # Status bodies start with the version, images and the like don't.
+        if response.status_code == 200 and response.content.startswith(b"pwi4.version="):
+            self._Publish(response.content)
+
+    def _Poll_Loop(self):
+        interval = 1 / self.rate_Hz
+        next_Poll = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                self._Poll()
+            except Exception as e:
+                log.warning(f"Status poll failed: {e}")
+
+            next_Poll = max(next_Poll + interval, time.monotonic())
+            self._stop.wait(next_Poll - time.monotonic())
+
+    def _Poll(self):
+        """
+        Fetch /status for the cache, noting how long it waits for a
+        command to finish first.
+        """
+        with self._condition:
+            self._poll_Wait_Start = time.monotonic()
+        with self._command_Lock:
+            with self._condition:
+                self._poll_Waited += time.monotonic() - self._poll_Wait_Start
+                self._poll_Wait_Start = None
+            response = self.mount._Request(f"{self.mount.base_Url}/status", {})
+        self._Take_Status(response)
+
+    def Forward(self, target):
+        """
+        Send target (path and query, without the leading "/") to PWI4 and
+        return the transport's reply, unparsed as it may be an image.
+        Status replies, which most commands also give, freshen the cache
+        so clients never see a status older than their own command.
+        """
+        with self._command_Lock:
+            response = self.mount._Request(f"{self.mount.base_Url}/{target}", {})
+        self._Take_Status(response)
+        return response
+
+    def Cached_Status(self):
+        """
+        The newest /status body and its sequence number, asking PWI4 if
+        nothing has arrived yet. The body is None if there's no status or
+        it's more than max_Age seconds old, leaving out any time the poller
+        has waited behind commands.
+        """
+        with self._condition:
+            now = time.monotonic()
+            body, sequence, received = self._body, self._sequence, self._received
+            waited = self._poll_Waited
+            if self._poll_Wait_Start is not None:
+                waited += now - self._poll_Wait_Start
+        if body is not None and now - received - waited > self.max_Age:
+            return None, sequence
+        if body is None:
+            response = self.Forward("status")
+            if response.status_code != 200:
+                return None, 0
+            with self._condition:
+                body, sequence = self._body, self._sequence
+        return body, sequence
+
+    def Wait_For_Status(self, after_Sequence, timeout):
+        """
+        Wait for a status newer than after_Sequence. Returns the body and
+        its sequence, or (None, after_Sequence) on timeout or when the
+        gateway is stopping.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._sequence != after_Sequence or self._stop.is_set(), timeout)
+            if self._sequence == after_Sequence or self._stop.is_set():
+                return None, after_Sequence
+            return self._body, self._sequence
+
+
+class _Request_Handler(http.server.BaseHTTPRequestHandler):
+    """
+    HTTP/1.1 with keep-alive, like PWI4. The gateway is attached as gw.
+    """
+
+    protocol_version = "HTTP/1.1"
+    gw = None
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_GET(self):
+        path = urllib.parse.urlsplit(self.path).path
+
+        if path == "/events":
+            self._Stream_Events()
+            return
+
+        try:
+            if path == "/status":
+                body, _ = self.gw.Cached_Status()
+                if body is None:
+                    self._Reply(502, "text/plain", b"No recent status from PWI4")
+                else:
+                    self._Reply(200, "text/plain", body)
+            elif path == "/metrics":
+                self._Reply(200, "text/plain; version=0.0.4",
+                            self.gw.mount.metrics.Prometheus().encode())
+            else:
+                response = self.gw.Forward(self.path.lstrip("/"))
+                self._Reply(response.status_code,
+                            response.headers.get("Content-Type", "text/plain"),
+                            response.content)
+        except Exception as e:
+            # Couldn't reach PWI4 (requests' exceptions) or anything else
+            # that went wrong, the client still gets a reply.
+            log.warning(f"Couldn't reach PWI4 for {self.path}: {e}")
+            self._Reply(502, "text/plain", f"Couldn't reach PWI4: {e}".encode())
+
+    def _Reply(self, code, content_Type, body):
+        # Headers and body in one write, otherwise Nagle's algorithm and
+        # delayed ACKs add ~40 ms to every keep-alive request.
+        reason = self.responses.get(code, ("",))[0]
+        self.wfile.write(
+            (f"HTTP/1.1 {code} {reason}\r\n"
+             f"Content-Type: {content_Type}\r\n"
+             f"Content-Length: {len(body)}\r\n\r\n").encode("latin-1") + body)
+
+    def _Stream_Events(self):
+        """
+        Send every new status as an event until the client goes away. Each
+        line of the status is a "data:" line of the event.
+        """
+        self.close_connection = True
+        self.wfile.write(b"HTTP/1.1 200 OK\r\n"
+                         b"Content-Type: text/event-stream\r\n"
+                         b"Cache-Control: no-cache\r\n"
+                         b"Connection: close\r\n\r\n")
+
+        try:
+            try:
+                body, sequence = self.gw.Cached_Status()
+            except Exception as e:
+                # No status yet and PWI4 can't be reached, heartbeat until
+                # the poller gets one.
+                log.warning(f"Couldn't reach PWI4 for {self.path}: {e}")
+                body, sequence = None, 0
+            while not self.gw._stop.is_set():
+                if body is None:
+                    self.wfile.write(b": heartbeat\n\n")
+                else:
+                    lines = b"".join(b"data: " + line + b"\n" for line in body.splitlines())
+                    self.wfile.write(b"id: %d\n%s\n" % (sequence, lines))
+                body, sequence = self.gw.Wait_For_Status(sequence, HEARTBEAT)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        log.debug(format % args)
+
+
+def Events(base_Url, timeout=(3.05, 2 * HEARTBEAT)):
+    """
+    Subscribe to a gateway's /events and yield each status as an
+    LD_PWI_Status, e.g.
+
+    for status in LD_PWI_Gateway.Events("http://127.0.0.1:8221"):
+        print(status.mount.altitude)
+
+    Each status is a new object, so they can be kept.
+    """
+    with requests.get(f"{base_Url}/events", stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        lines = []
+        for line in response.iter_lines():
+            if line.startswith(b"data: "):
+                lines.append(line[6:])
+            elif not line and lines:
+                status = LD_PWI_Status.LD_PWI_Status()
+                status.Update(b"\n".join(lines))
+                lines = []
+                yield status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pwi4", default="http://127.0.0.1:8220",
+                        help="Where PWI4 is")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8221)
+    parser.add_argument("--rate", type=float, default=10,
+                        help="Status polls per second")
+    args = parser.parse_args()
+
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+    pwi4_Address, _, pwi4_Port = args.pwi4.rpartition(":")
+    gateway = LD_PWI_Gateway(pwi4_Address, pwi4_Port, args.host, args.port, args.rate)
+    gateway.Start()
+    try:
+        gateway.thread.join()
+    except KeyboardInterrupt:
+        gateway.Stop()
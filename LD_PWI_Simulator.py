@@ -0,0 +1,945 @@
+"""
+A stand-in for PWI4 for testing and benchmarking without a telescope.
+
+Speaks the same HTTP API (/status, /mount/*, /focuser/*, /rotator/*, /m3/*,
+/virtualcamera/take_image) and models an Alt-Az mount whose axes slew with
+limited acceleration and speed then settle, so clients see realistic
+is_slewing / dist_to_target behaviour. Latency and jitter can be injected
+into every reply. It can also serve the older PWI TCP protocol (see
+LD_Planewave_TCP).
+
+    python LD_PWI_Simulator.py --port 8220 --latency 0.005 --jitter 0.002
+"""
+
+import argparse
+import http.server
+import logging
+import math
+import random
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+import urllib.parse
+
+import LD_PWI_Status
+
+log = logging.getLogger(__name__)
+
+# Seconds between kinematic integration steps.
+STEP = 0.01
+# Axes settled on their target only need carrying along, so catching up
+# on a long gap (nobody asked for a status in a while) takes steps this
+# long while they stay settled, all but the last SETTLED_TAIL seconds.
+SETTLED_STEP = 1.0
+SETTLED_TAIL = 2.0
+# How close (arcsec) an axis has to be to count as arrived.
+ARRIVED_ARCSEC = 1.0
+
+# How many argument lines follow each TCP protocol command.
+TCP_ARGUMENTS = {
+    "status": 0, "gotoradecapp": 2, "tle": 3, "track": 0, "stop": 0,
+    "settimeoffset": 1, "radecoffset": 2, "pulseguide": 2,
+    }
+# Pulse guiding rate, arcsec/sec (half sidereal).
+GUIDE_RATE = 7.5
+
+
+def Local_Sidereal_Time(unix_Time, longitude_Degrees):
+    """
+    Local mean sidereal time in hours.
+    """
+    days = unix_Time / 86400 + 2440587.5 - 2451545.0
+    gmst = 18.697374558 + 24.06570982441908 * days
+    return (gmst + longitude_Degrees / 15) % 24
+
+
+def AltAz_To_RaDec(alt_Degrees, az_Degrees, lst_Hours, latitude_Degrees):
+    alt, az, lat = map(math.radians, (alt_Degrees, az_Degrees, latitude_Degrees))
+    dec = math.asin(math.sin(alt) * math.sin(lat)
+                    + math.cos(alt) * math.cos(lat) * math.cos(az))
+    ha = math.atan2(-math.sin(az) * math.cos(alt),
+                    math.sin(alt) * math.cos(lat) - math.cos(alt) * math.sin(lat) * math.cos(az))
+    ra_Hours = (lst_Hours - math.degrees(ha) / 15) % 24
+    return ra_Hours, math.degrees(dec)
+
+
+def RaDec_To_AltAz(ra_Hours, dec_Degrees, lst_Hours, latitude_Degrees):
+    ha = math.radians((lst_Hours - ra_Hours) * 15)
+    dec, lat = math.radians(dec_Degrees), math.radians(latitude_Degrees)
+    alt = math.asin(math.sin(dec) * math.sin(lat)
+                    + math.cos(dec) * math.cos(lat) * math.cos(ha))
+    az = math.atan2(-math.sin(ha) * math.cos(dec),
+                    math.sin(dec) * math.cos(lat) - math.cos(dec) * math.sin(lat) * math.cos(ha))
+    return math.degrees(alt), math.degrees(az) % 360
+
+
+class Sim_Axis:
+    """
+    One mount axis. Chases its target with a trapezoidal velocity profile
+    (limited acceleration and speed) and reports slewing until it has
+    been on target for settle_Time.
+    """
+
+    def __init__(self, position, max_Velocity=10.0, acceleration=5.0, settle_Time=0.5):
+        self.position = position
+        self.velocity = 0.0
+        self.max_Velocity = max_Velocity
+        self.acceleration = acceleration
+        self.settle_Time = settle_Time
+
+        self.is_enabled = False
+        self.dist_to_target = 0.0
+        self.settled_At = None
+
+        # Offsets requested through /mount/offset, in arcsec (and arcsec/sec)
+        self.offset = 0.0
+        self.offset_Rate = 0.0
+
+    def Step(self, dt, target, target_Rate, now):
+        """
+        Advance by dt seconds towards target (degrees, None to just stop)
+        which is itself moving at target_Rate degrees/sec.
+        """
+        if not self.is_enabled:
+            self.velocity = 0.0
+            self.dist_to_target = 0.0
+            return
+
+        self.offset += self.offset_Rate * dt
+
+        if target is None:
+            desired = 0.0
+            error = 0.0
+        else:
+            target += self.offset / 3600
+            if (self.settled_At is not None
+                    and abs(target - (target_Rate + self.offset_Rate / 3600) * dt - self.position)
+                    < ARRIVED_ARCSEC / 3600):
+                # Locked on and the target hasn't jumped, just follow it.
+                # Put through the approach below, a long step would
+                # overshoot by more than the lock.
+                self.position = target
+                self.velocity = target_Rate
+                self.dist_to_target = 0.0
+                return
+            # target is where it'll be at the end of the step, which for a
+            # satellite is well past ARRIVED_ARCSEC from where it is now.
+            error = target - target_Rate * dt - self.position
+            # Fastest speed we can still stop from in the remaining distance.
+            approach = min(self.max_Velocity, math.sqrt(2 * self.acceleration * abs(error)))
+            desired = target_Rate + math.copysign(approach, error)
+
+        max_Change = self.acceleration * dt
+        self.velocity += min(max(desired - self.velocity, -max_Change), max_Change)
+        self.position += self.velocity * dt
+
+        if target is None:
+            self.dist_to_target = 0.0
+            if self.velocity != 0.0:
+                self.settled_At = None
+            elif self.settled_At is None:
+                self.settled_At = now
+            return
+
+        self.dist_to_target = (target - self.position) * 3600
+        if abs(self.dist_to_target) < ARRIVED_ARCSEC:
+            # Close enough, lock on rather than hunting round the target.
+            self.position = target
+            self.velocity = target_Rate
+            self.dist_to_target = 0.0
+            if self.settled_At is None:
+                self.settled_At = now + self.settle_Time
+        else:
+            self.settled_At = None
+
+    def Is_Moving(self, now):
+        if not self.is_enabled:
+            return False
+        return self.settled_At is None or now < self.settled_At
+
+    def Servo_Error(self):
+        # Noise on top of a lag that grows with speed.
+        return random.gauss(0, 0.05) + self.velocity * 0.01
+
+
+class Sim_Mount:
+    """
+    An Alt-Az mount: axis0 is azimuth and axis1 altitude.
+    """
+
+    def __init__(self, latitude, longitude, height, clock_Offset=0.0):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.height = height
+        # Seconds PWI4's clock is ahead of ours, to mimic clock skew.
+        self.clock_Offset = clock_Offset
+        # Seconds added to the time targets are worked out for (the TCP
+        # protocol's settimeoffset).
+        self.time_Offset = 0.0
+
+        self.is_connected = False
+        self.axis0 = Sim_Axis(0.0)
+        self.axis1 = Sim_Axis(45.0)
+
+        # What the mount is pointing at:
+        #     None: nothing, stopped
+        #     ("altaz", alt, az): fixed position, not tracking
+        #     ("radec", ra, dec): tracking a sidereal target
+        #     ("tle", alt, az, alt_Rate, az_Rate, start): moving target
+        #     ("satellite", first, step, alts, azs): a followed TLE's track,
+        #         a sample every step seconds of PWI4's clock from first
+        self.target = None
+        self.park_Position = (0.0, 0.0)  # (alt, az)
+        self.drift = (0.0, 0.0)  # arcsec/sec tracking error on (axis0, axis1)
+        # [offset arcsec, rate arcsec/sec] along and across a followed
+        # satellite's direction of travel.
+        self.track_Offsets = {"path": [0.0, 0.0], "transverse": [0.0, 0.0]}
+
+        self.model_Filename = "DefaultModel.pxp"
+        self.model_Points_Total = 0
+        self.model_Points_Enabled = 0
+
+        self.last_Step = time.time()
+
+    def Lst(self, now):
+        return Local_Sidereal_Time(now + self.clock_Offset, self.longitude)
+
+    def Target_AltAz(self, now):
+        """
+        (alt, az, alt_Rate, az_Rate) the mount should be at, or None.
+        """
+        if self.target is None:
+            return None
+        now += self.time_Offset
+        kind = self.target[0]
+        if kind == "altaz":
+            return self.target[1], self.target[2], 0.0, 0.0
+        if kind == "radec":
+            alt, az = RaDec_To_AltAz(self.target[1], self.target[2], self.Lst(now), self.latitude)
+            alt_Next, az_Next = RaDec_To_AltAz(self.target[1], self.target[2],
+                                               self.Lst(now + 1), self.latitude)
+            az_Rate = (az_Next - az + 180) % 360 - 180
+            # Keep the azimuth target continuous with where the axis is.
+            az = self.axis0.position + (az - self.axis0.position + 180) % 360 - 180
+            return alt, az, alt_Next - alt, az_Rate
+        if kind == "tle":
+            _, alt, az, alt_Rate, az_Rate, start = self.target
+            return (alt + alt_Rate * (now - start), az + az_Rate * (now - start),
+                    alt_Rate, az_Rate)
+        if kind == "satellite":
+            return self._Track_AltAz(now)
+
+    def _Track_AltAz(self, now):
+        """
+        Where a followed satellite is, interpolated from its track using
+        PWI4's (maybe skewed) clock, plus any path/transverse offsets.
+        """
+        _, first, step, alts, azs = self.target
+        position = (now + self.clock_Offset - first) / step
+        i = min(max(int(position), 0), len(alts) - 2)
+        fraction = position - i
+        alt_Rate = (alts[i + 1] - alts[i]) / step
+        az_Rate = (azs[i + 1] - azs[i]) / step
+        alt = alts[i] + alt_Rate * step * fraction
+        az = azs[i] + az_Rate * step * fraction
+
+        path = self.track_Offsets["path"][0]
+        transverse = self.track_Offsets["transverse"][0]
+        cos_Alt = max(math.cos(math.radians(alt)), 1e-6)
+        speed = math.hypot(alt_Rate, az_Rate * cos_Alt)
+        if (path or transverse) and speed > 0:
+            # Unit vector of the motion as (up, east on the sky).
+            up, east = alt_Rate / speed, az_Rate * cos_Alt / speed
+            alt += (path * up + transverse * east) / 3600
+            az += (path * east - transverse * up) / 3600 / cos_Alt
+
+        az = self.axis0.position + (az - self.axis0.position + 180) % 360 - 180
+        return alt, az, alt_Rate, az_Rate
+
+    def Advance(self, now):
+        """
+        Integrate the axes up to time now.
+        """
+        while self.last_Step < now:
+            if now - self.last_Step > SETTLED_TAIL and not self.Is_Slewing(self.last_Step):
+                dt = min(SETTLED_STEP, now - SETTLED_TAIL - self.last_Step)
+            else:
+                dt = min(STEP, now - self.last_Step)
+            self.last_Step += dt
+            target = self.Target_AltAz(self.last_Step)
+            if target is None:
+                self.axis0.Step(dt, None, 0.0, self.last_Step)
+                self.axis1.Step(dt, None, 0.0, self.last_Step)
+            else:
+                alt, az, alt_Rate, az_Rate = target
+                for offset in self.track_Offsets.values():
+                    offset[0] += offset[1] * dt
+                self.axis0.Step(dt, az, az_Rate, self.last_Step)
+                self.axis1.Step(dt, alt, alt_Rate, self.last_Step)
+                if self.target[0] != "altaz":
+                    # Imperfect tracking for a guider to correct. It builds
+                    # up in the offsets, moving the position directly would
+                    # just be servoed straight back out.
+                    self.axis0.offset += self.drift[0] * dt
+                    self.axis1.offset += self.drift[1] * dt
+
+    def Is_Slewing(self, now):
+        return self.axis0.Is_Moving(now) or self.axis1.Is_Moving(now)
+
+    def Goto_AltAz(self, alt, az):
+        self.target = ("altaz", alt, az)
+        self.Reset_Offsets()
+
+    def Goto_RaDec(self, ra, dec):
+        self.target = ("radec", ra, dec)
+        self.Reset_Offsets()
+
+    def Follow_Moving(self, now, alt_Rate=0.0, az_Rate=0.05):
+        """
+        Stand in for following a TLE: a target that starts 10 degrees from
+        here and moves steadily, enough to exercise clients' tracking code.
+        """
+        alt = min(self.axis1.position + 10, 80)
+        self.target = ("tle", alt, self.axis0.position + 10, alt_Rate, az_Rate, now)
+        self.Reset_Offsets()
+
+    def Follow_TLE(self, now, lines, duration=7200):
+        """
+        Follow a satellite, its track worked out each second of the next
+        duration seconds with LD_MyTLE. If the TLE can't be propagated (e.g.
+        it's years old) fall back to Follow_Moving.
+        """
+        # Imported here so the simulator only needs NumPy for this.
+        import numpy as np
+        import LD_MyTLE
+
+        tle = LD_MyTLE.LD_MyTLE(lines)
+        # Starting a while back leaves room for time offsets either way.
+        times = now + self.clock_Offset + np.arange(-600.0, duration)
+        alt, az, _ = tle.AltAz(times, (self.latitude, self.longitude, self.height))
+        if not np.isfinite(alt).all():
+            log.warning(f"Can't propagate TLE {tle.name} to now, following a stand in")
+            self.Follow_Moving(now)
+            return
+        # No jumps at 0/360 so the track can be interpolated.
+        az = np.degrees(np.unwrap(np.radians(az)))
+        self.target = ("satellite", float(times[0]), 1.0, alt.tolist(), az.tolist())
+        self.Reset_Offsets()
+
+    def Track_Here(self, now):
+        ra, dec = AltAz_To_RaDec(self.axis1.position, self.axis0.position % 360,
+                                 self.Lst(now), self.latitude)
+        self.Goto_RaDec(ra, dec)
+
+    def Stop(self):
+        self.target = None
+
+    def Reset_Offsets(self):
+        for axis in (self.axis0, self.axis1):
+            axis.offset = 0.0
+            axis.offset_Rate = 0.0
+        for offset in self.track_Offsets.values():
+            offset[:] = [0.0, 0.0]
+
+    def Offset(self, params):
+        """
+        Apply /mount/offset parameters. Offsets in ra/dec are applied to
+        axis0/axis1 respectively, near enough for a simulator. path and
+        transverse offsets only do anything while following a satellite.
+        """
+        axes = {"axis0": self.axis0, "axis1": self.axis1,
+                "ra": self.axis0, "dec": self.axis1}
+        for key, value in params.items():
+            name, _, action = key.partition("_")
+            if name in self.track_Offsets:
+                offset = self.track_Offsets[name]
+                if action == "reset":
+                    offset[:] = [0.0, 0.0]
+                elif action == "stop_rate":
+                    offset[1] = 0.0
+                elif action == "add_arcsec":
+                    offset[0] += float(value)
+                elif action == "set_rate_arcsec_per_sec":
+                    offset[1] = float(value)
+                else:
+                    raise ValueError(f"Unknown offset {key}")
+                continue
+
+            axis = axes.get(name)
+            if axis is None:
+                raise ValueError(f"Unknown offset axis {name}")
+            if action == "reset":
+                axis.offset = 0.0
+                axis.offset_Rate = 0.0
+            elif action == "stop_rate":
+                axis.offset_Rate = 0.0
+            elif action == "add_arcsec":
+                axis.offset += float(value)
+            elif action == "set_rate_arcsec_per_sec":
+                axis.offset_Rate = float(value)
+            else:
+                raise ValueError(f"Unknown offset {key}")
+
+
+class Sim_Mover:
+    """
+    Something (focuser, rotator, m3) that moves to a position at a fixed
+    speed.
+    """
+
+    def __init__(self, position, speed):
+        self.is_connected = True
+        self.is_enabled = False
+        self.position = position
+        self.speed = speed
+        self.target = position
+        self.last_Step = time.time()
+
+    def Advance(self, now):
+        dt = now - self.last_Step
+        self.last_Step = now
+        if not self.is_enabled:
+            return
+        step = self.speed * dt
+        error = self.target - self.position
+        self.position = self.target if abs(error) <= step else self.position + math.copysign(step, error)
+
+    @property
+    def is_moving(self):
+        return self.position != self.target
+
+
+class LD_PWI_Simulator:
+    """
+    PWI4 stand-in. Start() runs it in a background thread, or use as a
+    context manager:
+
+        with LD_PWI_Simulator(port=0) as sim:
+            mount = LD_Planewave.LD_Planewave("http://127.0.0.1", sim.port)
+    """
+
+    def __init__(self, host="127.0.0.1", port=8220, latency=0.0, jitter=0.0,
+                 latitude=51.4585, longitude=-2.6021, height=51.0,
+                 auto_Connect=False, image_Size=256, arcsec_Per_Pixel=1.0,
+                 tcp_Port=None, clock_Offset=0.0):
+        """
+        latency and jitter (seconds) set the mean and standard deviation of
+        a delay added before every reply. port=0 picks a free port.
+        auto_Connect starts with the mount connected and enabled.
+        tcp_Port, if given, also serves the older PWI TCP protocol there.
+        clock_Offset is how many seconds PWI4's clock is ahead of this
+        machine's, it shows in site.lmst_hours and where satellites are.
+        """
+        self.host = host
+        self.port = port
+        self.tcp_Port = tcp_Port
+        self.latency = latency
+        self.jitter = jitter
+        self.image_Size = image_Size
+        self.arcsec_Per_Pixel = arcsec_Per_Pixel
+
+        self.lock = threading.Lock()
+        self.mount = Sim_Mount(latitude, longitude, height, clock_Offset)
+        self.focuser = Sim_Mover(10000.0, 500.0)
+        self.rotator = Sim_Mover(0.0, 5.0)
+        self.m3 = Sim_Mover(1, 0.5)
+        self.m3.is_enabled = True
+        self.autofocus_Best = 10000.0
+
+        if auto_Connect:
+            self.mount.is_connected = True
+            self.mount.axis0.is_enabled = True
+            self.mount.axis1.is_enabled = True
+
+        self.server = None
+        self.thread = None
+        self.tcp_Server = None
+
+        self.commands = {
+            "/status": self._Status,
+            "/mount/connect": self._Mount_Connect,
+            "/mount/disconnect": self._Mount_Disconnect,
+            "/mount/enable": self._Mount_Enable,
+            "/mount/disable": self._Mount_Disable,
+            "/mount/find_home": self._Mount_Find_Home,
+            "/mount/stop": self._Mount_Stop,
+            "/mount/goto_ra_dec_apparent": self._Mount_Goto_RaDec,
+            "/mount/goto_ra_dec_j2000": self._Mount_Goto_RaDec,
+            "/mount/goto_alt_az": self._Mount_Goto_AltAz,
+            "/mount/offset": self._Mount_Offset,
+            "/mount/park": self._Mount_Park,
+            "/mount/set_park_here": self._Mount_Set_Park_Here,
+            "/mount/tracking_on": self._Mount_Tracking_On,
+            "/mount/tracking_off": self._Mount_Stop,
+            "/mount/follow_tle": self._Mount_Follow_TLE,
+            "/mount/model/add_point": self._Model_Add_Point,
+            "/mount/model/clear_points": self._Model_Clear_Points,
+            "/mount/model/save_as_default": self._Status,
+            "/mount/model/save": self._Model_Filename,
+            "/mount/model/load": self._Model_Filename,
+            "/focuser/enable": self._Enabler(self.focuser, True),
+            "/focuser/disable": self._Enabler(self.focuser, False),
+            "/focuser/goto": self._Focuser_Goto,
+            "/focuser/stop": self._Stopper(self.focuser),
+            "/rotator/enable": self._Enabler(self.rotator, True),
+            "/rotator/disable": self._Enabler(self.rotator, False),
+            "/rotator/goto_mech": self._Rotator_Goto,
+            "/rotator/goto_field": self._Rotator_Goto,
+            "/rotator/offset": self._Rotator_Offset,
+            "/rotator/stop": self._Stopper(self.rotator),
+            "/m3/goto": self._M3_Goto,
+            "/m3/stop": self._Stopper(self.m3),
+            "/virtualcamera/take_image": self._Take_Image,
+            }
+
+    ### Running the server ###
+
+    def Start(self):
+        simulator = self
+
+        class Handler(_Request_Handler):
+            sim = simulator
+
+        self.server = http.server.ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       name="LD_PWI_Simulator", daemon=True)
+        self.thread.start()
+        log.info(f"Simulated PWI4 on {self.base_Url}")
+
+        if self.tcp_Port is not None:
+            class TCP_Handler(_TCP_Handler):
+                sim = simulator
+
+            self.tcp_Server = socketserver.ThreadingTCPServer((self.host, self.tcp_Port),
+                                                              TCP_Handler)
+            self.tcp_Server.daemon_threads = True
+            self.tcp_Port = self.tcp_Server.server_address[1]
+            self.tcp_Thread = threading.Thread(target=self.tcp_Server.serve_forever,
+                                               name="LD_PWI_Simulator TCP", daemon=True)
+            self.tcp_Thread.start()
+            log.info(f"Simulated PWI TCP protocol on {self.host}:{self.tcp_Port}")
+
+    def Stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.thread.join()
+            self.server = None
+        if self.tcp_Server is not None:
+            self.tcp_Server.shutdown()
+            self.tcp_Server.server_close()
+            self.tcp_Thread.join()
+            self.tcp_Server = None
+
+    def __enter__(self):
+        self.Start()
+        return self
+
+    def __exit__(self, *exc_Info):
+        self.Stop()
+
+    @property
+    def base_Url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def Handle(self, path, params):
+        """
+        Run one command. Returns (HTTP status code, content type, body).
+        """
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+
+        if path == "/internal/crash":
+            return 500, "text/plain", b"Simulated internal error"
+
+        command = self.commands.get(path)
+        if command is None:
+            return 404, "text/plain", f"Command not found: {path}".encode()
+
+        with self.lock:
+            now = time.time()
+            self.mount.Advance(now)
+            for mover in (self.focuser, self.rotator, self.m3):
+                mover.Advance(now)
+            try:
+                result = command(params, now)
+            except (KeyError, ValueError) as e:
+                return 400, "text/plain", f"Bad request: {e}".encode()
+            if isinstance(result, bytes):
+                return 200, "application/octet-stream", result
+            return 200, "text/plain", self.Status_Text(now).encode()
+
+    def Handle_TCP(self, command, args):
+        """
+        Run one TCP protocol command, args are its argument lines. Returns
+        the reply text.
+        """
+        if command == "status":
+            _, _, body = self.Handle("/status", {})
+            values = dict(line.partition("=")[::2] for line in body.decode().splitlines())
+            lines = ["beginstatus"]
+            for tcp_Key, key in LD_PWI_Status.TCP_STATUS_KEYS.items():
+                value = {"true": "1", "false": "0"}.get(values[key], values[key])
+                lines.append(f"{tcp_Key}={value}")
+            lines.append("endstatus")
+            return "".join(f"{line}\r\n" for line in lines)
+
+        if command == "settimeoffset":
+            try:
+                offset = float(args[0])
+            except ValueError as e:
+                return f"ERROR {e}\r\n"
+            with self.lock:
+                self.mount.time_Offset = offset
+            return "OK\r\n"
+
+        if command == "gotoradecapp":
+            path, params = "/mount/goto_ra_dec_apparent", {"ra_hours": args[0], "dec_degs": args[1]}
+        elif command == "tle":
+            path, params = "/mount/follow_tle", dict(zip(("line0", "line1", "line2"), args))
+        elif command == "track":
+            path, params = "/mount/tracking_on", {}
+        elif command == "stop":
+            path, params = "/mount/stop", {}
+        elif command == "radecoffset":
+            path, params = "/mount/offset", {"ra_add_arcsec": args[0], "dec_add_arcsec": args[1]}
+        elif command == "pulseguide":
+            try:
+                direction, duration = int(args[0]), int(args[1])
+            except ValueError as e:
+                return f"ERROR {e}\r\n"
+            if direction not in (0, 1, 2, 3):
+                return f"ERROR Unknown direction {direction}\r\n"
+            # North, south, east, west.
+            axis = "dec" if direction < 2 else "ra"
+            sign = 1 if direction % 2 == 0 else -1
+            path = "/mount/offset"
+            params = {f"{axis}_add_arcsec": sign * GUIDE_RATE * duration / 1000}
+        else:
+            return "UNRECOGNIZED\r\n"
+
+        code, _, body = self.Handle(path, params)
+        if code == 200:
+            return "OK\r\n"
+        return f"ERROR {body.decode()}\r\n"
+
+    ### Status ###
+
+    def Status_Text(self, now):
+        mount = self.mount
+        alt = mount.axis1.position
+        az = mount.axis0.position % 360
+        lst = mount.Lst(now)
+        ra, dec = AltAz_To_RaDec(alt, az, lst, mount.latitude)
+        if mount.target is not None and mount.target[0] == "radec":
+            target_Ra, target_Dec = mount.target[1], mount.target[2]
+        else:
+            target_Ra, target_Dec = ra, dec
+
+        def Bool(value):
+            return "true" if value else "false"
+
+        lines = [
+            "pwi4.version=4.0.99 simulator",
+            f"site.latitude_degs={mount.latitude}",
+            f"site.longitude_degs={mount.longitude}",
+            f"site.height_meters={mount.height}",
+            f"site.lmst_hours={lst}",
+            f"mount.is_connected={Bool(mount.is_connected)}",
+            "mount.geometry=0",
+            f"mount.ra_apparent_hours={ra}",
+            f"mount.dec_apparent_degs={dec}",
+            f"mount.ra_j2000_hours={ra}",
+            f"mount.dec_j2000_degs={dec}",
+            f"mount.target_ra_apparent_hours={target_Ra}",
+            f"mount.target_dec_apparent_degs={target_Dec}",
+            f"mount.altitude_degs={alt}",
+            f"mount.azimuth_degs={az}",
+            f"mount.is_slewing={Bool(mount.Is_Slewing(now))}",
+            f"mount.is_tracking={Bool(mount.target is not None and mount.target[0] != 'altaz')}",
+            "mount.field_angle_here_degs=0",
+            "mount.field_angle_at_target_degs=0",
+            "mount.field_angle_rate_at_target_degs_per_sec=0",
+            "mount.path_angle_at_target_degs=0",
+            "mount.path_angle_rate_at_target_degs_per_sec=0",
+            ]
+        for n, axis in enumerate((mount.axis0, mount.axis1)):
+            lines += [
+                f"mount.axis{n}.is_enabled={Bool(axis.is_enabled)}",
+                f"mount.axis{n}.rms_error_arcsec={abs(random.gauss(0, 0.05))}",
+                f"mount.axis{n}.dist_to_target_arcsec={axis.dist_to_target}",
+                f"mount.axis{n}.servo_error_arcsec={axis.Servo_Error()}",
+                f"mount.axis{n}.position_degs={axis.position}",
+                ]
+        lines += [
+            f"mount.model.filename={mount.model_Filename}",
+            f"mount.model.num_points_total={mount.model_Points_Total}",
+            f"mount.model.num_points_enabled={mount.model_Points_Enabled}",
+            "mount.model.rms_error_arcsec=0",
+            f"focuser.is_connected={Bool(self.focuser.is_connected)}",
+            f"focuser.is_enabled={Bool(self.focuser.is_enabled)}",
+            f"focuser.position={self.focuser.position}",
+            f"focuser.is_moving={Bool(self.focuser.is_moving)}",
+            f"rotator.is_connected={Bool(self.rotator.is_connected)}",
+            f"rotator.is_enabled={Bool(self.rotator.is_enabled)}",
+            f"rotator.mech_position_degs={self.rotator.position}",
+            f"rotator.field_angle_degs={self.rotator.position}",
+            f"rotator.is_moving={Bool(self.rotator.is_moving)}",
+            f"rotator.is_slewing={Bool(self.rotator.is_moving)}",
+            f"m3.port={int(round(self.m3.position))}",
+            "autofocus.is_running=false",
+            "autofocus.success=true",
+            f"autofocus.best_position={self.autofocus_Best}",
+            "autofocus.tolerance=4.1",
+            ]
+        return "\n".join(lines) + "\n"
+
+    def _Status(self, params, now):
+        return None
+
+    ### Mount ###
+
+    def _Mount_Connect(self, params, now):
+        self.mount.is_connected = True
+
+    def _Mount_Disconnect(self, params, now):
+        self.mount.is_connected = False
+        self.mount.Stop()
+
+    def _Axes(self, params):
+        axis = int(params["axis"])
+        if axis not in (0, 1):
+            raise ValueError(f"No axis {axis}")
+        return self.mount.axis0 if axis == 0 else self.mount.axis1
+
+    def _Mount_Enable(self, params, now):
+        self._Axes(params).is_enabled = self.mount.is_connected
+
+    def _Mount_Disable(self, params, now):
+        self._Axes(params).is_enabled = False
+
+    def _Mount_Find_Home(self, params, now):
+        self.mount.Goto_AltAz(45.0, 0.0)
+
+    def _Mount_Stop(self, params, now):
+        self.mount.Stop()
+
+    def _Mount_Goto_RaDec(self, params, now):
+        self.mount.Goto_RaDec(float(params["ra_hours"]), float(params["dec_degs"]))
+
+    def _Mount_Goto_AltAz(self, params, now):
+        self.mount.Goto_AltAz(float(params["alt_degs"]), float(params["az_degs"]))
+
+    def _Mount_Offset(self, params, now):
+        self.mount.Offset(params)
+
+    def _Mount_Park(self, params, now):
+        self.mount.Goto_AltAz(*self.mount.park_Position)
+
+    def _Mount_Set_Park_Here(self, params, now):
+        self.mount.park_Position = (self.mount.axis1.position, self.mount.axis0.position)
+
+    def _Mount_Tracking_On(self, params, now):
+        self.mount.Track_Here(now)
+
+    def _Mount_Follow_TLE(self, params, now):
+        if "line1" not in params or "line2" not in params:
+            raise KeyError("TLE needs line1 and line2")
+        self.mount.Follow_TLE(now, [params.get("line0", ""), params["line1"], params["line2"]])
+
+    def _Model_Add_Point(self, params, now):
+        float(params["ra_j2000_hours"]), float(params["dec_j2000_degs"])
+        self.mount.model_Points_Total += 1
+        self.mount.model_Points_Enabled += 1
+
+    def _Model_Clear_Points(self, params, now):
+        self.mount.model_Points_Total = 0
+        self.mount.model_Points_Enabled = 0
+
+    def _Model_Filename(self, params, now):
+        self.mount.model_Filename = params["filename"]
+
+    ### Focuser, rotator, m3 ###
+
+    def _Enabler(self, mover, enable):
+        def Command(params, now):
+            mover.is_enabled = enable
+        return Command
+
+    def _Stopper(self, mover):
+        def Command(params, now):
+            mover.target = mover.position
+        return Command
+
+    def _Focuser_Goto(self, params, now):
+        self.focuser.target = float(params["target"])
+
+    def _Rotator_Goto(self, params, now):
+        self.rotator.target = float(params["degs"])
+
+    def _Rotator_Offset(self, params, now):
+        self.rotator.target = self.rotator.position + float(params["degs"])
+
+    def _M3_Goto(self, params, now):
+        self.m3.target = int(params["port"])
+
+    ### Virtual camera ###
+
+    def _Take_Image(self, params, now):
+        """
+        A FITS image of a fake starfield centred where the mount points.
+        Stars are fixed on the sky so offsets and drift move them.
+        """
+        mount = self.mount
+        ra, dec = AltAz_To_RaDec(mount.axis1.position, mount.axis0.position % 360,
+                                 mount.Lst(now), mount.latitude)
+        pixels = Starfield(ra * 15, dec, self.image_Size, self.arcsec_Per_Pixel)
+        return FITS_Bytes(pixels, {"RA": ra * 15, "DEC": dec})
+
+
+def Starfield(ra_Degrees, dec_Degrees, size, arcsec_Per_Pixel, cell_Arcsec=40.0, seed=0):
+    """
+    Render a size x size image (list of rows of ints) of the sky around
+    ra/dec. The sky is split into cells of cell_Arcsec each holding one
+    star whose position and brightness are fixed by the cell's indices.
+    """
+    half_Arcsec = size * arcsec_Per_Pixel / 2
+    cos_Dec = max(math.cos(math.radians(dec_Degrees)), 1e-6)
+    x_Centre = ra_Degrees * 3600 * cos_Dec
+    y_Centre = dec_Degrees * 3600
+
+    image = [[100.0 + random.gauss(0, 3) for _ in range(size)] for _ in range(size)]
+    sigma = 1.5
+    radius = 4
+
+    first_i = math.floor((x_Centre - half_Arcsec) / cell_Arcsec) - 1
+    first_j = math.floor((y_Centre - half_Arcsec) / cell_Arcsec) - 1
+    cells = int(2 * half_Arcsec / cell_Arcsec) + 3
+    for i in range(first_i, first_i + cells):
+        for j in range(first_j, first_j + cells):
+            rng = random.Random(hash((seed, i, j)))
+            x_Star = (i + rng.random()) * cell_Arcsec
+            y_Star = (j + rng.random()) * cell_Arcsec
+            brightness = 2000 * rng.random() ** 2
+            px = (x_Star - x_Centre + half_Arcsec) / arcsec_Per_Pixel
+            py = (y_Star - y_Centre + half_Arcsec) / arcsec_Per_Pixel
+            for y in range(max(0, int(py) - radius), min(size, int(py) + radius + 1)):
+                row = image[y]
+                for x in range(max(0, int(px) - radius), min(size, int(px) + radius + 1)):
+                    row[x] += brightness * math.exp(-((x - px) ** 2 + (y - py) ** 2) / (2 * sigma ** 2))
+
+    return [[min(int(value), 32767) for value in row] for row in image]
+
+
+def FITS_Bytes(pixels, header_Values):
+    """
+    A minimal 16 bit FITS file of the image (list of rows).
+    """
+    height, width = len(pixels), len(pixels[0])
+    cards = [
+        ("SIMPLE", "T"),
+        ("BITPIX", 16),
+        ("NAXIS", 2),
+        ("NAXIS1", width),
+        ("NAXIS2", height),
+        *header_Values.items(),
+        ]
+    header = "".join(f"{key:<8}= {value:>20}".ljust(80) for key, value in cards)
+    header += "END".ljust(80)
+    header = header.ljust(math.ceil(len(header) / 2880) * 2880).encode("ascii")
+
+    data = b"".join(struct.pack(f">{width}h", *row) for row in pixels)
+    data = data.ljust(math.ceil(len(data) / 2880) * 2880, b"\0")
+    return header + data
+
+
+class _Request_Handler(http.server.BaseHTTPRequestHandler):
+    """
+    HTTP/1.1 with keep-alive, like PWI4. The simulator is attached as sim.
+    """
+
+    protocol_version = "HTTP/1.1"
+    sim = None
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_GET(self):
+        split_Url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(split_Url.query))
+        code, content_Type, body = self.sim.Handle(split_Url.path, params)
+
+        # Headers and body in one write, otherwise Nagle's algorithm and
+        # delayed ACKs add ~40 ms to every keep-alive request.
+        reason = self.responses.get(code, ("",))[0]
+        self.wfile.write(
+            (f"HTTP/1.1 {code} {reason}\r\n"
+             f"Content-Type: {content_Type}\r\n"
+             f"Content-Length: {len(body)}\r\n\r\n").encode("latin-1") + body)
+
+    def log_message(self, format, *args):
+        log.debug(format % args)
+
+
+class _TCP_Handler(socketserver.StreamRequestHandler):
+    """
+    One connection speaking the TCP protocol. The simulator is attached
+    as sim.
+    """
+
+    sim = None
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.strip().decode("ascii")
+            if command == "close":
+                return
+
+            count = TCP_ARGUMENTS.get(command)
+            if count is None:
+                self.wfile.write(b"UNRECOGNIZED\r\n")
+                continue
+            args = [self.rfile.readline().strip().decode("ascii") for _ in range(count)]
+            self.wfile.write(self.sim.Handle_TCP(command, args).encode("ascii"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8220)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Mean delay added to each reply (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="Standard deviation of the delay (seconds)")
+    parser.add_argument("--connected", action="store_true",
+                        help="Start with the mount connected and enabled")
+    parser.add_argument("--tcp-port", type=int, default=None,
+                        help="Also serve the older PWI TCP protocol on this port "
+                             "(PWI uses 8877)")
+    parser.add_argument("--clock-offset", type=float, default=0.0,
+                        help="Seconds the simulated PWI4's clock is ahead of this machine's")
+    args = parser.parse_args()
+
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+    simulator = LD_PWI_Simulator(args.host, args.port, args.latency, args.jitter,
+                                 auto_Connect=args.connected, tcp_Port=args.tcp_port,
+                                 clock_Offset=args.clock_offset)
+    simulator.Start()
+    try:
+        simulator.thread.join()
+    except KeyboardInterrupt:
+        simulator.Stop()
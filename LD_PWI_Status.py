@@ -1,8 +1,242 @@
+import itertools
+import logging
+import operator
+
+log = logging.getLogger(__name__)
+
+
+def _To_Bool(value):
+    return value.lower() == "true"
+
+
+GEOMETRY_MODES = {
+    "0": "Alt-Az",
+    "1": "Equatorial Fork",
+    "2": "German Equatorial"
+    }
+
+
+def _To_Geometry(value):
+    return GEOMETRY_MODES.get(value, value)
+
+
+# Every status key we understand: (PWI4 key, section it belongs to,
+# private attribute it's stored in, converter from the raw string).
+_STATUS_FIELDS = (
+    ("pwi4.version", "", "_version", str),
+
+    ("site.latitude_degs", "site", "_latitude", float),
+    ("site.longitude_degs", "site", "_longitude", float),
+    ("site.height_meters", "site", "_height", float),
+    ("site.lmst_hours", "site", "_lst", float),
+
+    ("mount.is_connected", "mount", "_is_connected", _To_Bool),
+    ("mount.geometry", "mount", "_geometry", _To_Geometry),
+    ("mount.ra_apparent_hours", "mount", "_ra_apparent", float),
+    ("mount.dec_apparent_degs", "mount", "_dec_apparent", float),
+    ("mount.ra_j2000_hours", "mount", "_ra_j2000", float),
+    ("mount.dec_j2000_degs", "mount", "_dec_j2000", float),
+    ("mount.target_ra_apparent_hours", "mount", "_target_ra_apparent", float),
+    ("mount.target_dec_apparent_degs", "mount", "_target_dec_apparent", float),
+    ("mount.altitude_degs", "mount", "_altitude", float),
+    ("mount.azimuth_degs", "mount", "_azimuth", float),
+    ("mount.is_slewing", "mount", "_is_slewing", _To_Bool),
+    ("mount.is_tracking", "mount", "_is_tracking", _To_Bool),
+    ("mount.field_angle_here_degs", "mount", "_field_angle_here", float),
+    ("mount.field_angle_at_target_degs", "mount", "_field_angle_target", float),
+    ("mount.field_angle_rate_at_target_degs_per_sec", "mount", "_field_angle_rate_target", float),
+    ("mount.path_angle_at_target_degs", "mount", "_path_angle_target", float),
+    ("mount.path_angle_rate_at_target_degs_per_sec", "mount", "_path_angle_rate_target", float),
+
+    ("mount.axis0.is_enabled", "mount.axis0", "_is_enabled", _To_Bool),
+    ("mount.axis0.rms_error_arcsec", "mount.axis0", "_rms_error", float),
+    ("mount.axis0.dist_to_target_arcsec", "mount.axis0", "_dist_to_target", float),
+    ("mount.axis0.servo_error_arcsec", "mount.axis0", "_servo_error", float),
+    ("mount.axis0.position_degs", "mount.axis0", "_position", float),
+
+    ("mount.axis1.is_enabled", "mount.axis1", "_is_enabled", _To_Bool),
+    ("mount.axis1.rms_error_arcsec", "mount.axis1", "_rms_error", float),
+    ("mount.axis1.dist_to_target_arcsec", "mount.axis1", "_dist_to_target", float),
+    ("mount.axis1.servo_error_arcsec", "mount.axis1", "_servo_error", float),
+    ("mount.axis1.position_degs", "mount.axis1", "_position", float),
+
+    ("mount.model.filename", "mount.model", "_filename", str),
+    ("mount.model.num_points_total", "mount.model", "_n_points_total", int),
+    ("mount.model.num_points_enabled", "mount.model", "_n_points_enabled", int),
+    ("mount.model.rms_error_arcsec", "mount.model", "_rms_error", float),
+
+    ("focuser.is_connected", "focuser", "_is_connected", _To_Bool),
+    ("focuser.is_enabled", "focuser", "_is_enabled", _To_Bool),
+    ("focuser.position", "focuser", "_position", float),
+    ("focuser.is_moving", "focuser", "_is_moving", _To_Bool),
+
+    ("rotator.is_connected", "rotator", "_is_connected", _To_Bool),
+    ("rotator.is_enabled", "rotator", "_is_enabled", _To_Bool),
+    ("rotator.mech_position_degs", "rotator", "_mech_position", float),
+    ("rotator.field_angle_degs", "rotator", "_field_angle", float),
+    ("rotator.is_moving", "rotator", "_is_moving", _To_Bool),
+    ("rotator.is_slewing", "rotator", "_is_slewing", _To_Bool),
+
+    ("m3.port", "m3", "_port", int),
+
+    ("autofocus.is_running", "autofocus", "_is_running", _To_Bool),
+    ("autofocus.success", "autofocus", "_success", _To_Bool),
+    ("autofocus.best_position", "autofocus", "_best_position", float),
+    ("autofocus.tolerance", "autofocus", "_tolerance", float),
+    )
+
+def _Public_Name(section, attribute):
+    """
+    The dotted path a value is read from, e.g. "mount.axis0.servo_error".
+    """
+    return f"{section}.{attribute[1:]}" if section else attribute[1:]
+
+
+# The sections in the order LD_PWI_Status._Section_Tuple() returns them.
+_SECTION_NAMES = tuple(dict.fromkeys(field[1] for field in _STATUS_FIELDS))
+
+# PWI4 key -> (index into _Section_Tuple(), attribute, converter, public name)
+_FIELD_LOOKUP = {key: (_SECTION_NAMES.index(section), attribute, convert,
+                       _Public_Name(section, attribute))
+                 for key, section, attribute, convert in _STATUS_FIELDS}
+
+
+class _Body_Layout:
+    """
+    Where each line of a status body with these keys (in this order)
+    goes. fields[i] is the _FIELD_LOOKUP entry for line i (None if it
+    isn't one we keep) and Assign(sections, values) converts and stores
+    every value at once. Assign is generated, as straight-line attribute
+    stores are several times quicker than a setattr() per field.
+    """
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.fields = [_FIELD_LOOKUP.get(key) for key in keys]
+
+        converters = {}
+        code = ["def Assign(sections, values):", "    pass"]
+        for position, field in enumerate(self.fields):
+            if field is not None:
+                index, attribute, convert, _ = field
+                convert_Name = converters.setdefault(convert, f"convert_{len(converters)}")
+                code.append(f"    sections[{index}].{attribute} = {convert_Name}(values[{position}])")
+        namespace = {name: convert for convert, name in converters.items()}
+        exec("\n".join(code), namespace)
+        self.Assign = namespace["Assign"]
+
+
+# Layouts by tuple of keys. PWI4 always sends the same keys in the same
+# order, so there's normally just the one.
+_LAYOUTS = {}
+
+
+def _Layout_For(keys):
+    layout = _LAYOUTS.get(tuple(keys))
+    if layout is None:
+        layout = _LAYOUTS[tuple(keys)] = _Body_Layout(keys)
+    return layout
+
+
+def _Split_Body(body):
+    """
+    The keys and values of a status body, as two lists. Splitting the
+    whole body on "=" at once is much quicker than line by line, but is
+    only right if every line has exactly one "=", so it's only trusted
+    when the keys match a known layout (see LD_PWI_Status.Update()).
+    """
+    body = body.strip("\n")
+    parts = body.replace("\n", "=").split("=")
+    if len(parts) != 2 * (body.count("\n") + 1) or "\r" in body:
+        return None, None
+    return parts[0::2], parts[1::2]
+
+
+def _Split_Lines(body):
+    """
+    _Split_Body() the slow way, one line at a time. Lines without "="
+    are dropped, values may contain "=".
+    """
+    keys, values = [], []
+    for line in body.splitlines():
+        key, separator, value = line.partition("=")
+        if separator:
+            keys.append(key)
+            values.append(value)
+    return keys, values
+
+# The value attributes held by each section, for copying.
+_SECTION_ATTRIBUTES = {
+    section: tuple(field[2] for field in _STATUS_FIELDS if field[1] == section)
+    for section in dict.fromkeys(field[1] for field in _STATUS_FIELDS)}
+
+# The numeric (and boolean) fields as (name, section, attribute, dtype).
+# Used by anything storing statuses as columns of numbers.
+_DTYPES = {float: "f8", int: "i8", _To_Bool: "?"}
+NUMERIC_FIELDS = tuple(
+    (_Public_Name(section, attribute), section, attribute, _DTYPES[convert])
+    for key, section, attribute, convert in _STATUS_FIELDS
+    if convert in _DTYPES)
+
+
+# Reads every NUMERIC_FIELDS value out of _Section_Tuple() into a list,
+# generated like _Body_Layout.Assign.
+def _Numeric_Getter():
+    reads = ", ".join(f"sections[{_SECTION_NAMES.index(section)}].{attribute}"
+                      for _, section, attribute, _ in NUMERIC_FIELDS)
+    namespace = {}
+    exec(f"def Numeric_Values(sections):\n    return [{reads}]", namespace)
+    return namespace["Numeric_Values"]
+
+
+_Numeric_Values = _Numeric_Getter()
+
+
+# The older PWI TCP protocol (see LD_Planewave_TCP) reports a few of the
+# same values under its own names, with booleans as 1/0.
+TCP_STATUS_KEYS = {
+    "mount.ra_apparent_hours": "mount.ra_apparent_hours",
+    "mount.dec_apparent_degs": "mount.dec_apparent_degs",
+    "mount.is_slewing": "mount.is_slewing",
+    "mount.is_tracking": "mount.is_tracking",
+    "mount.latitude": "site.latitude_degs",
+    "mount.longitude": "site.longitude_degs",
+    "mount.azimuth": "mount.azimuth_degs",
+    "mount.altitude": "mount.altitude_degs",
+    "mount.lst": "site.lmst_hours",
+    "mount.geometry": "mount.geometry",
+    "mount.field_angle_degs": "mount.field_angle_here_degs",
+    "mount.field_angle_rate_degs_per_sec": "mount.field_angle_rate_at_target_degs_per_sec",
+    }
+
+
+def TCP_Status_Body(lines):
+    """
+    Turn the lines of a TCP protocol status into a /status style body
+    that Update() understands. Unknown keys are dropped.
+    """
+    body = []
+    for line in lines:
+        key, _, value = line.partition("=")
+        key = TCP_STATUS_KEYS.get(key)
+        if key is None:
+            continue
+        if _FIELD_LOOKUP[key][2] is _To_Bool:
+            value = "true" if value.strip() == "1" else "false"
+        body.append(f"{key}={value}")
+    return "\n".join(body)
+
+
 class LD_PWI_Status:
     """
     Big class to hold all the statuses reported by PWI4
     """
 
+    __slots__ = (
+        "_version", "site", "mount", "focuser", "rotator", "m3", "autofocus",
+        "_raw", "_listeners",
+        )
+
     def __init__(self):
         """
         Make empty instances for all statuses.
@@ -16,6 +250,12 @@ class LD_PWI_Status:
         self.m3 = M3_Status()
         self.autofocus = AutoFocus_Status()
 
+        # (_Body_Layout, raw strings) of the last update, to spot what
+        # has changed.
+        self._raw = None
+        # (name or None, callback) pairs, see Add_Listener()
+        self._listeners = []
+
     @property
     def version(self):
         return self._version
@@ -24,77 +264,167 @@ class LD_PWI_Status:
     def version(self, value):
         self._version = value
 
+    def _Section_Tuple(self):
+        """
+        The section objects, indexed as in _FIELD_LOOKUP.
+        """
+        mount = self.mount
+        return (self, self.site, mount, mount.axis0, mount.axis1, mount.model,
+                self.focuser, self.rotator, self.m3, self.autofocus)
+
+    def Numeric_Values(self):
+        """
+        The values of NUMERIC_FIELDS, in that order.
+        """
+        return _Numeric_Values(self._Section_Tuple())
+
+    def Sections(self):
+        """
+        Map the section names used in _STATUS_FIELDS to the objects
+        holding those values.
+        """
+        return {
+            "": self,
+            "site": self.site,
+            "mount": self.mount,
+            "mount.axis0": self.mount.axis0,
+            "mount.axis1": self.mount.axis1,
+            "mount.model": self.mount.model,
+            "focuser": self.focuser,
+            "rotator": self.rotator,
+            "m3": self.m3,
+            "autofocus": self.autofocus,
+            }
+
     def Update(self, response):
         """
-        Take the response from the requests package, parse and set member
-        variables in this class.
+        Take the response from the requests package (or the raw bytes/str
+        of the body), parse and set member variables in this class.
+
+        The body is split into keys and values in one go and laid out by
+        the _STATUS_FIELDS table, converted values go straight into the
+        private attributes rather than through each property setter. Keys
+        PWI4 sends that aren't in the table are ignored, keys missing from
+        the body keep their previous values.
+
+        The first update sets every value at once, after that only values
+        whose raw string differs from the last update are converted.
+        Returns a list of (name, old, new) for every value that changed
+        (in the order PWI4 sent them), which also go to any listeners.
+        The first time a key is seen just sets the value, it doesn't count
+        as a change. A value that can't be converted is logged and the
+        previous one kept.
+        """
+        body = getattr(response, "content", response)
+        if isinstance(body, bytes):
+            body = body.decode()
+
+        raw = self._raw
+        keys, values = _Split_Body(body)
+        layout = raw[0] if raw is not None else None
+        if layout is None or keys != layout.keys:
+            layout = _LAYOUTS.get(tuple(keys)) if keys is not None else None
+            if layout is None:
+                # New keys, or it didn't split cleanly, so do it properly.
+                keys, values = _Split_Lines(body)
+                layout = _Layout_For(keys)
+
+        sections = self._Section_Tuple()
+        changes = []
+
+        if raw is None:
+            try:
+                layout.Assign(sections, values)
+            except ValueError:
+                # Go again one at a time to find (and log) the bad ones.
+                self._Set_Fields(sections, layout, values, range(len(values)),
+                                 [None] * len(values), changes)
+        else:
+            raw_Layout, previous = raw
+            if raw_Layout is not layout:
+                # PWI4 sent different keys, line up what it sent last time.
+                by_Key = dict(zip(raw_Layout.keys, previous))
+                previous = [by_Key.get(key) for key in keys]
+            changed = itertools.compress(range(len(values)),
+                                         map(operator.ne, values, previous))
+            self._Set_Fields(sections, layout, values, changed, previous, changes)
+
+        self._raw = (layout, values)
+
+        if changes and self._listeners:
+            for name, old, new in changes:
+                for wanted, callback in self._listeners:
+                    if wanted is None or wanted == name:
+                        try:
+                            callback(name, old, new)
+                        except Exception as e:
+                            log.exception(f"Status listener {callback!r} failed on {name}: {e}")
+
+        return changes
+
+    def _Set_Fields(self, sections, layout, values, positions, previous, changes):
+        """
+        Convert and store the values at positions, one at a time, adding
+        (name, old, new) to changes for each that changed. previous holds
+        the raw strings from the last update (None where there weren't
+        any, which just sets the value). A value that can't be converted
+        is logged and its raw string put back to the previous one, so it's
+        converted again when it next arrives.
+        """
+        fields = layout.fields
+        for position in positions:
+            field = fields[position]
+            if field is None:
+                continue
+
+            index, attribute, convert, name = field
+            value = values[position]
+            try:
+                new = convert(value)
+            except ValueError as e:
+                log.warning(f"Bad status value {layout.keys[position]}={value!r}: {e}")
+                values[position] = previous[position]
+                continue
+
+            section = sections[index]
+            if previous[position] is None:
+                setattr(section, attribute, new)
+            else:
+                old = getattr(section, attribute)
+                setattr(section, attribute, new)
+                if new != old:
+                    changes.append((name, old, new))
+
+    def Add_Listener(self, callback, name=None):
+        """
+        Have callback(name, old, new) called whenever a value changes in
+        Update(), e.g. ("mount.is_slewing", True, False). If name is given
+        only changes to that value are passed on. Exceptions from callback
+        are logged, not raised from Update().
+        """
+        self._listeners.append((name, callback))
+
+    def Remove_Listener(self, callback, name=None):
+        self._listeners.remove((name, callback))
+
+    def Listeners(self):
+        """
+        The (name, callback) pairs added with Add_Listener().
+        """
+        return list(self._listeners)
+
+    def Copy(self):
+        """
+        A snapshot of the current values, without the listeners or the
+        raw strings (which would more than double the size of each copy).
         """
-        string_status = {}
-        for line in response.iter_lines():
-            line = line.decode()
-            dotted_keys, value = line.split("=")
-            string_status[dotted_keys] = value
-
-        self.version = string_status["pwi4.version"]
-
-        self.site.latitude = string_status["site.latitude_degs"]
-        self.site.longitude = string_status["site.longitude_degs"]
-        self.site.height = string_status["site.height_meters"]
-        self.site.lst = string_status["site.lmst_hours"]
-
-        self.mount.is_connected = string_status["mount.is_connected"]
-        self.mount.geometry = string_status["mount.geometry"]
-        self.mount.ra_apparent = string_status["mount.ra_apparent_hours"]
-        self.mount.dec_apparent = string_status["mount.dec_apparent_degs"]
-        self.mount.ra_j2000 = string_status["mount.ra_j2000_hours"]
-        self.mount.dec_j2000 = string_status["mount.dec_j2000_degs"]
-        self.mount.target_ra_apparent = string_status["mount.target_ra_apparent_hours"]
-        self.mount.target_dec_apparent = string_status["mount.target_dec_apparent_degs"]
-        self.mount.altitude = string_status["mount.altitude_degs"]
-        self.mount.azimuth = string_status["mount.azimuth_degs"]
-        self.mount.is_slewing = string_status["mount.is_slewing"]
-        self.mount.is_tracking = string_status["mount.is_tracking"]
-        self.mount.field_angle_here = string_status["mount.field_angle_here_degs"]
-        self.mount.field_angle_target = string_status["mount.field_angle_at_target_degs"]
-        self.mount.field_angle_rate_target = string_status["mount.field_angle_rate_at_target_degs_per_sec"]
-        self.mount.path_angle_target = string_status["mount.path_angle_at_target_degs"]
-        self.mount.path_angle_target_rate = string_status["mount.path_angle_rate_at_target_degs_per_sec"]
-
-        self.mount.axis0.is_enabled = string_status["mount.axis0.is_enabled"]
-        self.mount.axis0.rms_error = string_status["mount.axis0.rms_error_arcsec"]
-        self.mount.axis0.dist_to_target = string_status["mount.axis0.dist_to_target_arcsec"]
-        self.mount.axis0.servo_error = string_status["mount.axis0.servo_error_arcsec"]
-        self.mount.axis0.position = string_status["mount.axis0.position_degs"]
-
-        self.mount.axis1.is_enabled = string_status["mount.axis1.is_enabled"]
-        self.mount.axis1.rms_error = string_status["mount.axis1.rms_error_arcsec"]
-        self.mount.axis1.dist_to_target = string_status["mount.axis1.dist_to_target_arcsec"]
-        self.mount.axis1.servo_error = string_status["mount.axis1.servo_error_arcsec"]
-        self.mount.axis1.position = string_status["mount.axis1.position_degs"]
-
-        self.mount.model.filename = string_status["mount.model.filename"]
-        self.mount.model.n_points_total = string_status["mount.model.num_points_total"]
-        self.mount.model.n_points_enabled = string_status["mount.model.num_points_enabled"]
-        self.mount.model.rms_error = string_status["mount.model.rms_error_arcsec"]
-
-        self.focuser.is_connected = string_status["focuser.is_connected"]
-        self.focuser.is_enabled = string_status["focuser.is_enabled"]
-        self.focuser.position = string_status["focuser.position"]
-        self.focuser.is_moving = string_status["focuser.is_moving"]
-
-        self.rotator.is_connected = string_status["rotator.is_connected"]
-        self.rotator.is_enabled = string_status["rotator.is_enabled"]
-        self.rotator.mech_position = string_status["rotator.mech_position_degs"]
-        self.rotator.field_angle = string_status["rotator.field_angle_degs"]
-        self.rotator.is_moving = string_status["rotator.is_moving"]
-        self.rotator.is_slewing = string_status["rotator.is_slewing"]
-
-        self.m3.port = string_status["m3.port"]
-
-        self.autofocus.is_connected = string_status["autofocus.is_running"]
-        self.autofocus.success = string_status["autofocus.success"]
-        self.autofocus.best_position = string_status["autofocus.best_position"]
-        self.autofocus.tolerance = string_status["autofocus.tolerance"]
+        new = LD_PWI_Status()
+        new_Sections = new.Sections()
+        for section_Name, section in self.Sections().items():
+            new_Section = new_Sections[section_Name]
+            for attribute in _SECTION_ATTRIBUTES[section_Name]:
+                setattr(new_Section, attribute, getattr(section, attribute))
+        return new
 
     def __str__(self):
         out_Values = [
@@ -121,10 +451,12 @@ class Site_Status:
     [latitude, longitude, height, local siderial time]
     """
 
+    __slots__ = ("_latitude", "_longitude", "_height", "_lst")
+
     def __init__(self):
         self._latitude = 0.0
         self._longitude = 0.0
-        self._height = 0
+        self._height = 0.0
         self._lst = 0.0
 
     def __str__(self):
@@ -157,7 +489,7 @@ class Site_Status:
 
     @height.setter
     def height(self, value):
-        self._height = value
+        self._height = float(value)
 
     @property
     def lst(self):
@@ -165,7 +497,7 @@ class Site_Status:
 
     @lst.setter
     def lst(self, value):
-        self._lst = value
+        self._lst = float(value)
 
 
 class Mount_Status:
@@ -173,6 +505,17 @@ class Mount_Status:
     The status report relating to the telescope mount itself
     """
 
+    geometry_modes = GEOMETRY_MODES
+
+    __slots__ = (
+        "_is_connected", "_geometry", "_ra_apparent", "_dec_apparent",
+        "_ra_j2000", "_dec_j2000", "_target_ra_apparent",
+        "_target_dec_apparent", "_altitude", "_azimuth", "_is_slewing",
+        "_is_tracking", "_field_angle_here", "_field_angle_target",
+        "_field_angle_rate_target", "_path_angle_target",
+        "_path_angle_rate_target", "axis0", "axis1", "model",
+        )
+
     def __init__(self):
         self._is_connected = False
         self._geometry = "Alt-Az"
@@ -196,12 +539,6 @@ class Mount_Status:
         self.axis1 = Axis_Status()
         self.model = Model_Status()
 
-        self.geometry_modes = {
-            "0": "Alt-Az",
-            "1": "Equatorial Fork",
-            "2": "German Equatorial"
-            }
-
     def __str__(self):
         return "\n".join([
             f"\tIs connected: {self._is_connected}",
@@ -355,7 +692,7 @@ class Mount_Status:
 
     @path_angle_target.setter
     def path_angle_target(self, value):
-        self.__path_angle_target = float(value)
+        self._path_angle_target = float(value)
 
     @property
     def path_angle_rate_target(self):
@@ -371,6 +708,11 @@ class Axis_Status:
     Status of a specific axis of the telescope mount
     """
 
+    __slots__ = (
+        "_is_enabled", "_rms_error", "_dist_to_target", "_servo_error",
+        "_position",
+        )
+
     def __init__(self):
         self._is_enabled = False
         self._rms_error = 0.0
@@ -434,6 +776,10 @@ class Model_Status:
     (can't find any documentation about this)
     """
 
+    __slots__ = (
+        "_filename", "_n_points_total", "_n_points_enabled", "_rms_error",
+        )
+
     def __init__(self):
         self._filename = ""
         self._n_points_total = 0
@@ -486,6 +832,8 @@ class Focuser_Status:
     The status report relating to the telescope focusser
     """
 
+    __slots__ = ("_is_connected", "_is_enabled", "_position", "_is_moving")
+
     def __init__(self):
         self._is_connected = False
         self._is_enabled = False
@@ -538,6 +886,11 @@ class Rotator_Status:
     The status report relating to the telescope rotator
     """
 
+    __slots__ = (
+        "_is_connected", "_is_enabled", "_mech_position", "_field_angle",
+        "_is_moving", "_is_slewing",
+        )
+
     def __init__(self):
         self._is_connected = False
         self._is_enabled = False
@@ -610,6 +963,8 @@ class M3_Status:
     The status report relating to ... ?
     """
 
+    __slots__ = ("_port",)
+
     def __init__(self):
         self._port = 0
 
@@ -632,6 +987,8 @@ class AutoFocus_Status:
     The status report relating to the telescope autofocus
     """
 
+    __slots__ = ("_is_running", "_success", "_best_position", "_tolerance")
+
     def __init__(self):
         self._is_running = False
         self._success = False
@@ -0,0 +1,394 @@
+"""
+Plan a night of satellite observing: find every pass of every satellite in
+a catalogue above an altitude limit, choose a set of passes the mount can
+get between, and follow them.
+
+    satellites = LD_MyTLE.Parse_TLEs(open("active.txt").read())
+    scheduler = LD_Pass_Scheduler(satellites, myMount.status.site, min_Altitude=20)
+    start, end = Night_Window(myMount.status.site)
+    passes = scheduler.Find_Passes(start, end)
+    plan = scheduler.Plan(passes)
+    scheduler.Run(myMount, plan)
+
+Passes are found by propagating every satellite on a coarse time grid in
+one vectorised SGP4 call (LD_MyTLE.TLE_Array), then bisecting each horizon
+crossing the grid brackets, again all at once. Passes that rise and set
+again between two grid points are missed, so step should be well under the
+shortest pass wanted (a minute is fine for LEO above 10 degrees).
+
+The plan is the most valuable set of passes (by default the most passes)
+where the mount can slew from where one pass sets to where the next rises
+in the time between them, see Slew_Time.
+"""
+
+import collections
+import concurrent.futures
+import logging
+import math
+import sys
+import threading
+import time
+
+import numpy as np
+
+import LD_MyTLE
+
+log = logging.getLogger(__name__)
+
+# One pass of a satellite over the site. index is the satellite's position
+# in the scheduler's list, times are unix times, angles degrees. sunlit is
+# whether the satellite is out of the earth's shadow at culmination.
+Pass = collections.namedtuple(
+    "Pass", ["index", "name", "norad_Id", "rise", "culmination", "set", "max_Altitude",
+             "rise_Altitude", "rise_Azimuth", "set_Altitude", "set_Azimuth", "sunlit"])
+
+# Bisection steps refining each crossing, each halves the bracket.
+REFINE_STEPS = 14
+
+
+def Slew_Time(alt_From, az_From, alt_To, az_To, axis_Speed=10.0, acceleration=5.0, settle=2.0):
+    """
+    Seconds for an alt-az mount to move between positions (degrees, can
+    be arrays), both axes at once each with a trapezoidal speed profile of
+    axis_Speed degrees/sec and acceleration degrees/sec^2, plus settle.
+    Azimuth goes the short way round.
+    """
+    def Axis_Time(distance):
+        distance = np.abs(distance)
+        # Distance covered getting up to speed and back down again.
+        ramp = axis_Speed * axis_Speed / acceleration
+        return np.where(distance < ramp, 2 * np.sqrt(distance / acceleration),
+                        distance / axis_Speed + axis_Speed / acceleration)
+
+    az_Distance = (np.asarray(az_To) - az_From + 180.0) % 360.0 - 180.0
+    return np.maximum(Axis_Time(np.asarray(alt_To) - alt_From), Axis_Time(az_Distance)) + settle
+
+
+def Sun_RaDec(unix_Time):
+    """
+    Apparent right ascension and declination of the sun (radians), good to
+    about 0.01 degrees (Astronomical Almanac low precision formulae).
+    """
+    days = np.asarray(unix_Time, float) / 86400.0 + 2440587.5 - 2451545.0
+    mean_Longitude = np.radians(280.460 + 0.9856474 * days)
+    anomaly = np.radians(357.528 + 0.9856003 * days)
+    longitude = mean_Longitude + np.radians(1.915 * np.sin(anomaly) + 0.020 * np.sin(2 * anomaly))
+    obliquity = np.radians(23.439 - 0.0000004 * days)
+    ra = np.arctan2(np.cos(obliquity) * np.sin(longitude), np.cos(longitude))
+    dec = np.arcsin(np.sin(obliquity) * np.sin(longitude))
+    return ra, dec
+
+
+def Sun_Altitude(unix_Time, site):
+    """
+    Altitude of the sun (degrees) from site at unix times.
+    """
+    latitude, longitude, _ = LD_MyTLE.Site_Coordinates(site)
+    ra, dec = Sun_RaDec(unix_Time)
+    hour_Angle = LD_MyTLE.GMST(unix_Time) + math.radians(longitude) - ra
+    lat = math.radians(latitude)
+    return np.degrees(np.arcsin(math.sin(lat) * np.sin(dec)
+                                + math.cos(lat) * np.cos(dec) * np.cos(hour_Angle)))
+
+
+def Night_Window(site, after=None, sun_Altitude=-12.0):
+    """
+    (start, end) unix times of the next night at site after time after (by
+    default now, and if it's already night, from now): while the sun is
+    below sun_Altitude degrees. Raises ValueError if there's no such night
+    in the next two days (polar summer).
+    """
+    if after is None:
+        after = time.time()
+    times = after + np.arange(0, 2 * 86400, 60.0)
+    dark = Sun_Altitude(times, site) < sun_Altitude
+    if not dark.any():
+        raise ValueError(f"The sun doesn't get below {sun_Altitude} degrees in the next two days")
+
+    first = int(np.argmax(dark))
+    ends = np.nonzero(~dark[first:])[0]
+    last = first + ends[0] if len(ends) else len(times) - 1
+
+    def Crossing(low, high, low_Dark):
+        # Bisect the minute the sun crosses sun_Altitude in.
+        for _ in range(10):
+            middle = (low + high) / 2
+            if (Sun_Altitude(middle, site) < sun_Altitude) == low_Dark:
+                low = middle
+            else:
+                high = middle
+        return (low + high) / 2
+
+    start = after if first == 0 else Crossing(times[first - 1], times[first], False)
+    end = times[last] if not len(ends) else Crossing(times[last - 1], times[last], True)
+    return start, end
+
+
+def Sunlit(position, unix_Time):
+    """
+    Whether TEME positions (..., 3, km) are outside the earth's shadow,
+    treating it as a cylinder.
+    """
+    ra, dec = Sun_RaDec(unix_Time)
+    sun = np.stack([np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)], axis=-1)
+    along = (position * sun).sum(axis=-1)
+    across = np.linalg.norm(position - along[..., None] * sun, axis=-1)
+    return (along > 0) | (across > LD_MyTLE.EARTH_RADIUS)
+
+
+def _Evaluate(satellites, times, site):
+    """
+    alt, az and TEME position of satellites (a TLE_Array) each at its own
+    time (1D arrays, one entry per satellite).
+    """
+    times = np.asarray(times, float)[:, None]
+    position, _, _ = satellites.Propagate(times)
+    alt, az, _ = LD_MyTLE.Topocentric(position, times, site)
+    return alt[:, 0], az[:, 0], position[:, 0]
+
+
+def _Find_Passes(tles, first_Index, start, end, site, min_Altitude, step):
+    """
+    Every pass of tles (LD_MyTLEs, numbered from first_Index) between
+    start and end. Runs in the worker processes too, so only takes things
+    that pickle.
+    """
+    satellites = LD_MyTLE.TLE_Array(tles)
+    times = np.arange(start, end, step, dtype=float)
+    times = np.append(times, end)
+    alt, _, _ = satellites.AltAz(times, site)
+    above = np.nan_to_num(alt, nan=-90.0) >= min_Altitude
+
+    # +1 where the satellite rises between samples k-1 and k, -1 where it
+    # sets. Padding with "below" at both ends makes a satellite already up
+    # at the start rise at k=0 and one still up at the end set at k=len.
+    padded = np.zeros((len(tles), len(times) + 2), np.int8)
+    padded[:, 1:-1] = above
+    change = np.diff(padded, axis=1)
+    rise_Sat, rise_K = np.nonzero(change == 1)
+    set_Sat, set_K = np.nonzero(change == -1)
+    # Rises and sets alternate for every satellite, so they pair up in order.
+    if len(rise_Sat) == 0:
+        return []
+
+    def Refine(sats, k, rising):
+        """
+        Times of the crossings between samples k-1 and k, at the window
+        edges where there's nothing to refine.
+        """
+        inside = (k > 0) & (k < len(times))
+        crossing = np.where(k == 0, times[0], times[np.minimum(k, len(times)) - 1])
+        if not inside.any():
+            return crossing
+        subset = satellites[sats[inside]]
+        low = times[k[inside] - 1]
+        high = times[k[inside]]
+        for _ in range(REFINE_STEPS):
+            middle = (low + high) / 2
+            alt_Middle, _, _ = _Evaluate(subset, middle, site)
+            up = np.nan_to_num(alt_Middle, nan=-90.0) >= min_Altitude
+            # Before a rise the satellite is down, before a set it's up.
+            before = up != rising
+            low = np.where(before, middle, low)
+            high = np.where(before, high, middle)
+        crossing[inside] = (low + high) / 2
+        return crossing
+
+    rise = Refine(rise_Sat, rise_K, True)
+    set_ = Refine(set_Sat, set_K, False)
+
+    # Culmination: the highest grid sample, refined with a parabola
+    # through it and its neighbours.
+    culmination = np.empty(len(rise))
+    for n, (sat, first, last) in enumerate(zip(rise_Sat, rise_K, set_K)):
+        row = alt[sat, first:last]
+        peak = first + int(np.nanargmax(row))
+        culmination[n] = times[peak]
+        if 0 < peak < len(times) - 1:
+            left, centre, right = alt[sat, peak - 1:peak + 2]
+            bend = left - 2 * centre + right
+            if bend < 0:
+                culmination[n] += 0.5 * (left - right) / bend * step
+    culmination = np.clip(culmination, rise, set_)
+
+    subset = satellites[rise_Sat]
+    rise_Alt, rise_Az, _ = _Evaluate(subset, rise, site)
+    set_Alt, set_Az, _ = _Evaluate(subset, set_, site)
+    max_Alt, _, position = _Evaluate(subset, culmination, site)
+    sunlit = Sunlit(position, culmination)
+
+    return [Pass(first_Index + int(sat), tles[sat].name, tles[sat].norad_Id,
+                 *map(float, (rise[n], culmination[n], set_[n], max_Alt[n],
+                              rise_Alt[n], rise_Az[n], set_Alt[n], set_Az[n])),
+                 bool(sunlit[n]))
+            for n, sat in enumerate(rise_Sat)]
+
+
+class LD_Pass_Scheduler:
+    """
+    Finds passes of tles (LD_MyTLEs) over site (an LD_PWI_Status.Site_Status
+    or (latitude, longitude, height)) above min_Altitude degrees, plans
+    which to observe and runs the plan.
+
+    With workers > 1, Find_Passes splits the satellites between that many
+    processes. The slew model is Slew_Time with axis_Speed, acceleration
+    and settle.
+    """
+
+    def __init__(self, tles, site, min_Altitude=15.0, step=60.0, workers=1,
+                 axis_Speed=10.0, acceleration=5.0, settle=2.0):
+        self.tles = list(tles)
+        self.site = LD_MyTLE.Site_Coordinates(site)
+        self.min_Altitude = min_Altitude
+        self.step = step
+        self.workers = workers
+        self.axis_Speed = axis_Speed
+        self.acceleration = acceleration
+        self.settle = settle
+
+    def Slew_Time(self, alt_From, az_From, alt_To, az_To):
+        return Slew_Time(alt_From, az_From, alt_To, az_To,
+                         self.axis_Speed, self.acceleration, self.settle)
+
+    def Find_Passes(self, start, end, chunk_Size=2000):
+        """
+        Every pass between unix times start and end, sorted by rise time.
+        Satellites are worked through chunk_Size at a time (split between
+        the workers if there are several).
+        """
+        arguments = [(self.tles[first:first + chunk_Size], first, start, end, self.site,
+                      self.min_Altitude, self.step)
+                     for first in range(0, len(self.tles), chunk_Size)]
+        begun = time.perf_counter()
+        passes = []
+        if self.workers > 1 and len(arguments) > 1:
+            with concurrent.futures.ProcessPoolExecutor(self.workers) as pool:
+                for chunk in pool.map(_Find_Passes, *zip(*arguments)):
+                    passes += chunk
+        else:
+            for chunk_Arguments in arguments:
+                passes += _Find_Passes(*chunk_Arguments)
+
+        passes.sort(key=lambda p: p.rise)
+        log.info(f"{len(passes)} passes of {len(self.tles)} satellites found in "
+                 f"{time.perf_counter() - begun:.1f} s")
+        return passes
+
+    def Plan(self, passes, priority=None, sunlit_Only=False):
+        """
+        The passes to observe, in order: the set with the largest total
+        priority the mount can get between. priority maps NORAD numbers
+        to a weight (default 1 each, so the most passes); satellites
+        mapped to 0 or less are left out. With sunlit_Only, passes whose
+        satellite is in shadow at culmination are left out.
+
+        Dynamic programming over passes in rise order: the best plan
+        ending with a pass is its weight plus the best plan ending with any
+        pass it can be reached from. Passes that set more than the longest
+        possible slew before it rises can always reach it, so those are a
+        running maximum and only the few in between are checked.
+        """
+        if priority is None:
+            priority = {}
+        candidates = [p for p in passes
+                      if priority.get(p.norad_Id, 1.0) > 0 and (p.sunlit or not sunlit_Only)]
+        if not candidates:
+            return []
+        candidates.sort(key=lambda p: p.rise)
+
+        n = len(candidates)
+        rise = np.array([p.rise for p in candidates])
+        set_ = np.array([p.set for p in candidates])
+        weight = np.array([priority.get(p.norad_Id, 1.0) for p in candidates])
+        rise_Alt = np.array([p.rise_Altitude for p in candidates])
+        rise_Az = np.array([p.rise_Azimuth for p in candidates])
+        set_Alt = np.array([p.set_Altitude for p in candidates])
+        set_Az = np.array([p.set_Azimuth for p in candidates])
+        longest_Slew = float(self.Slew_Time(0.0, 0.0, 90.0, 180.0))
+
+        by_Set = np.argsort(set_, kind="stable")
+        sorted_Set = set_[by_Set]
+        best = np.zeros(n)
+        previous = np.full(n, -1)
+        # Running best over the passes that set long enough ago.
+        reachable_Best, reachable_Index, reachable_Count = 0.0, -1, 0
+
+        for j in range(n):
+            free_Until = np.searchsorted(sorted_Set, rise[j] - longest_Slew, "right")
+            while reachable_Count < free_Until:
+                i = by_Set[reachable_Count]
+                if best[i] > reachable_Best:
+                    reachable_Best, reachable_Index = best[i], i
+                reachable_Count += 1
+
+            best[j], previous[j] = weight[j] + reachable_Best, reachable_Index
+
+            # Passes that set recently enough that the slew matters.
+            nearby = by_Set[free_Until:np.searchsorted(sorted_Set, rise[j], "right")]
+            nearby = nearby[nearby != j]
+            if len(nearby):
+                arrive = set_[nearby] + self.Slew_Time(set_Alt[nearby], set_Az[nearby],
+                                                       rise_Alt[j], rise_Az[j])
+                nearby = nearby[arrive <= rise[j]]
+                if len(nearby) and best[nearby].max() > reachable_Best:
+                    i = nearby[np.argmax(best[nearby])]
+                    best[j], previous[j] = weight[j] + best[i], i
+
+        plan = []
+        j = int(np.argmax(best))
+        while j >= 0:
+            plan.append(candidates[j])
+            j = int(previous[j])
+        plan.reverse()
+        log.info(f"Planned {len(plan)} of {n} passes, total priority {best.max():g}")
+        return plan
+
+    def Run(self, mount, plan, stop=None, lead=2.0):
+        """
+        Follow each planned pass with mount (an LD_Planewave): slew to
+        where it rises as soon as the last one has set, start following
+        lead seconds before it rises and stop when it has set. Returns
+        early if the threading.Event stop is set.
+        """
+        if stop is None:
+            stop = threading.Event()
+
+        def Wait_Until(when):
+            stop.wait(max(0.0, when - time.time()))
+            return not stop.is_set()
+
+        for satellite_Pass in plan:
+            if stop.is_set():
+                break
+            if time.time() > satellite_Pass.set:
+                log.warning(f"Missed the pass of {satellite_Pass.name}, already set")
+                continue
+
+            log.info(f"Next {satellite_Pass.name}, rising at {time.ctime(satellite_Pass.rise)} "
+                     f"to {satellite_Pass.max_Altitude:.1f} degrees")
+            if time.time() < satellite_Pass.rise - lead:
+                mount.Goto_AltAz(satellite_Pass.rise_Altitude, satellite_Pass.rise_Azimuth)
+            if not Wait_Until(satellite_Pass.rise - lead):
+                break
+            mount.Follow_TLE(self.tles[satellite_Pass.index])
+            if not Wait_Until(satellite_Pass.set):
+                break
+        mount.Stop()
+
+
+if __name__ == "__main__":
+    import LD_Planewave
+
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+    myMount = LD_Planewave.LD_Planewave("http://127.0.0.1", "8220")
+    site = myMount.Status().site
+
+    with open(sys.argv[1] if len(sys.argv) > 1 else "active.txt") as f:
+        satellites = LD_MyTLE.Parse_TLEs(f.read())
+    scheduler = LD_Pass_Scheduler(satellites, site, min_Altitude=20, workers=4)
+    start, end = Night_Window(site)
+    plan = scheduler.Plan(scheduler.Find_Passes(start, end), sunlit_Only=True)
+    for satellite_Pass in plan:
+        print(f"{time.ctime(satellite_Pass.rise)} - {time.ctime(satellite_Pass.set)} "
+              f"{satellite_Pass.name} max {satellite_Pass.max_Altitude:.1f}")
+    scheduler.Run(myMount, plan)
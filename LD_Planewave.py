@@ -1,8 +1,11 @@
 import logging
-import requests
 import sys
+import threading
+import time
 
+import LD_Metrics
 import LD_PWI_Status
+import LD_Transport
 
 import LD_MyTLE
 
@@ -10,13 +13,89 @@ log = logging.getLogger(__name__)
 url_Log = logging.getLogger("urllib3")
 url_Log.setLevel(logging.WARNING)
 
+
+def Poll_Interval(status, min_Interval=0.02, max_Interval=0.5,
+                  approach_Rate=18000):
+    """
+    How long to wait before checking on the mount again. Polls quickly
+    when the mount is close to its target and backs off when far away:
+    a quarter of the time it would take to arrive at approach_Rate
+    arcsec/sec, clamped to [min_Interval, max_Interval] seconds.
+    """
+    distance = max(abs(status.mount.axis0.dist_to_target),
+                   abs(status.mount.axis1.dist_to_target))
+    interval = distance / approach_Rate / 4
+    return min(max(interval, min_Interval), max_Interval)
+
+
+def On_Target(status, tolerance_Arcsec):
+    return (abs(status.mount.axis0.dist_to_target) < tolerance_Arcsec
+            and abs(status.mount.axis1.dist_to_target) < tolerance_Arcsec)
+
+
+def TLE_Payload(tle):
+    """
+    Turn any of the TLE formats accepted by Follow_TLE into the dict of
+    line0, line1, line2 that PWI4 wants as parameters.
+    """
+
+    if isinstance(tle, str):
+        tle = tle.split("\n")
+    if isinstance(tle, list):
+        assert len(tle) == 3
+        tle_Payload = {
+            "line0": tle[0],
+            "line1": tle[1],
+            "line2": tle[2]
+            }
+    elif isinstance(tle, dict):
+        tle_Payload = tle
+    elif isinstance(tle, LD_MyTLE.LD_MyTLE):
+        tle_Payload = tle.Dict
+
+    return tle_Payload
+
+
 class LD_Planewave:
     """
     Interface to the telescope mount controlled by the PWI4 software.
     Currently only the mount is supported (ie not the focusser etc)
     """
 
-    def __init__(self, ip_Address="", port=""):
+    def __init__(self, ip_Address="", port="", timeout=(3.05, 10), pool_Size=4,
+                 transport=None):
+        """
+        timeout is passed to the transport, it can be a single number of
+        seconds or a (connect, read) tuple. pool_Size is the number of
+        keep-alive connections held open to this mount's PWI4 server, so
+        this many requests can be in flight at once without reconnecting.
+
+        transport is how requests are made, a name from
+        LD_Transport.TRANSPORTS or a transport object. By default a pooled
+        requests session.
+        """
+
+        self.timeout = timeout
+        self.pool_Size = pool_Size
+        if transport is None or isinstance(transport, str):
+            transport = LD_Transport.Make_Transport(transport or "requests", timeout, pool_Size)
+        self.transport = transport
+
+        # Request counts and latencies per endpoint, see LD_Metrics.
+        self.metrics = LD_Metrics.LD_Metrics()
+
+        # Background status poller, see Start_Poller()
+        self._poller = None
+        self._poll_Stop = threading.Event()
+        self._poll_Callbacks = []
+        # (status, wall clock time, monotonic time) of the newest poll.
+        self._latest = None
+        # Notified every time the poller gets a new status.
+        self._poll_Condition = threading.Condition()
+
+        # Held while self.status is being updated, since both command
+        # replies and the poller thread update it.
+        self._status_Lock = threading.RLock()
 
         if ip_Address != "":
             log.debug(f"Connecting to {ip_Address}:{port}")
@@ -27,8 +106,60 @@ class LD_Planewave:
     def Connect_IP(self, ip_Address="http://127.0.0.1", port="8220"):
         self.base_Url = f"{ip_Address}:{port}"
 
-        # Container for the status messages of the device.
-        self.status = LD_PWI_Status.LD_PWI_Status()
+        # Container for the status messages of the device. Values from a
+        # previous connection don't apply, but its listeners still do.
+        status = LD_PWI_Status.LD_PWI_Status()
+        with self._status_Lock:
+            previous = getattr(self, "status", None)
+            if previous is not None:
+                for name, callback in previous.Listeners():
+                    status.Add_Listener(callback, name)
+            self.status = status
+
+    def Close(self):
+        """
+        Stop any poller and close the pooled connections to PWI4.
+        """
+        self.Stop_Poller()
+        self.transport.Close()
+
+    def _Request(self, cmd_Url, params):
+        """
+        Make the GET request through the transport, recording it in the
+        metrics.
+        """
+        endpoint = self._Endpoint(cmd_Url)
+        LD_Metrics.Take_Connect_Time()
+        start = time.perf_counter()
+        try:
+            response = self.transport.Get(cmd_Url, params)
+        except Exception:
+            self.metrics.Record_Request(endpoint, error=True)
+            raise
+
+        elapsed = time.perf_counter() - start
+        connect = LD_Metrics.Take_Connect_Time()
+        self.metrics.Record_Request(endpoint, error=response.status_code != 200)
+        if connect:
+            self.metrics.Observe(endpoint, "connect", connect)
+        self.metrics.Observe(endpoint, "server", elapsed - connect)
+        return response
+
+    def _Endpoint(self, cmd_Url):
+        """
+        The path part of a command URL, e.g. "/mount/goto_alt_az".
+        """
+        return cmd_Url[len(self.base_Url):].split("?", 1)[0]
+
+    def _Update_Status(self, response):
+        """
+        Parse a reply into self.status, timing it for the metrics.
+        Call with self._status_Lock held.
+        """
+        start = time.perf_counter()
+        self.status.Update(response)
+        self.metrics.Observe(self._Endpoint(response.url), "parse",
+                             time.perf_counter() - start)
 
     def _SendMsg(self, command, **kwargs):
         """
@@ -38,7 +169,7 @@ class LD_Planewave:
         "&") - this is all dealt with by the requests package.
 
         Parameters are passed in as a dictionary to this function and passed
-        straight to requests.get().
+        straight to the (keep-alive) session's get().
         """
 
         if isinstance(command, (list, tuple)):
@@ -53,11 +184,12 @@ class LD_Planewave:
             log.warning("Don't know how to interpret {command} of type {type(command)}")
 
         # Make the GET request including the parameters (if present)
-        response = requests.get(cmd_Url, kwargs)
+        response = self._Request(cmd_Url, kwargs)
 
         # Interpret response or complain it failed.
         if response.status_code == 200:
-            self.status.Update(response)
+            with self._status_Lock:
+                self._Update_Status(response)
         else:
             log.warning(f"Response code {response.status_code}")
             log.warning(f"{response.reason}: {response.content}")
@@ -97,14 +229,176 @@ class LD_Planewave:
         log.debug(f"Telescope says {response}")
         return response
 
-    def Status(self):
+    def Status(self, max_Age=None):
         """
         Get the full status.
+
+        If the poller is running and its latest snapshot is no older than
+        max_Age seconds, return that instead of asking PWI4 again.
         """
+        if max_Age is not None:
+            status, age = self.Latest_Status()
+            if status is not None and age <= max_Age:
+                return status
+
         response = self._SendMsg(["status"])
 
         return self.status
 
+    def Start_Poller(self, rate_Hz=5):
+        """
+        Start a background thread fetching the status rate_Hz times a
+        second. Each poll updates self.status (so status listeners fire)
+        and publishes a copy of it, so a snapshot never changes under
+        whoever is reading it. Get the newest with Latest_Status().
+        """
+        if self._poller is not None:
+            log.warning("Poller already running")
+            return
+
+        self._poll_Stop.clear()
+        self._poller = threading.Thread(target=self._Poll_Loop,
+                                        args=(1 / rate_Hz,),
+                                        name=f"LD_Planewave poller {self.base_Url}",
+                                        daemon=True)
+        self._poller.start()
+
+    def Stop_Poller(self):
+        if self._poller is None:
+            return
+        self._poll_Stop.set()
+        self._poller.join()
+        self._poller = None
+
+    def Add_Poll_Callback(self, callback):
+        """
+        Have callback(status, timestamp) called (on the poller thread) with
+        every new snapshot. timestamp is time.time() when it was received.
+        """
+        self._poll_Callbacks.append(callback)
+
+    def Remove_Poll_Callback(self, callback):
+        self._poll_Callbacks.remove(callback)
+
+    def Add_Status_Listener(self, callback, name=None):
+        """
+        Have callback(name, old, new) called when a status value changes,
+        whether seen in a command reply or by the poller. e.g.
+
+        myMount.Add_Status_Listener(on_Slew_Change, "mount.is_slewing")
+        """
+        self.status.Add_Listener(callback, name)
+
+    def Remove_Status_Listener(self, callback, name=None):
+        self.status.Remove_Listener(callback, name)
+
+    def Latest_Status(self):
+        """
+        Return the newest polled (status, age in seconds) without making a
+        request. (None, None) until the poller has got something.
+        """
+        latest = self._latest
+        if latest is None:
+            return None, None
+        status, _, received = latest
+        return status, time.monotonic() - received
+
+    def _Poll_Once(self):
+        response = self._Request(f"{self.base_Url}/status", {})
+        if response.status_code != 200:
+            log.warning(f"Poller got response code {response.status_code}")
+            return
+
+        with self._status_Lock:
+            self._Update_Status(response)
+            status = self.status.Copy()
+        timestamp = time.time()
+        with self._poll_Condition:
+            self._latest = (status, timestamp, time.monotonic())
+            self._poll_Condition.notify_all()
+
+        for callback in self._poll_Callbacks:
+            callback(status, timestamp)
+
+    def _Poll_Loop(self, interval):
+        next_Poll = time.monotonic()
+        while not self._poll_Stop.is_set():
+            try:
+                self._Poll_Once()
+            except Exception as e:
+                log.warning(f"Status poll failed: {e}")
+
+            # Keep to the rate rather than sleeping a fixed time after each
+            # poll, but don't try to catch up on polls missed while PWI4
+            # was slow.
+            next_Poll = max(next_Poll + interval, time.monotonic())
+            self._poll_Stop.wait(next_Poll - time.monotonic())
+
+    def Wait_For_Condition(self, predicate, timeout=None,
+                           min_Interval=0.02, max_Interval=0.5):
+        """
+        Block until predicate(status) is true and return that status.
+        Raises TimeoutError if it isn't true within timeout seconds.
+
+        Only statuses fetched after the call are considered, so this is
+        safe to call straight after sending a command. If the poller is
+        running this wakes on each new poll and makes no requests itself,
+        otherwise it polls PWI4 every Poll_Interval(), i.e. faster as the
+        mount nears its target.
+        """
+        # Only polls received at or after this time count.
+        newer_Than = time.monotonic()
+        deadline = None if timeout is None else newer_Than + timeout
+
+        def Remaining():
+            if deadline is None:
+                return None
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"Condition not met within {timeout} s")
+            return remaining
+
+        while True:
+            if self._poller is not None:
+                with self._poll_Condition:
+                    latest = self._latest
+                    if latest is None or latest[2] < newer_Than:
+                        self._poll_Condition.wait(Remaining())
+                        latest = self._latest
+                if latest is not None and latest[2] >= newer_Than:
+                    status = latest[0]
+                    newer_Than = latest[2] + 1e-9
+                    if predicate(status):
+                        return status
+                else:
+                    Remaining()
+            else:
+                with self._status_Lock:
+                    self.Status()
+                    status = self.status.Copy()
+                if predicate(status):
+                    return status
+                interval = Poll_Interval(status, min_Interval, max_Interval)
+                remaining = Remaining()
+                time.sleep(interval if remaining is None else min(interval, remaining))
+
+    def Wait_For_Slew_Complete(self, timeout=None):
+        """
+        Block until the mount reports it is no longer slewing.
+        """
+        log.debug("Wait for slew to complete")
+        return self.Wait_For_Condition(lambda status: not status.mount.is_slewing,
+                                       timeout)
+
+    def Wait_Until_On_Target(self, tolerance_Arcsec=2, timeout=None):
+        """
+        Block until both axes are within tolerance_Arcsec of the target,
+        e.g. after Follow_TLE where the mount never stops moving.
+        """
+        log.debug(f"Wait until within {tolerance_Arcsec} arcsec of target")
+        return self.Wait_For_Condition(lambda status: On_Target(status, tolerance_Arcsec),
+                                       timeout)
+
     def Home(self):
         log.debug("Home mount")
         response = self._SendMsg(["mount", "find_home"])
@@ -141,7 +435,7 @@ class LD_Planewave:
         log.debug(f"Telescope says {response}")
         return response
 
-    def Mount_Offset(self):
+    def Mount_Offset(self, **kwargs):
         """
         One or more of the following offsets can be specified as a keyword argument:
 
@@ -165,10 +459,14 @@ class LD_Planewave:
         arcsec/sec, and to also clear any existing offset in the transverse direction,
         you could call the method like this:
 
-        mount_offset(axis0_add_arcsec=-30, axis0_set_rate_arcsec_per_sec=1, transverse_reset=0)
+        Mount_Offset(axis0_add_arcsec=-30, axis0_set_rate_arcsec_per_sec=1, transverse_reset=0)
 
+        To send many small offsets quickly see LD_Command_Queue.
         """
-        raise NotImplementedError
+        log.debug(f"Mount offset {kwargs}")
+        response = self._SendMsg(["mount", "offset"], **kwargs)
+        log.debug(f"Telescope says {response}")
+        return response
 
     def Park(self):
         log.debug("Park mount")
@@ -202,20 +500,7 @@ class LD_Planewave:
             dict: a dict with keys line0, line1, line2 holding strings for each line of TLE
             My_TLE: An instance of my TLE class
         """
-
-        if isinstance(tle, str):
-            tle = tle.split("\n")
-        if isinstance(tle, list):
-            assert len(tle) == 3
-            tle_Payload = {
-                "line0": tle[0],
-                "line1": tle[1],
-                "line2": tle[2]
-                }
-        elif isinstance(tle, dict):
-            tle_Payload = tle
-        elif isinstance(tle, LD_MyTLE.LD_MyTLE):
-            tle_Payload = tle.Dict
+        tle_Payload = TLE_Payload(tle)
 
         log.debug(f"Follow TLE named {tle_Payload['line0']}")
 
@@ -225,6 +510,19 @@ class LD_Planewave:
         log.debug(f"Telescope says {response}")
         return response
 
+    def Take_Image(self):
+        """
+        Ask PWI4's virtual camera for a (fake starfield) image. Returns the
+        response, whose content is the FITS file. This doesn't update the
+        status as the reply is an image.
+        """
+        log.debug("Take virtual camera image")
+        response = self._Request(f"{self.base_Url}/virtualcamera/take_image", {})
+        if response.status_code != 200:
+            log.warning(f"Response code {response.status_code}")
+            log.warning(f"{response.reason}: {response.content}")
+        return response
+
     def Raw_Command(self, raw_Str):
         """
         Allow (an advanced?) user to speficy some exact raw command to the
@@ -0,0 +1,247 @@
+import asyncio
+import logging
+import sys
+
+import LD_PWI_Status
+import LD_Planewave
+import LD_Transport
+
+log = logging.getLogger(__name__)
+
+
+class LD_Planewave_Async:
+    """
+    asyncio version of LD_Planewave. Every command is a coroutine so many
+    requests (to one or many mounts) can be in flight on one event loop.
+
+    Up to pool_Size keep-alive connections are held open to PWI4, requests
+    beyond that wait for a free connection. Each reply updates self.status
+    and a copy of it (an LD_PWI_Status) is returned.
+
+    transport can be another object with an async Get(url, params) in
+    place of the default LD_Transport.Async_Transport.
+    """
+
+    def __init__(self, ip_Address="", port="", timeout=10, pool_Size=4, transport=None):
+        self.timeout = timeout
+        self.pool_Size = pool_Size
+        if transport is None:
+            transport = LD_Transport.Async_Transport(timeout, pool_Size)
+        self.transport = transport
+
+        if ip_Address != "":
+            log.debug(f"Connecting to {ip_Address}:{port}")
+            self.Connect_IP(ip_Address, port)
+        else:
+            log.warning("No IP address supplied (yet). Use Connect_IP(ip, port) later")
+
+    def Connect_IP(self, ip_Address="http://127.0.0.1", port="8220"):
+        self.base_Url = f"{ip_Address}:{port}"
+
+        # Container for the status messages of the device.
+        self.status = LD_PWI_Status.LD_PWI_Status()
+
+    async def Close(self):
+        """
+        Close the pooled connections to PWI4.
+        """
+        await self.transport.Close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_Info):
+        await self.Close()
+
+    async def _SendMsg(self, command, **kwargs):
+        """
+        Make a GET request to the PWI4 server, same URL scheme as
+        LD_Planewave._SendMsg. Returns a copy of the status updated from
+        the reply, or None if PWI4 didn't like the request.
+        """
+
+        if isinstance(command, (list, tuple)):
+            cmd_Url = "/".join([self.base_Url, *command])
+        elif isinstance(command, str):
+            # If a string was passed, interpret it as a direct command.
+            cmd_Url = f"{self.base_Url}/{command}"
+            log.debug(f"Direct command {cmd_Url}")
+        else:
+            log.warning(f"Don't know how to interpret {command} of type {type(command)}")
+            return None
+
+        response = await self.transport.Get(cmd_Url, kwargs)
+
+        # Interpret response or complain it failed.
+        if response.status_code == 200:
+            self.status.Update(response)
+            return self.status.Copy()
+        else:
+            log.warning(f"Response code {response.status_code}")
+            log.warning(f"{response.reason}: {response.content}")
+            log.warning(f"Request was {response.url}")
+            return None
+
+    def Add_Status_Listener(self, callback, name=None):
+        """
+        Have callback(name, old, new) called when a status value changes,
+        see LD_PWI_Status.Add_Listener.
+        """
+        self.status.Add_Listener(callback, name)
+
+    def Remove_Status_Listener(self, callback, name=None):
+        self.status.Remove_Listener(callback, name)
+
+    async def Wait_For_Condition(self, predicate, timeout=None,
+                                 min_Interval=0.02, max_Interval=0.5):
+        """
+        Wait until predicate(status) is true and return that status,
+        polling faster as the mount nears its target (see
+        LD_Planewave.Poll_Interval). Raises TimeoutError after timeout
+        seconds.
+        """
+        async def Poll():
+            while True:
+                status = await self.Status()
+                if status is None:
+                    await asyncio.sleep(max_Interval)
+                    continue
+                if predicate(status):
+                    return status
+                await asyncio.sleep(LD_Planewave.Poll_Interval(status, min_Interval, max_Interval))
+
+        return await asyncio.wait_for(Poll(), timeout)
+
+    async def Wait_For_Slew_Complete(self, timeout=None):
+        """
+        Wait until the mount reports it is no longer slewing.
+        """
+        log.debug("Wait for slew to complete")
+        return await self.Wait_For_Condition(lambda status: not status.mount.is_slewing,
+                                             timeout)
+
+    async def Wait_Until_On_Target(self, tolerance_Arcsec=2, timeout=None):
+        """
+        Wait until both axes are within tolerance_Arcsec of the target.
+        """
+        log.debug(f"Wait until within {tolerance_Arcsec} arcsec of target")
+        return await self.Wait_For_Condition(
+            lambda status: LD_Planewave.On_Target(status, tolerance_Arcsec), timeout)
+
+    async def Connect(self):
+        """
+        Connect to the telescope hardware.
+        """
+        log.debug("Connect to telescope hardware")
+        return await self._SendMsg(["mount", "connect"])
+
+    async def Disconnect(self):
+        """
+        Disconnect from the telescope hardware.
+        """
+        log.debug("Disconnect from telescope hardware")
+        return await self._SendMsg(["mount", "disconnect"])
+
+    async def Enable(self, axis):
+        """
+        Enable chosen axis
+        """
+        return await self._SendMsg(["mount", "enable"], axis=axis)
+
+    async def Disable(self, axis):
+        """
+        Disable chosen axis
+        """
+        return await self._SendMsg(["mount", "disable"], axis=axis)
+
+    async def Status(self):
+        """
+        Get the full status.
+        """
+        return await self._SendMsg(["status"])
+
+    async def Home(self):
+        log.debug("Home mount")
+        return await self._SendMsg(["mount", "find_home"])
+
+    async def Stop(self):
+        log.debug("Stop mount")
+        return await self._SendMsg(["mount", "stop"])
+
+    async def Goto_RaDec_Apparent(self, ra_Hours, dec_Degrees):
+        log.debug(f"Go do ra/dec (apparent) {ra_Hours}h, {dec_Degrees}deg")
+        return await self._SendMsg(["mount", "goto_ra_dec_apparent"],
+                                   ra_hours=ra_Hours,
+                                   dec_degs=dec_Degrees)
+
+    async def Goto_RaDec_J2000(self, ra_Hours, dec_Degrees):
+        log.debug(f"Go do ra/dec (J2000) {ra_Hours}h, {dec_Degrees}deg")
+        return await self._SendMsg(["mount", "goto_ra_dec_j2000"],
+                                   ra_hours=ra_Hours,
+                                   dec_degs=dec_Degrees)
+
+    async def Goto_AltAz(self, alt_Degrees, az_Degrees):
+        log.debug(f"Go do alt/az {alt_Degrees}deg alt, {az_Degrees}deg az")
+        return await self._SendMsg(["mount", "goto_alt_az"],
+                                   alt_degs=alt_Degrees,
+                                   az_degs=az_Degrees)
+
+    async def Mount_Offset(self, **kwargs):
+        """
+        Offset the mount. See LD_Planewave.Mount_Offset for the keyword
+        arguments PWI4 understands, e.g.
+
+        await mount.Mount_Offset(axis0_add_arcsec=-30, transverse_reset=0)
+        """
+        log.debug(f"Mount offset {kwargs}")
+        return await self._SendMsg(["mount", "offset"], **kwargs)
+
+    async def Park(self):
+        log.debug("Park mount")
+        return await self._SendMsg(["mount", "park"])
+
+    async def Park_Here(self):
+        log.debug("Park mount here")
+        return await self._SendMsg(["mount", "set_park_here"])
+
+    async def Tracking_On(self):
+        log.debug("Mount track on")
+        return await self._SendMsg(["mount", "tracking_on"])
+
+    async def Tracking_Off(self):
+        log.debug("Mount track off")
+        return await self._SendMsg(["mount", "tracking_off"])
+
+    async def Follow_TLE(self, tle):
+        """
+        Instruct the mount to follow a TLE. Takes the same formats as
+        LD_Planewave.Follow_TLE.
+        """
+        tle_Payload = LD_Planewave.TLE_Payload(tle)
+
+        log.debug(f"Follow TLE named {tle_Payload['line0']}")
+        return await self._SendMsg(["mount", "follow_tle"], **tle_Payload)
+
+    async def Raw_Command(self, raw_Str):
+        """
+        Allow (an advanced?) user to speficy some exact raw command to the
+        mount. (i.e.) a specific HTTP request and return the response.
+        """
+        if isinstance(raw_Str, str):
+            return await self._SendMsg(raw_Str)
+        else:
+            log.warning("Raw commands can only be strings")
+
+
+async def _Demo():
+    async with LD_Planewave_Async("http://127.0.0.1", "8220") as myMount:
+        await myMount.Connect()
+
+        # Ten status requests all in flight at once.
+        statuses = await asyncio.gather(*[myMount.Status() for _ in range(10)])
+        print(statuses[-1])
+
+
+if __name__ == "__main__":
+    logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
+    asyncio.run(_Demo())
@@ -0,0 +1,160 @@
+import concurrent.futures
+import logging
+import sys
+
+import LD_Planewave
+
+log = logging.getLogger(__name__)
+
+
+class Fleet_Result:
+    """
+    What one mount made of a fleet-wide command. Either value holds
+    whatever the LD_Planewave method returned or error holds why it failed.
+    """
+
+    def __init__(self, base_Url, value=None, error=None):
+        self.base_Url = base_Url
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        if self.ok:
+            return f"<{self.base_Url}: {self.value!r}>"
+        return f"<{self.base_Url}: FAILED {self.error!r}>"
+
+
+class LD_Planewave_Fleet:
+    """
+    Drive many mounts (one PWI4 server each) at once. Commands are sent to
+    every mount in parallel from a thread pool, so a fleet-wide stop or
+    park takes about one round trip rather than one per mount.
+    """
+
+    def __init__(self, base_Urls, **mount_Kwargs):
+        """
+        base_Urls is a list like ["http://10.0.0.1:8220", "http://10.0.0.2:8220"].
+        Any mount_Kwargs (timeout, pool_Size) go to each LD_Planewave.
+        """
+        self.mounts = {}
+        for base_Url in base_Urls:
+            ip_Address, port = base_Url.rsplit(":", 1)
+            self.mounts[base_Url] = LD_Planewave.LD_Planewave(ip_Address, port, **mount_Kwargs)
+
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, len(self.mounts)),
+            thread_name_prefix="LD_Planewave_Fleet")
+
+    def Close(self):
+        self.executor.shutdown(wait=True)
+        for mount in self.mounts.values():
+            mount.Close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_Info):
+        self.Close()
+
+    @property
+    def statuses(self):
+        """
+        Merged view of the last status seen from every mount, keyed by URL.
+        Each is a snapshot, later polls don't change it.
+        """
+        return {base_Url: self._Snapshot(mount) for base_Url, mount in self.mounts.items()}
+
+    @staticmethod
+    def _Snapshot(mount):
+        # Not while a reply is half way through updating it.
+        with mount._status_Lock:
+            return mount.status.Copy()
+
+    def Broadcast(self, method_Name, *args, **kwargs):
+        """
+        Call LD_Planewave.<method_Name>(*args, **kwargs) on every mount in
+        parallel. Returns {base_Url: Fleet_Result} once all have answered.
+        """
+        futures = {
+            base_Url: self.executor.submit(getattr(mount, method_Name), *args, **kwargs)
+            for base_Url, mount in self.mounts.items()
+            }
+
+        results = {}
+        for base_Url, future in futures.items():
+            try:
+                value = future.result()
+            except Exception as e:
+                log.warning(f"{base_Url} {method_Name} failed: {e}")
+                results[base_Url] = Fleet_Result(base_Url, error=e)
+                continue
+
+            status_Code = getattr(value, "status_code", 200)
+            if status_Code != 200:
+                results[base_Url] = Fleet_Result(
+                    base_Url, value=value, error=f"Response code {status_Code}")
+            else:
+                results[base_Url] = Fleet_Result(base_Url, value=value)
+
+        return results
+
+    def Refresh_Status(self):
+        """
+        Poll every mount's status concurrently. Returns the Fleet_Results,
+        the value of each a snapshot of that mount's status. A mount whose
+        PWI4 didn't answer with a status fails (LD_Planewave.Status() would
+        hand back the last one it had). The merged view is then in
+        self.statuses.
+        """
+        results = self.Broadcast("_SendMsg", ["status"])
+        for base_Url, result in results.items():
+            if result.ok:
+                result.value = self._Snapshot(self.mounts[base_Url])
+        return results
+
+    def Connect(self):
+        return self.Broadcast("Connect")
+
+    def Disconnect(self):
+        return self.Broadcast("Disconnect")
+
+    def Enable(self, axis):
+        return self.Broadcast("Enable", axis)
+
+    def Disable(self, axis):
+        return self.Broadcast("Disable", axis)
+
+    def Home(self):
+        return self.Broadcast("Home")
+
+    def Stop(self):
+        return self.Broadcast("Stop")
+
+    def Park(self):
+        return self.Broadcast("Park")
+
+    def Tracking_On(self):
+        return self.Broadcast("Tracking_On")
+
+    def Tracking_Off(self):
+        return self.Broadcast("Tracking_Off")
+
+    def Goto_AltAz(self, alt_Degrees, az_Degrees):
+        return self.Broadcast("Goto_AltAz", alt_Degrees, az_Degrees)
+
+    def Goto_RaDec_J2000(self, ra_Hours, dec_Degrees):
+        return self.Broadcast("Goto_RaDec_J2000", ra_Hours, dec_Degrees)
+
+    def Follow_TLE(self, tle):
+        return self.Broadcast("Follow_TLE", tle)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
+    with LD_Planewave_Fleet(["http://127.0.0.1:8220", "http://127.0.0.1:8221"]) as fleet:
+        print(fleet.Refresh_Status())
+        print(fleet.Stop())
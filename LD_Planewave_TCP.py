@@ -0,0 +1,341 @@
+"""
+Clients for the TCP protocol spoken by older PWI installs (see the
+protocol notes in old/), in place of old/PlanewaveTCP.
+
+Every command and argument is a line. Replies are one line ("OK",
+"ERROR [message]" or "UNRECOGNIZED") except status, which comes between
+"beginstatus" and "endstatus" lines. The status is parsed into the same
+LD_PWI_Status as the HTTP clients use, though the TCP protocol only
+reports a handful of the values.
+
+Replies are read in blocks into a buffer and split into lines from there,
+with a real timeout on each exchange.
+"""
+
+import asyncio
+import logging
+import socket
+import sys
+import threading
+import time
+
+import LD_PWI_Status
+import LD_Planewave
+
+log = logging.getLogger(__name__)
+
+# Where PWI listens for the TCP protocol.
+DEFAULT_PORT = 8877
+
+
+def Command_Message(command, args=()):
+    """
+    The bytes to send for command and its arguments, a line each.
+    """
+    return "".join(f"{line}\n" for line in (command, *args)).encode("ascii")
+
+
+def _Check_Reply(command, reply):
+    if reply != "OK":
+        log.warning(f"PWI replied {reply} to {command}")
+    return reply
+
+
+class LD_Planewave_TCP:
+    """
+    Blocking client for the PWI TCP protocol. Safe to share between
+    threads, one exchange happens at a time.
+
+    The commands return PWI's reply line ("OK" or the error) and Status()
+    returns self.status, updated from the reply. If an exchange times out
+    the connection is dropped (the reply might still turn up and be taken
+    as the answer to the next command) and made again on the next command.
+    """
+
+    def __init__(self, ip_Address="127.0.0.1", port=DEFAULT_PORT, timeout=5):
+        self.ip_Address = ip_Address
+        self.port = port
+        self.timeout = timeout
+
+        # Container for the status messages of the device.
+        self.status = LD_PWI_Status.LD_PWI_Status()
+
+        self._lock = threading.Lock()
+        self._socket = None
+        self._buffer = bytearray()
+        self._Connect()
+
+    def _Connect(self):
+        log.debug(f"Connecting to {self.ip_Address}:{self.port}")
+        self._socket = socket.create_connection((self.ip_Address, self.port), self.timeout)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._buffer.clear()
+
+    def _Drop(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def _Read_Line(self, deadline):
+        """
+        The next line from PWI without its line ending.
+        """
+        while True:
+            end = self._buffer.find(b"\n")
+            if end >= 0:
+                line = bytes(self._buffer[:end])
+                del self._buffer[:end + 1]
+                return line.rstrip(b"\r").decode("ascii")
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"No reply from PWI within {self.timeout} s")
+            self._socket.settimeout(remaining)
+            try:
+                data = self._socket.recv(65536)
+            except socket.timeout:
+                raise TimeoutError(f"No reply from PWI within {self.timeout} s")
+            if not data:
+                raise ConnectionResetError("PWI closed the connection")
+            self._buffer += data
+
+    def _Exchange(self, command, args=(), status=False):
+        """
+        Send a command and read the reply: one line, or the lines of a
+        status if status is True.
+        """
+        with self._lock:
+            if self._socket is None:
+                self._Connect()
+            deadline = time.monotonic() + self.timeout
+            try:
+                self._socket.sendall(Command_Message(command, args))
+                if not status:
+                    return self._Read_Line(deadline)
+
+                # Skip anything before the status starts.
+                while self._Read_Line(deadline) != "beginstatus":
+                    pass
+                lines = []
+                while True:
+                    line = self._Read_Line(deadline)
+                    if line == "endstatus":
+                        return lines
+                    lines.append(line)
+            except OSError:
+                # Includes TimeoutError, the connection can't be trusted to
+                # be in step with the commands any more.
+                self._Drop()
+                raise
+
+    def Close(self):
+        """
+        Ask PWI to close the connection (there's no reply) and close it.
+        """
+        with self._lock:
+            if self._socket is None:
+                return
+            try:
+                self._socket.sendall(Command_Message("close"))
+            except OSError:
+                pass
+            self._Drop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_Info):
+        self.Close()
+
+    def Status(self):
+        """
+        Get the status.
+        """
+        lines = self._Exchange("status", status=True)
+        self.status.Update(LD_PWI_Status.TCP_Status_Body(lines))
+        return self.status
+
+    def Goto_RaDec_Apparent(self, ra_Hours, dec_Degrees):
+        log.debug(f"Go do ra/dec (apparent) {ra_Hours}h, {dec_Degrees}deg")
+        return _Check_Reply("gotoradecapp",
+                            self._Exchange("gotoradecapp", (float(ra_Hours), float(dec_Degrees))))
+
+    def Follow_TLE(self, tle):
+        """
+        Track a satellite. Takes the same formats as LD_Planewave.Follow_TLE.
+        """
+        tle_Payload = LD_Planewave.TLE_Payload(tle)
+        log.debug(f"Follow TLE named {tle_Payload['line0']}")
+        lines = (tle_Payload["line0"], tle_Payload["line1"], tle_Payload["line2"])
+        return _Check_Reply("tle", self._Exchange("tle", lines))
+
+    def Tracking_On(self):
+        log.debug("Mount track on")
+        return _Check_Reply("track", self._Exchange("track"))
+
+    def Stop(self):
+        log.debug("Stop mount")
+        return _Check_Reply("stop", self._Exchange("stop"))
+
+    def Set_Time_Offset(self, offset_Seconds):
+        """
+        Offset the time used to work out where the target is, useful for
+        satellite tracking.
+        """
+        log.debug(f"Time offset {offset_Seconds}s")
+        return _Check_Reply("settimeoffset",
+                            self._Exchange("settimeoffset", (float(offset_Seconds),)))
+
+    def RaDec_Offset(self, ra_Arcsec, dec_Arcsec):
+        """
+        Offset the current tracking target.
+        """
+        log.debug(f"Offset ra {ra_Arcsec}\", dec {dec_Arcsec}\"")
+        return _Check_Reply("radecoffset",
+                            self._Exchange("radecoffset", (float(ra_Arcsec), float(dec_Arcsec))))
+
+    def Pulse_Guide(self, direction, duration_Ms):
+        """
+        Like ASCOM PulseGuide(): direction 0-3 is north, south, east, west.
+        """
+        log.debug(f"Pulse guide {direction} for {duration_Ms}ms")
+        return _Check_Reply("pulseguide",
+                            self._Exchange("pulseguide", (int(direction), int(duration_Ms))))
+
+
+class LD_Planewave_TCP_Async:
+    """
+    asyncio version of LD_Planewave_TCP. Commands are coroutines, they go
+    to PWI one at a time (the protocol has no way to match replies to
+    requests otherwise) but don't block the event loop.
+    """
+
+    def __init__(self, ip_Address="127.0.0.1", port=DEFAULT_PORT, timeout=5):
+        self.ip_Address = ip_Address
+        self.port = port
+        self.timeout = timeout
+
+        # Container for the status messages of the device.
+        self.status = LD_PWI_Status.LD_PWI_Status()
+
+        self._lock = asyncio.Lock()
+        self._reader = None
+        self._writer = None
+
+    async def _Read_Line(self):
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionResetError("PWI closed the connection")
+        return line.rstrip(b"\r\n").decode("ascii")
+
+    async def _Talk(self, command, args, status):
+        if self._writer is None:
+            log.debug(f"Connecting to {self.ip_Address}:{self.port}")
+            self._reader, self._writer = await asyncio.open_connection(self.ip_Address, self.port)
+
+        self._writer.write(Command_Message(command, args))
+        await self._writer.drain()
+        if not status:
+            return await self._Read_Line()
+
+        while await self._Read_Line() != "beginstatus":
+            pass
+        lines = []
+        while True:
+            line = await self._Read_Line()
+            if line == "endstatus":
+                return lines
+            lines.append(line)
+
+    async def _Exchange(self, command, args=(), status=False):
+        """
+        Send a command and read the reply, see LD_Planewave_TCP._Exchange.
+        """
+        async with self._lock:
+            try:
+                return await asyncio.wait_for(self._Talk(command, args, status), self.timeout)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                await self._Drop()
+                raise
+
+    async def _Drop(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except ConnectionError:
+                pass
+            self._reader = self._writer = None
+
+    async def Close(self):
+        async with self._lock:
+            if self._writer is None:
+                return
+            try:
+                self._writer.write(Command_Message("close"))
+                await self._writer.drain()
+            except ConnectionError:
+                pass
+            await self._Drop()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_Info):
+        await self.Close()
+
+    async def Status(self):
+        """
+        Get the status. Returns a copy, so it won't change under the
+        caller when other tasks ask for the status.
+        """
+        lines = await self._Exchange("status", status=True)
+        self.status.Update(LD_PWI_Status.TCP_Status_Body(lines))
+        return self.status.Copy()
+
+    async def Goto_RaDec_Apparent(self, ra_Hours, dec_Degrees):
+        log.debug(f"Go do ra/dec (apparent) {ra_Hours}h, {dec_Degrees}deg")
+        return _Check_Reply("gotoradecapp", await self._Exchange(
+            "gotoradecapp", (float(ra_Hours), float(dec_Degrees))))
+
+    async def Follow_TLE(self, tle):
+        tle_Payload = LD_Planewave.TLE_Payload(tle)
+        log.debug(f"Follow TLE named {tle_Payload['line0']}")
+        lines = (tle_Payload["line0"], tle_Payload["line1"], tle_Payload["line2"])
+        return _Check_Reply("tle", await self._Exchange("tle", lines))
+
+    async def Tracking_On(self):
+        log.debug("Mount track on")
+        return _Check_Reply("track", await self._Exchange("track"))
+
+    async def Stop(self):
+        log.debug("Stop mount")
+        return _Check_Reply("stop", await self._Exchange("stop"))
+
+    async def Set_Time_Offset(self, offset_Seconds):
+        log.debug(f"Time offset {offset_Seconds}s")
+        return _Check_Reply("settimeoffset", await self._Exchange(
+            "settimeoffset", (float(offset_Seconds),)))
+
+    async def RaDec_Offset(self, ra_Arcsec, dec_Arcsec):
+        log.debug(f"Offset ra {ra_Arcsec}\", dec {dec_Arcsec}\"")
+        return _Check_Reply("radecoffset", await self._Exchange(
+            "radecoffset", (float(ra_Arcsec), float(dec_Arcsec))))
+
+    async def Pulse_Guide(self, direction, duration_Ms):
+        log.debug(f"Pulse guide {direction} for {duration_Ms}ms")
+        return _Check_Reply("pulseguide", await self._Exchange(
+            "pulseguide", (int(direction), int(duration_Ms))))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
+
+    with LD_Planewave_TCP("127.0.0.1", DEFAULT_PORT) as my_PW:
+        print(my_PW.Status())
+        print(my_PW.Goto_RaDec_Apparent(5.0, 5.0))
+        time.sleep(1)
+        print(my_PW.Stop())
+        print(my_PW.Tracking_On())
+        time.sleep(1)
+        print(my_PW.Stop())
@@ -0,0 +1,154 @@
+import logging
+import sys
+import threading
+import time
+
+import numpy as np
+
+import LD_PWI_Status
+
+log = logging.getLogger(__name__)
+
+
+def Column_Dtypes():
+    """
+    (name, dtype) of the columns a status is stored as, "time" first.
+    """
+    return [("time", "f8"), *[(name, dtype) for name, _, _, dtype in LD_PWI_Status.NUMERIC_FIELDS]]
+
+
+def Window_Names(names, all_Names):
+    """
+    The columns a Window() returns: all_Names if names is None, otherwise
+    names with "time" first.
+    """
+    if names is None:
+        return list(all_Names)
+    return ["time", *[name for name in names if name != "time"]]
+
+
+def Window_Slice(times, start_Time=None, end_Time=None):
+    """
+    The slice of the sorted array times with start_Time <= time < end_Time,
+    either can be None for open ended.
+    """
+    first = 0 if start_Time is None else int(np.searchsorted(times, start_Time, "left"))
+    last = len(times) if end_Time is None else int(np.searchsorted(times, end_Time, "left"))
+    return slice(first, last)
+
+
+class LD_Status_History:
+    """
+    Fixed size ring buffer of status samples, stored as one NumPy array per
+    field (see LD_PWI_Status.NUMERIC_FIELDS) plus a "time" column of
+    time.time() stamps. Appending writes into the preallocated arrays so
+    nothing is allocated per sample.
+
+    To record everything the poller sees:
+        history = LD_Status_History(capacity=10 * 60 * rate_Hz)
+        mount.Add_Poll_Callback(history.Append)
+        mount.Start_Poller(rate_Hz)
+    """
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self.columns = {name: np.zeros(self.capacity, dtype=dtype)
+                        for name, dtype in Column_Dtypes()}
+        # The arrays in LD_PWI_Status.Numeric_Values() order.
+        self._value_Columns = list(self.columns.values())[1:]
+
+        self._lock = threading.Lock()
+        # Index the next sample goes in and how many samples are held.
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def names(self):
+        return list(self.columns)
+
+    def Append(self, status, timestamp=None):
+        """
+        Add one LD_PWI_Status, overwriting the oldest once full. Has the
+        same signature as a poller callback.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        values = status.Numeric_Values()
+
+        with self._lock:
+            i = self._next
+            self.columns["time"][i] = timestamp
+            for column, value in zip(self._value_Columns, values):
+                column[i] = value
+
+            self._next = (i + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def Clear(self):
+        with self._lock:
+            self._next = 0
+            self._count = 0
+
+    def _Order(self):
+        """
+        Indices of the held samples, oldest first.
+        """
+        start = (self._next - self._count) % self.capacity
+        return (start + np.arange(self._count)) % self.capacity
+
+    def Column(self, name):
+        """
+        Copy of one column, oldest sample first.
+        """
+        with self._lock:
+            return self.columns[name][self._Order()]
+
+    def Window(self, start_Time=None, end_Time=None, names=None):
+        """
+        All samples with start_Time <= time < end_Time (either can be None
+        for open ended) as a dict of column name -> array, oldest first.
+        names picks a subset of columns, "time" is always included.
+        """
+        names = Window_Names(names, self.columns)
+
+        with self._lock:
+            order = self._Order()
+            # The times are in order so the window is a contiguous slice.
+            selected = order[Window_Slice(self.columns["time"][order], start_Time, end_Time)]
+
+            return {name: self.columns[name][selected] for name in names}
+
+    def Last(self, seconds, names=None):
+        """
+        The samples from the last `seconds` seconds.
+        """
+        return self.Window(time.time() - seconds, None, names)
+
+    def Export(self, filename, start_Time=None, end_Time=None):
+        """
+        Save (a window of) the history as a compressed .npz, one array per
+        column. Load with np.load(filename).
+        """
+        window = self.Window(start_Time, end_Time)
+        np.savez_compressed(filename, **window)
+        log.debug(f"Saved {len(window['time'])} samples to {filename}")
+
+
+if __name__ == "__main__":
+    import LD_Planewave
+
+    logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
+    myMount = LD_Planewave.LD_Planewave("http://127.0.0.1", "8220")
+
+    history = LD_Status_History(capacity=10 * 60 * 5)
+    myMount.Add_Poll_Callback(history.Append)
+    myMount.Start_Poller(5)
+    time.sleep(10)
+    myMount.Stop_Poller()
+
+    recent = history.Last(5, ["mount.axis0.servo_error", "mount.axis1.servo_error"])
+    print(f"{len(recent['time'])} samples in the last 5 seconds")
+    print("RMS axis0 servo error", np.sqrt(np.mean(recent["mount.axis0.servo_error"] ** 2)))
@@ -0,0 +1,244 @@
+import logging
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import LD_PWI_Status
+
+log = logging.getLogger(__name__)
+
+DEFAULT_NAME = "ld_pwi4_status"
+
+# Identifies the block and its layout, so a reader built against a
+# different NUMERIC_FIELDS refuses it rather than misreading it.
+MAGIC = 0x50574934
+LAYOUT_VERSION = 1
+
+# Block header: magic, version, then the sequence counter which is odd
+# while the writer is part way through a sample.
+HEADER_DTYPE = np.dtype([("magic", "<u4"), ("version", "<u4"), ("sequence", "<u8")])
+
+# One sample is a float64 per value: the poll time, then every numeric
+# status field. Booleans and ints fit exactly and a flat array copies in
+# one go, where a structured record is many times slower to fill.
+SAMPLE_NAMES = ("time", *[name for name, _, _, _ in LD_PWI_Status.NUMERIC_FIELDS])
+SAMPLE_DTYPE = np.dtype("<f8")
+
+# Back from float64 to the type the status holds.
+_FROM_SAMPLE = {"f8": float, "i8": int, "?": bool}
+
+
+def _Block_Size():
+    return HEADER_DTYPE.itemsize + SAMPLE_DTYPE.itemsize * len(SAMPLE_NAMES)
+
+
+class LD_Status_Publisher:
+    """
+    Publishes the latest status into a named shared memory block so other
+    processes on this machine can read it without asking PWI4 (see
+    LD_Status_Reader). One process polls, everyone else reads.
+
+    The block is a fixed layout: a header with a sequence counter and one
+    sample of every LD_PWI_Status.NUMERIC_FIELDS value. The counter is
+    bumped to odd before writing and back to even after (a seqlock), so
+    readers can tell when they raced the writer and try again. There
+    must be only one publisher per block. A publisher killed mid write
+    leaves the counter odd, readers give up on it (see
+    LD_Status_Reader.Read_Sample) until a new publisher takes the block
+    over.
+
+    To publish everything the poller sees:
+        publisher = LD_Status_Publisher()
+        mount.Add_Poll_Callback(publisher.Publish)
+        mount.Start_Poller(rate_Hz)
+    """
+
+    def __init__(self, name=DEFAULT_NAME):
+        try:
+            self._shm = shared_memory.SharedMemory(name, create=True, size=_Block_Size())
+        except FileExistsError:
+            # Left behind by a publisher that didn't get to Close(), take
+            # it over rather than make the readers find a new name.
+            log.warning(f"Shared memory {name} already exists, reusing it")
+            self._shm = shared_memory.SharedMemory(name)
+            if self._shm.size < _Block_Size():
+                raise ValueError(f"Shared memory {name} is too small for the status")
+        self.name = name
+
+        self._header = np.ndarray((), HEADER_DTYPE, self._shm.buf, 0)
+        # The counter on its own, quicker to get at than through the record.
+        self._sequence = self._header["sequence"]
+        self._sample = np.ndarray(len(SAMPLE_NAMES), SAMPLE_DTYPE, self._shm.buf,
+                                  HEADER_DTYPE.itemsize)
+
+        # A fresh, even sequence of 0 means nothing published yet.
+        self._sequence[()] = 0
+        self._header["magic"] = MAGIC
+        self._header["version"] = LAYOUT_VERSION
+        log.debug(f"Publishing status to shared memory {name} ({self._shm.size} bytes)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_Info):
+        self.Close()
+
+    def Publish(self, status, timestamp=None):
+        """
+        Write one LD_PWI_Status into the block. Has the same signature as
+        a poller callback.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        # Build the sample first and copy it into the block in one go to
+        # keep the time the sequence is odd short.
+        sample = np.array([timestamp, *status.Numeric_Values()], SAMPLE_DTYPE)
+
+        sequence = int(self._sequence)
+        self._sequence[()] = sequence + 1
+        self._sample[:] = sample
+        self._sequence[()] = sequence + 2
+
+    def Close(self, unlink=True):
+        """
+        Detach from the block, and by default remove it. Readers that are
+        already attached keep working until they close.
+        """
+        if self._shm is None:
+            return
+        # Drop the views on the buffer before closing it.
+        self._header = self._sequence = self._sample = None
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+        self._shm = None
+
+
+class LD_Status_Reader:
+    """
+    Reads the status written by an LD_Status_Publisher in another process.
+    Reads never block the publisher, a read that overlaps a write is
+    retried.
+    """
+
+    def __init__(self, name=DEFAULT_NAME):
+        self._shm = shared_memory.SharedMemory(name)
+        self.name = name
+        if sys.platform != "win32" and sys.version_info < (3, 13):
+            # Before 3.13 attaching registers the block with the resource
+            # tracker, which then removes it when this process exits.
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self._shm._name, "shared_memory")
+
+        self._header = np.ndarray((), HEADER_DTYPE, self._shm.buf, 0)
+        # The counter on its own, quicker to get at than through the record.
+        self._sequence = self._header["sequence"]
+        self._sample = np.ndarray(len(SAMPLE_NAMES), SAMPLE_DTYPE, self._shm.buf,
+                                  HEADER_DTYPE.itemsize)
+        if self._header["magic"] != MAGIC or self._header["version"] != LAYOUT_VERSION:
+            self.Close()
+            raise ValueError(f"Shared memory {name} doesn't hold a status this reader understands")
+
+        self.sequence = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_Info):
+        self.Close()
+
+    def Close(self):
+        if self._shm is None:
+            return
+        self._header = self._sequence = self._sample = None
+        self._shm.close()
+        self._shm = None
+
+    def Read_Sample(self, max_Wait=0.1):
+        """
+        A consistent copy of the latest sample (a float64 array in
+        SAMPLE_NAMES order), or None if nothing has been published yet.
+        Also sets self.sequence to the sequence number it was read at.
+
+        A write only takes microseconds, so if the block is still part way
+        through one after max_Wait seconds the publisher died mid write
+        and TimeoutError is raised. A new publisher on the block fixes it.
+        """
+        give_Up = None
+        delay = 0.0
+        while True:
+            before = int(self._sequence)
+            if before == 0:
+                return None
+            if before % 2 == 0:
+                sample = self._sample.copy()
+                if int(self._sequence) == before:
+                    self.sequence = before
+                    return sample
+
+            # Raced the writer, back off from a yield up to a millisecond.
+            now = time.monotonic()
+            if give_Up is None:
+                give_Up = now + max_Wait
+            elif now > give_Up:
+                log.warning(f"Shared memory {self.name} has been part way through a write "
+                            f"for {max_Wait}s, its publisher has probably died")
+                raise TimeoutError(f"Status in shared memory {self.name} is stuck mid write")
+            time.sleep(delay)
+            delay = min(0.001, delay * 2 or 1e-5)
+
+    def Read(self):
+        """
+        The latest status as an LD_PWI_Status and its timestamp, or
+        (None, None) if nothing has been published yet. Only the numeric
+        fields are shared, strings such as the PWI4 version are left
+        empty.
+        """
+        sample = self.Read_Sample()
+        if sample is None:
+            return None, None
+
+        values = sample.tolist()
+        status = LD_PWI_Status.LD_PWI_Status()
+        sections = status.Sections()
+        for value, (_, section, attribute, dtype) in zip(values[1:], LD_PWI_Status.NUMERIC_FIELDS):
+            setattr(sections[section], attribute, _FROM_SAMPLE[dtype](value))
+        return status, values[0]
+
+    def Wait_For_Update(self, timeout=None, interval=0.001):
+        """
+        Wait for a sample newer than the last one read and return it as
+        Read() does. Raises TimeoutError after timeout seconds.
+        """
+        last = self.sequence
+        give_Up = None if timeout is None else time.monotonic() + timeout
+        while int(self._sequence) == last:
+            if give_Up is not None and time.monotonic() > give_Up:
+                raise TimeoutError(f"No new status in {timeout}s")
+            time.sleep(interval)
+        return self.Read()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
+
+    if len(sys.argv) > 1 and sys.argv[1] == "publish":
+        import LD_Planewave
+
+        myMount = LD_Planewave.LD_Planewave("http://127.0.0.1", "8220")
+        with LD_Status_Publisher() as publisher:
+            myMount.Add_Poll_Callback(publisher.Publish)
+            myMount.Start_Poller(5)
+            try:
+                while True:
+                    time.sleep(1)
+            except KeyboardInterrupt:
+                myMount.Stop_Poller()
+    else:
+        with LD_Status_Reader() as reader:
+            while True:
+                status, timestamp = reader.Wait_For_Update()
+                print(f"{timestamp:.3f} alt {status.mount.altitude} az {status.mount.azimuth}")
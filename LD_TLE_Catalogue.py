@@ -0,0 +1,248 @@
+"""
+TLE catalogues (e.g. CelesTrak's) compiled to a binary file that opens in
+milliseconds, with indexes to find entries by NORAD catalogue number, name
+prefix and epoch.
+
+    LD_TLE_Catalogue.Compile_File("active.txt", "active.tlecat")
+    with LD_TLE_Catalogue.LD_TLE_Catalogue("active.tlecat") as catalogue:
+        myMount.Follow_TLE(catalogue.NORAD(25544))
+
+or Open_Catalogue("active.txt") to compile on first use and whenever the
+text file is newer than the compiled one.
+
+The file is a header then fixed size sections, all little endian and
+memory mapped on opening so only the parts looked at are read:
+    records: NORAD number, epoch and the three lines of every TLE, in the
+             order of the text
+    norad, name, epoch indexes: the sorted keys and the record number of
+             each, for binary searches
+"""
+
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+import LD_MyTLE
+
+log = logging.getLogger(__name__)
+
+MAGIC = 0x544C4543  # "TLEC"
+FORMAT_VERSION = 1
+HEADER_DTYPE = np.dtype([("magic", "<u4"), ("version", "<u4"), ("count", "<u8")])
+
+# Lines are at most 69 characters, names are padded to the same.
+LINE_LENGTH = 69
+RECORD_DTYPE = np.dtype([("norad_Id", "<u4"), ("epoch", "<f8"), ("line0", f"S{LINE_LENGTH}"),
+                         ("line1", f"S{LINE_LENGTH}"), ("line2", f"S{LINE_LENGTH}")])
+
+# Every section after the header, in file order. Name keys are upper case
+# so prefix searches ignore case.
+SECTIONS = (
+    ("records", RECORD_DTYPE),
+    ("norad_Keys", np.dtype("<u4")),
+    ("norad_Order", np.dtype("<u4")),
+    ("name_Keys", np.dtype(f"S{LINE_LENGTH}")),
+    ("name_Order", np.dtype("<u4")),
+    ("epoch_Keys", np.dtype("<f8")),
+    ("epoch_Order", np.dtype("<u4")),
+    )
+
+DEFAULT_SUFFIX = ".tlecat"
+
+
+def _Layout(count):
+    """
+    (name, dtype, offset) of every section for a catalogue of count TLEs,
+    each starting on an 8 byte boundary, and the total size.
+    """
+    layout = []
+    offset = HEADER_DTYPE.itemsize
+    for name, dtype in SECTIONS:
+        offset = (offset + 7) // 8 * 8
+        layout.append((name, dtype, offset))
+        offset += dtype.itemsize * count
+    return layout, offset
+
+
+def Compile(tles, filename):
+    """
+    Write tles (LD_MyTLE) as a catalogue file. Written to a temporary file
+    and renamed, so a reader never sees half a catalogue.
+    """
+    count = len(tles)
+    records = np.zeros(count, RECORD_DTYPE)
+    records["norad_Id"] = [tle.norad_Id for tle in tles]
+    records["epoch"] = [tle.epoch for tle in tles]
+    for field in ("line0", "line1", "line2"):
+        index = int(field[-1])
+        records[field] = [tle.Lines()[index].encode("ascii", "replace") for tle in tles]
+
+    # Stable sorts, so among equal keys the order of the text is kept
+    # (NORAD lookups then take the newest epoch by searching the epochs).
+    name_Keys = np.char.upper(records["line0"])
+    sections = {"records": records}
+    for name, keys in (("norad", records["norad_Id"]), ("name", name_Keys),
+                       ("epoch", records["epoch"])):
+        order = np.argsort(keys, kind="stable")
+        sections[f"{name}_Keys"] = keys[order]
+        sections[f"{name}_Order"] = order.astype("<u4")
+
+    layout, size = _Layout(count)
+    temporary = f"{filename}.tmp{os.getpid()}"
+    with open(temporary, "wb") as f:
+        header = np.zeros((), HEADER_DTYPE)
+        header["magic"] = MAGIC
+        header["version"] = FORMAT_VERSION
+        header["count"] = count
+        f.write(header.tobytes())
+        for name, dtype, offset in layout:
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(np.ascontiguousarray(sections[name], dtype).tobytes())
+        f.truncate(size)
+    os.replace(temporary, filename)
+    log.debug(f"Compiled {count} TLEs to {filename}")
+
+
+def Compile_File(source, filename=None):
+    """
+    Compile a TLE text file, by default next to it with DEFAULT_SUFFIX.
+    Returns the catalogue's filename.
+    """
+    if filename is None:
+        filename = os.path.splitext(source)[0] + DEFAULT_SUFFIX
+    with open(source) as f:
+        Compile(LD_MyTLE.Parse_TLEs(f.read()), filename)
+    return filename
+
+
+def Open_Catalogue(source, filename=None):
+    """
+    Open the compiled catalogue of a TLE text file, compiling it first if
+    it's missing or older than the text.
+    """
+    if filename is None:
+        filename = os.path.splitext(source)[0] + DEFAULT_SUFFIX
+    if not os.path.exists(filename) or os.path.getmtime(filename) < os.path.getmtime(source):
+        log.info(f"Compiling {source}")
+        Compile_File(source, filename)
+    return LD_TLE_Catalogue(filename)
+
+
+class LD_TLE_Catalogue:
+    """
+    A compiled catalogue, memory mapped. Lookups return record numbers
+    (indexes into the catalogue), which Payload() turns into what
+    LD_Planewave.Follow_TLE takes and TLE() into an LD_MyTLE.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        header = np.fromfile(filename, HEADER_DTYPE, 1)
+        if len(header) == 0 or header["magic"][0] != MAGIC:
+            raise ValueError(f"{filename} isn't a TLE catalogue")
+        if header["version"][0] != FORMAT_VERSION:
+            raise ValueError(f"{filename} is catalogue version {header['version'][0]}, "
+                             f"this reads version {FORMAT_VERSION}")
+        self.count = int(header["count"][0])
+
+        layout, size = _Layout(self.count)
+        self._map = np.memmap(filename, np.uint8, "r", shape=(size,))
+        for name, dtype, offset in layout:
+            section = self._map[offset:offset + dtype.itemsize * self.count].view(dtype)
+            setattr(self, name, section)
+
+    def Close(self):
+        for name, _ in SECTIONS:
+            setattr(self, name, None)
+        self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_Info):
+        self.Close()
+
+    def __len__(self):
+        return self.count
+
+    def Payload(self, index):
+        """
+        Record index as the line0, line1, line2 dict PWI4 wants, ready for
+        LD_Planewave.Follow_TLE.
+        """
+        record = self.records[index]
+        return {field: record[field].decode("ascii") for field in ("line0", "line1", "line2")}
+
+    def TLE(self, index):
+        """
+        Record index as an LD_MyTLE.
+        """
+        payload = self.Payload(index)
+        return LD_MyTLE.LD_MyTLE([payload["line0"], payload["line1"], payload["line2"]])
+
+    def TLE_Array(self, indices):
+        """
+        Several records as an LD_MyTLE.TLE_Array, to propagate together.
+        """
+        return LD_MyTLE.TLE_Array([self.TLE(int(index)) for index in np.atleast_1d(indices)])
+
+    def Find_NORAD(self, norad_Id):
+        """
+        Record number of a NORAD catalogue number (the newest epoch if the
+        catalogue has several), or None.
+        """
+        low = np.searchsorted(self.norad_Keys, norad_Id, "left")
+        high = np.searchsorted(self.norad_Keys, norad_Id, "right")
+        if low == high:
+            return None
+        matches = self.norad_Order[low:high]
+        return int(matches[np.argmax(self.records["epoch"][matches])])
+
+    def NORAD(self, norad_Id):
+        """
+        The Follow_TLE payload for a NORAD catalogue number. Raises
+        KeyError if it's not in the catalogue.
+        """
+        index = self.Find_NORAD(norad_Id)
+        if index is None:
+            raise KeyError(f"NORAD {norad_Id} isn't in {self.filename}")
+        return self.Payload(index)
+
+    def Find_Name(self, prefix, limit=None):
+        """
+        Record numbers of every entry whose name starts with prefix (case
+        insensitive), in name order.
+        """
+        key = prefix.upper().encode("ascii")
+        low = np.searchsorted(self.name_Keys, key, "left")
+        high = np.searchsorted(self.name_Keys, key + b"\xff", "left")
+        if limit is not None:
+            high = min(high, low + limit)
+        return self.name_Order[low:high].astype(np.int64)
+
+    def Find_Epoch(self, start=None, end=None):
+        """
+        Record numbers of every entry with an epoch (unix time) from start
+        up to end, oldest first. Either end can be left open.
+        """
+        low = 0 if start is None else np.searchsorted(self.epoch_Keys, start, "left")
+        high = self.count if end is None else np.searchsorted(self.epoch_Keys, end, "left")
+        return self.epoch_Order[low:high].astype(np.int64)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
+
+    source = sys.argv[1] if len(sys.argv) > 1 else "active.txt"
+    start = time.perf_counter()
+    catalogue = Open_Catalogue(source)
+    print(f"{len(catalogue)} TLEs open in {1000 * (time.perf_counter() - start):.1f} ms")
+
+    print(catalogue.NORAD(25544))
+    for index in catalogue.Find_Name("STARLINK", limit=5):
+        print(catalogue.TLE(index))
+    week_Ago = time.time() - 7 * 86400
+    print(f"{len(catalogue.Find_Epoch(week_Ago))} with epochs in the last week")
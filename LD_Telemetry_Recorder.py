@@ -0,0 +1,225 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+import LD_Status_History
+
+log = logging.getLogger(__name__)
+
+# Layout of a recording, a directory holding:
+#     meta.json: the column names and dtypes
+#     <column name>.bin: the raw little endian values of that column, one
+#                        per sample, appended to a chunk at a time
+META_FILE = "meta.json"
+FORMAT_VERSION = 1
+
+
+def _Columns():
+    """
+    (name, dtype) of every recorded column, time first.
+    """
+    return [(name, np.dtype(dtype).newbyteorder("<").str)
+            for name, dtype in LD_Status_History.Column_Dtypes()]
+
+
+def _Column_File(directory, name):
+    return os.path.join(directory, f"{name}.bin")
+
+
+class LD_Telemetry_Recorder:
+    """
+    Records status samples to disk as one append-only binary file per
+    column (see LD_Status_History.Column_Dtypes) plus a "time" column.
+    Samples are gathered into a chunk of arrays in memory and each full
+    chunk is appended to the column files, so a night of polling costs
+    a handful of small writes per minute. Read it back with
+    LD_Telemetry_Reader.
+
+    To record everything the poller sees:
+        recorder = LD_Telemetry_Recorder("night_2024-01-01")
+        mount.Add_Poll_Callback(recorder.Append)
+        mount.Start_Poller(rate_Hz)
+        ...
+        recorder.Close()
+
+    Recording into an existing directory appends to it, after cutting
+    every column back to the samples they all have.
+    """
+
+    def __init__(self, directory, chunk_Size=1024):
+        self.directory = directory
+        self.chunk_Size = int(chunk_Size)
+        self.columns = _Columns()
+
+        os.makedirs(directory, exist_ok=True)
+        meta_Path = os.path.join(directory, META_FILE)
+        if os.path.exists(meta_Path):
+            with open(meta_Path) as meta_File:
+                meta = json.load(meta_File)
+            if [tuple(column) for column in meta["columns"]] != self.columns:
+                raise ValueError(f"{directory} was recorded with different columns")
+            self._Truncate_Columns()
+            log.debug(f"Appending to recording in {directory}")
+        else:
+            with open(meta_Path, "w") as meta_File:
+                json.dump({"version": FORMAT_VERSION,
+                           "created": time.time(),
+                           "columns": self.columns}, meta_File, indent=1)
+            log.debug(f"New recording in {directory}")
+
+        self._chunk = {name: np.zeros(self.chunk_Size, dtype=dtype)
+                       for name, dtype in self.columns}
+        self._files = {name: open(_Column_File(directory, name), "ab")
+                       for name, _ in self.columns}
+        # The arrays in LD_PWI_Status.Numeric_Values() order.
+        self._value_Columns = list(self._chunk.values())[1:]
+
+        self._lock = threading.Lock()
+        # Samples waiting in the chunk.
+        self._count = 0
+        self.samples_Written = 0
+
+    def _Truncate_Columns(self):
+        """
+        Cut every column file back to the samples they all have, so a
+        recorder that died mid chunk doesn't leave new samples appended
+        out of line with each other.
+        """
+        paths = [(_Column_File(self.directory, name), np.dtype(dtype).itemsize)
+                 for name, dtype in self.columns]
+        count = min((os.path.getsize(path) // itemsize if os.path.exists(path) else 0)
+                    for path, itemsize in paths)
+        for path, itemsize in paths:
+            if os.path.exists(path) and os.path.getsize(path) != count * itemsize:
+                log.warning(f"Truncating {path} to {count} samples")
+                os.truncate(path, count * itemsize)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_Info):
+        self.Close()
+
+    def Append(self, status, timestamp=None):
+        """
+        Add one LD_PWI_Status to the recording. Has the same signature as a
+        poller callback.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        values = status.Numeric_Values()
+
+        with self._lock:
+            if self._files is None:
+                raise RuntimeError(f"Recording in {self.directory} is closed")
+            i = self._count
+            self._chunk["time"][i] = timestamp
+            for column, value in zip(self._value_Columns, values):
+                column[i] = value
+
+            self._count = i + 1
+            if self._count == self.chunk_Size:
+                self._Write_Chunk()
+
+    def _Write_Chunk(self):
+        for name, column in self._chunk.items():
+            column[:self._count].tofile(self._files[name])
+            self._files[name].flush()
+        self.samples_Written += self._count
+        self._count = 0
+
+    def Flush(self):
+        """
+        Write out the samples gathered so far, e.g. so a reader sees them.
+        """
+        with self._lock:
+            if self._files is None:
+                raise RuntimeError(f"Recording in {self.directory} is closed")
+            if self._count:
+                self._Write_Chunk()
+
+    def Close(self):
+        with self._lock:
+            if self._files is None:
+                return
+            if self._count:
+                self._Write_Chunk()
+            for column_File in self._files.values():
+                column_File.close()
+            self._files = None
+        log.debug(f"Closed recording in {self.directory}, {self.samples_Written} samples")
+
+
+class LD_Telemetry_Reader:
+    """
+    Reads a recording made by LD_Telemetry_Recorder. Columns are memory
+    mapped so opening a night's recording and pulling out one column
+    only touches that column's file.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, META_FILE)) as meta_File:
+            meta = json.load(meta_File)
+        if meta["version"] != FORMAT_VERSION:
+            raise ValueError(f"Don't know recording format version {meta['version']}")
+        self.dtypes = {name: np.dtype(dtype) for name, dtype in meta["columns"]}
+        self.created = meta["created"]
+
+        # A recorder that died mid chunk can leave some columns longer than
+        # others, only the samples every column has are complete.
+        self._count = min(os.path.getsize(_Column_File(directory, name)) // dtype.itemsize
+                          for name, dtype in self.dtypes.items())
+        self._maps = {}
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def names(self):
+        return list(self.dtypes)
+
+    def Column(self, name):
+        """
+        Memory mapped (read only) array of one column, oldest first.
+        """
+        if name not in self._maps:
+            if self._count == 0:
+                self._maps[name] = np.zeros(0, dtype=self.dtypes[name])
+            else:
+                self._maps[name] = np.memmap(_Column_File(self.directory, name),
+                                             dtype=self.dtypes[name], mode="r",
+                                             shape=(self._count,))
+        return self._maps[name]
+
+    def Window(self, start_Time=None, end_Time=None, names=None):
+        """
+        All samples with start_Time <= time < end_Time (either can be None
+        for open ended) as a dict of column name -> array, same as
+        LD_Status_History.Window. The arrays are views on the memory map.
+        """
+        names = LD_Status_History.Window_Names(names, self.dtypes)
+        window = LD_Status_History.Window_Slice(self.Column("time"), start_Time, end_Time)
+        return {name: self.Column(name)[window] for name in names}
+
+
+if __name__ == "__main__":
+    import LD_Planewave
+
+    logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
+    myMount = LD_Planewave.LD_Planewave("http://127.0.0.1", "8220")
+
+    with LD_Telemetry_Recorder("telemetry_demo") as recorder:
+        myMount.Add_Poll_Callback(recorder.Append)
+        myMount.Start_Poller(5)
+        time.sleep(10)
+        myMount.Stop_Poller()
+
+    reader = LD_Telemetry_Reader("telemetry_demo")
+    servo_Error = reader.Column("mount.axis0.servo_error")
+    print(f"{len(reader)} samples, RMS axis0 servo error {np.sqrt(np.mean(servo_Error ** 2))}")
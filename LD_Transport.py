@@ -0,0 +1,443 @@
+"""
+Interchangeable ways of making the HTTP GET requests PWI4 understands.
+
+Every transport has Get(url, params) returning a response with url,
+status_code, reason, headers and content (a requests.Response, or an
+HTTP_Response which has the same attributes), and Close(). A reply PWI4
+sends (even a 404) is returned, failing to get one raises an OSError
+(requests' exceptions are OSErrors too). timeout is a number of seconds
+or a (connect, read) tuple, as for requests.
+
+A request is only sent again when PWI4 can't have acted on it: it never
+got onto the wire (a pooled connection had died), or it only reads
+(READ_ONLY_PATHS). Commands like mount/offset?axis0_add_arcsec= or
+virtualcamera/take_image must not run twice because a reply went missing.
+
+    requests: pooled keep-alive requests.Session, the default
+    urllib: urllib.request, a new connection per request
+    http.client: pooled keep-alive http.client connections, no
+                 dependencies and less overhead than requests
+    asyncio: Async_Transport, whose Get is a coroutine, for
+             LD_Planewave_Async
+
+To find the quickest for a deployment:
+    python LD_Benchmark.py transports --url http://127.0.0.1:8220
+"""
+
+import asyncio
+import http.client
+import logging
+import select
+import socket
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import requests
+
+import LD_Metrics
+
+log = logging.getLogger(__name__)
+
+# Paths that only read from PWI4, so a request that may or may not have
+# reached it can safely be sent again.
+READ_ONLY_PATHS = {"/status"}
+
+
+def _Split_Timeout(timeout):
+    """
+    (connect, read) seconds from a number or a tuple.
+    """
+    if isinstance(timeout, (tuple, list)):
+        return tuple(timeout)
+    return timeout, timeout
+
+
+def _Target(url, params):
+    """
+    Split a URL plus params into ((host, port), "/path?query").
+    """
+    split_Url = urllib.parse.urlsplit(url)
+    query = split_Url.query
+    if params:
+        encoded = urllib.parse.urlencode(params, quote_via=urllib.parse.quote)
+        query = f"{query}&{encoded}" if query else encoded
+    path = split_Url.path or "/"
+    target = f"{path}?{query}" if query else path
+    return (split_Url.hostname, split_Url.port or 80), target
+
+
+def _Read_Only(url):
+    """
+    Whether url (or a "/path?query" target) only reads from PWI4.
+    """
+    return urllib.parse.urlsplit(url).path in READ_ONLY_PATHS
+
+
+def _Is_Dropped(sock):
+    """
+    Whether an idle keep-alive socket has been closed by the server (or
+    has unexpected data waiting), either way it mustn't be reused.
+    """
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
+
+
+class HTTP_Response:
+    """
+    Just enough of a requests.Response for LD_PWI_Status.Update() and the
+    logging in _SendMsg to work on replies not made by requests.
+    """
+
+    def __init__(self, url, status_code, reason, content, headers=None):
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.content = content
+        self.headers = headers if headers is not None else {}
+
+    def __repr__(self):
+        return f"<Response [{self.status_code}]>"
+
+    def iter_lines(self):
+        return iter(self.content.splitlines())
+
+
+class Requests_Transport:
+    """
+    A requests.Session with a pool of pool_Size keep-alive connections.
+    Connection set up time goes to LD_Metrics.Take_Connect_Time().
+    """
+
+    def __init__(self, timeout=(3.05, 10), pool_Size=4):
+        self.timeout = timeout
+        self.pool_Size = pool_Size
+        self.session = None
+        self._Open_Session()
+
+    def _Open_Session(self):
+        if self.session is not None:
+            self.session.close()
+
+        adapter = LD_Metrics.Timed_HTTPAdapter(pool_connections=1,
+                                               pool_maxsize=self.pool_Size)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def Get(self, url, params):
+        """
+        urllib3 already drops pooled connections the server has closed
+        before reusing them. If a read-only request still fails (e.g. PWI4
+        was restarted mid request), make a fresh session and try once more.
+        """
+        try:
+            return self.session.get(url, params=params, timeout=self.timeout)
+        except requests.ConnectionError as e:
+            if not _Read_Only(url):
+                raise
+            log.warning(f"Lost connection to PWI4 ({e}), reconnecting")
+            self._Open_Session()
+            return self.session.get(url, params=params, timeout=self.timeout)
+
+    def Close(self):
+        self.session.close()
+
+
+class Urllib_Transport:
+    """
+    urllib.request.urlopen, which opens a new connection for every
+    request. Only the read timeout is used.
+    """
+
+    def __init__(self, timeout=(3.05, 10), pool_Size=None):
+        self.timeout = timeout
+
+    def Get(self, url, params):
+        (host, port), target = _Target(url, params)
+        full_Url = f"http://{host}:{port}{target}"
+        read_Timeout = _Split_Timeout(self.timeout)[1]
+        try:
+            with urllib.request.urlopen(full_Url, timeout=read_Timeout) as response:
+                return HTTP_Response(full_Url, response.status, response.reason,
+                                     response.read(), dict(response.headers))
+        except urllib.error.HTTPError as e:
+            # Error codes are still replies, return them like the others do.
+            return HTTP_Response(full_Url, e.code, e.reason, e.read(), dict(e.headers))
+
+    def Close(self):
+        pass
+
+
+class HTTPClient_Transport:
+    """
+    http.client connections kept alive and reused, up to pool_Size idle
+    ones per server. Safe to share between threads, each request has a
+    connection to itself. Connection set up time goes to
+    LD_Metrics.Take_Connect_Time().
+    """
+
+    def __init__(self, timeout=(3.05, 10), pool_Size=4):
+        self.timeout = timeout
+        self.pool_Size = pool_Size
+        self._lock = threading.Lock()
+        # (host, port) -> idle connections
+        self._idle = {}
+
+    def _Connect(self, server):
+        connect_Timeout, read_Timeout = _Split_Timeout(self.timeout)
+        connection = http.client.HTTPConnection(*server, timeout=connect_Timeout)
+        start = time.perf_counter()
+        connection.connect()
+        LD_Metrics.Add_Connect_Time(time.perf_counter() - start)
+        connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connection.sock.settimeout(read_Timeout)
+        return connection
+
+    def _Exchange(self, connection, target):
+        connection.request("GET", target)
+        response = connection.getresponse()
+        return response, response.read()
+
+    def _Idle_Connection(self, server):
+        """
+        A pooled connection to server that's still open, or None.
+        """
+        while True:
+            with self._lock:
+                idle = self._idle.get(server)
+                connection = idle.pop() if idle else None
+            if connection is None or not _Is_Dropped(connection.sock):
+                return connection
+            # PWI4 restarted or timed it out.
+            log.debug(f"Pooled connection to {server} was closed, dropping it")
+            connection.close()
+
+    def Get(self, url, params):
+        server, target = _Target(url, params)
+        connection = self._Idle_Connection(server)
+
+        try:
+            if connection is not None:
+                try:
+                    connection.request("GET", target)
+                except ConnectionError as e:
+                    # Failed to send, so PWI4 never saw it.
+                    log.warning(f"Lost connection to PWI4 ({e!r}), reconnecting")
+                    connection.close()
+                    connection = None
+                else:
+                    try:
+                        response = connection.getresponse()
+                        content = response.read()
+                    except (ConnectionError, http.client.HTTPException) as e:
+                        # PWI4 may have acted on it, only try again if
+                        # that's harmless.
+                        connection.close()
+                        connection = None
+                        if not _Read_Only(target):
+                            raise
+                        log.warning(f"Lost connection to PWI4 ({e!r}), reconnecting")
+
+            if connection is None:
+                connection = self._Connect(server)
+                response, content = self._Exchange(connection, target)
+        except http.client.HTTPException as e:
+            if connection is not None:
+                connection.close()
+            raise ConnectionError(f"Bad reply from {server}: {e!r}") from e
+        except OSError:
+            if connection is not None:
+                connection.close()
+            raise
+
+        if response.will_close:
+            connection.close()
+        else:
+            with self._lock:
+                idle = self._idle.setdefault(server, [])
+                if len(idle) < self.pool_Size:
+                    idle.append(connection)
+                    connection = None
+            if connection is not None:
+                connection.close()
+
+        return HTTP_Response(f"http://{server[0]}:{server[1]}{target}",
+                             response.status, response.reason, content,
+                             dict(response.getheaders()))
+
+    def Close(self):
+        with self._lock:
+            for idle in self._idle.values():
+                for connection in idle:
+                    connection.close()
+            self._idle = {}
+
+
+class _Not_Sent(ConnectionError):
+    """
+    A pooled connection failed before the request went out.
+    """
+
+
+class Async_Transport:
+    """
+    Minimal HTTP/1.1 keep-alive client on asyncio streams. Get is a
+    coroutine so many requests can be in flight on one event loop. Up to
+    pool_Size connections are in use at once, requests beyond that wait
+    for a free one.
+    """
+
+    def __init__(self, timeout=10, pool_Size=4):
+        # asyncio.wait_for takes a single timeout for the whole request.
+        self.timeout = sum(timeout) if isinstance(timeout, (tuple, list)) else timeout
+        self.pool_Size = pool_Size
+
+        # (host, port) -> idle (reader, writer) pairs
+        self._idle = {}
+        self._slots = asyncio.Semaphore(pool_Size)
+
+    async def _Read_Response(self, reader):
+        """
+        Read one HTTP/1.1 response. Returns the status code, reason,
+        headers, body and whether the server is willing to keep the
+        connection open.
+        """
+        status_Line = await reader.readline()
+        if not status_Line:
+            raise ConnectionResetError("PWI4 closed the connection")
+        _, status_Code, reason = status_Line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        if "content-length" in headers:
+            content = await reader.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            content = b"".join(chunks)
+        else:
+            # No framing so the body runs until the server hangs up.
+            content = await reader.read()
+            headers["connection"] = "close"
+
+        keep_Alive = headers.get("connection", "").lower() != "close"
+        return int(status_Code), reason, headers, content, keep_Alive
+
+    async def _Exchange(self, server, target, reuse):
+        """
+        Send one GET on a pooled (or new) connection and read the reply.
+        Raises _Not_Sent if a pooled connection failed before the request
+        went out.
+        """
+        idle = self._idle.setdefault(server, [])
+        reader = writer = None
+        while reuse and idle:
+            reader, writer = idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                break
+            # PWI4 restarted or timed it out.
+            writer.close()
+            reader = writer = None
+        pooled = writer is not None
+        if not pooled:
+            reader, writer = await asyncio.open_connection(*server)
+
+        try:
+            writer.write((f"GET {target} HTTP/1.1\r\n"
+                          f"Host: {server[0]}:{server[1]}\r\n"
+                          "Connection: keep-alive\r\n\r\n").encode("latin-1"))
+            await writer.drain()
+        except ConnectionError as e:
+            writer.close()
+            if pooled:
+                raise _Not_Sent(e) from e
+            raise
+
+        try:
+            status_Code, reason, headers, content, keep_Alive = await self._Read_Response(reader)
+        except BaseException:
+            writer.close()
+            raise
+
+        if keep_Alive:
+            idle.append((reader, writer))
+        else:
+            writer.close()
+
+        return HTTP_Response(f"http://{server[0]}:{server[1]}{target}",
+                             status_Code, reason, content, headers)
+
+    async def Get(self, url, params):
+        """
+        GET url from PWI4. If a pooled connection turns out to be dead
+        (e.g. PWI4 was restarted) before the request went out, or the
+        request only reads, try once more on a fresh connection.
+        """
+        server, target = _Target(url, params)
+        async with self._slots:
+            try:
+                return await asyncio.wait_for(self._Exchange(server, target, True), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                if not isinstance(e, _Not_Sent) and not _Read_Only(target):
+                    raise
+                log.warning(f"Lost connection to PWI4 ({e}), reconnecting")
+                return await asyncio.wait_for(self._Exchange(server, target, False), self.timeout)
+
+    async def Close(self):
+        """
+        Close the pooled connections.
+        """
+        for idle in self._idle.values():
+            while idle:
+                reader, writer = idle.pop()
+                writer.close()
+                try:
+                    await writer.wait_closed()
+                except ConnectionError:
+                    pass
+
+
+# The blocking transports, by name.
+TRANSPORTS = {
+    "requests": Requests_Transport,
+    "urllib": Urllib_Transport,
+    "http.client": HTTPClient_Transport,
+    }
+
+
+def Make_Transport(name="requests", timeout=(3.05, 10), pool_Size=4):
+    """
+    Make one of the TRANSPORTS by name.
+    """
+    if name not in TRANSPORTS:
+        raise ValueError(f"Unknown transport {name}, choose from {list(TRANSPORTS)}")
+    return TRANSPORTS[name](timeout=timeout, pool_Size=pool_Size)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
+
+    for name in TRANSPORTS:
+        transport = Make_Transport(name)
+        response = transport.Get("http://127.0.0.1:8220/status", {})
+        print(f"{name}: {response} {len(response.content)} bytes")
+        transport.Close()
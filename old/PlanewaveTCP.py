@@ -2,6 +2,9 @@
 """
 A way to control a Planewave telescope by sending messages over TCP to
 a port opened by the PWI software running on Windows.
+
+Superseded by LD_Planewave_TCP, which buffers replies, has real timeouts
+and parses the status.
 """
 
 __author__ = "David Lowndes"
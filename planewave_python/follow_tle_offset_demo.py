@@ -58,20 +58,10 @@ wait_for_input("Press enter to begin slewing to follow this TLE")
 pwi4.mount_follow_tle(tle1, tle2, tle3)
 time.sleep(1) # Give the mount a chance to begin slewing
 
-# Monitor distance to target to determine when we have arrived
-while True:
-    status = pwi4.status()
-    dist0 = status.mount.axis0.dist_to_target_arcsec
-    dist1 = status.mount.axis1.dist_to_target_arcsec
-    print("Distance to target: %.1f x %.1f arcsec" % (dist0, dist1))
-
-    # If both axes are within 2 arcseconds of target,
-    # break out of loop
-    if abs(dist0) < 2 and abs(dist1) < 2:
-        print("Arrived at target")
-        break
-
-    time.sleep(0.2)
+# Monitor distance to target to determine when we have arrived:
+# wait until both axes are within 2 arcseconds of target
+pwi4.wait_until_on_target(tolerance_arcsec=2)
+print("Arrived at target")
 
 # Perform a 20 arcsecond offset in the native "axis0" coordinates of the mount,
 # For an EQ mount: Axis0 = RA axis, Axis1 = Dec axis
@@ -25,10 +25,16 @@ def get_default_catalog_location():
         return os.path.expanduser("~\\Documents\\Kepler")
 
 
-def platesolve(image_file, arcsec_per_pixel):
+def platesolve(image_file, arcsec_per_pixel, output_file_path=None):
+    """
+    Solve image_file with ps3cli. Solves running at the same time need
+    their own output_file_path, by default the results go to a shared
+    file in the temp directory.
+    """
     stdout_destination = None  # Replace with PIPE if we want to capture the output rather than displaying on the console
 
-    output_file_path = os.path.join(tempfile.gettempdir(), "ps3cli_results.txt")
+    if output_file_path is None:
+        output_file_path = os.path.join(tempfile.gettempdir(), "ps3cli_results.txt")
 
     if PS3_CATALOG is None:
         catalog_path = get_default_catalog_location()
@@ -1,8 +1,8 @@
 #!/usr/bin/env python
 
-import time
 import pwi4_client
 from platesolve import platesolve
+from slew_order import optimise_point_order
 
 # NOTE: Replace this with the estimated arcseconds per pixel
 # for an image taken with your camera.
@@ -12,6 +12,29 @@ IMAGE_ARCSEC_PER_PIXEL = 1.0
 def main():
     pwi4 = pwi4_client.PWI4()
 
+    prepare_mount(pwi4)
+
+    # Construct a grid of 3 x 6 = 18 Alt-Az points
+    # ranging from 20 to 80 degrees Altitude, and from 
+    # 5 to 355 degrees Azimuth.
+    points = create_point_list(3, 20, 80, 6, 5, 355)
+
+    # Visit them in the order that's quickest to slew through,
+    # starting from wherever the mount is now
+    status = pwi4.status()
+    points = optimise_point_order(points, start=(status.mount.altitude_degs,
+                                                 status.mount.azimuth_degs))
+
+    for (alt, azm) in points:
+        map_point(pwi4, alt, azm)
+
+    print("DONE!")
+
+def prepare_mount(pwi4):
+    """
+    Connect to the mount and enable both axes, if they aren't already.
+    """
+
     print("Checking connection to PWI4")
     status = pwi4.status()
 
@@ -27,16 +50,6 @@ def main():
         print("Enabling axis 1")
         pwi4.mount_enable(1)
 
-    # Construct a grid of 3 x 6 = 18 Alt-Az points
-    # ranging from 20 to 80 degrees Altitude, and from 
-    # 5 to 355 degrees Azimuth.
-    points = create_point_list(3, 20, 80, 6, 5, 355)
-    
-    for (alt, azm) in points:
-        map_point(pwi4, alt, azm)
-
-    print("DONE!")
-
 def create_point_list(num_alt, min_alt, max_alt, num_azm, min_azm, max_azm):
     """
     Build a grid of target points in alt-az coordinate space.
@@ -72,25 +85,18 @@ def take_image_virtualcam(filename, pwi4):
     pwi4.virtualcamera_take_image_and_save(filename)
 
 
-def map_point(pwi4, alt_degs, azm_degs):
+def slew_to_point(pwi4, alt_degs, azm_degs):
     """
-    Slew to the target Alt-Az, take an image,
-    PlateSolve it, and (if successful) add to the model
+    Slew to the target Alt-Az and wait until the mount gets there
     """
 
     print("Slewing to Azimuth %.3f, Altitude %3f..." % (azm_degs, alt_degs))
     pwi4.mount_goto_alt_az(alt_degs, azm_degs)
 
-    while True:
-        status = pwi4.status()
-        if not status.mount.is_slewing:
-            break
-        time.sleep(0.1)
-    
     # Confirm that we actually reached our target.
     # If, for example, the user clicked Stop in the GUI during
     # the slew, we probably don't want to continue building the model.
-    status = pwi4.status()
+    status = pwi4.wait_for_slew_complete()
 
     azm_error = abs(status.mount.azimuth_degs - azm_degs)
     alt_error = abs(status.mount.altitude_degs - alt_degs)
@@ -103,6 +109,15 @@ def map_point(pwi4, alt_degs, azm_degs):
             alt_degs
         ))
 
+    return status
+
+def map_point(pwi4, alt_degs, azm_degs):
+    """
+    Slew to the target Alt-Az, take an image,
+    PlateSolve it, and (if successful) add to the model
+    """
+
+    slew_to_point(pwi4, alt_degs, azm_degs)
 
     # Mount will be stopped after an alt-az slew, so turn
     # on sidereal tracking before taking an image
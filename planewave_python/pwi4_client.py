@@ -1,22 +1,37 @@
+import threading
+import time
+
 try:
     # Python 3.x version
     from urllib.parse import urlencode
-    from urllib.request import urlopen
+    from urllib.request import build_opener, HTTPHandler
     from urllib.error import HTTPError
+    from http.client import HTTPConnection
 except ImportError:
     # Python 2.7 version
     from urllib import urlencode
-    from urllib2 import urlopen, HTTPError
+    from urllib2 import HTTPError, build_opener, HTTPHandler
+    from httplib import HTTPConnection
 
 class PWI4:
     """
     Client to the PWI4 telescope control application.
     """
 
-    def __init__(self, host="localhost", port=8220):
+    def __init__(self, host="localhost", port=8220, metrics=None, transport=None):
+        """
+        metrics can be an LD_Metrics object (or anything with the same
+        Record_Request/Observe methods) to collect request counts and
+        latencies.
+
+        transport can be an LD_Transport object (anything with a
+        Get(url, params) method returning a response with status_code,
+        reason and content) to make the requests instead of urllib,
+        e.g. to reuse keep-alive connections.
+        """
         self.host = host
         self.port = port
-        self.comm = PWI4HttpCommunicator(host, port)
+        self.comm = PWI4HttpCommunicator(host, port, metrics, transport)
 
     ### High-level methods #################################
 
@@ -164,6 +179,52 @@ class PWI4:
         f.write(contents)
         f.close()
 
+    ### Methods for waiting on the mount ########################
+
+    def wait_for_condition(self, predicate, timeout_seconds=None, min_interval=0.02, max_interval=0.5):
+        """
+        Poll the status until predicate(status) returns True, and return
+        that status. Polls quickly when the mount is close to its target
+        and backs off when it is far away.
+
+        An exception is raised if the condition is not met within
+        timeout_seconds (if given).
+        """
+
+        start_time = time.time()
+
+        while True:
+            status = self.status()
+            if predicate(status):
+                return status
+
+            if timeout_seconds is not None and time.time() - start_time > timeout_seconds:
+                raise Exception("Timed out after %.1f seconds" % timeout_seconds)
+
+            # Wait a quarter of the time it would take to cover the remaining
+            # distance at 5 degrees/sec, within [min_interval, max_interval]
+            dist_arcsec = max(abs(status.mount.axis0.dist_to_target_arcsec),
+                              abs(status.mount.axis1.dist_to_target_arcsec))
+            interval = dist_arcsec / 18000.0 / 4
+            time.sleep(min(max(interval, min_interval), max_interval))
+
+    def wait_for_slew_complete(self, timeout_seconds=None):
+        """
+        Wait until the mount reports that it is no longer slewing.
+        """
+        return self.wait_for_condition(lambda s: not s.mount.is_slewing, timeout_seconds)
+
+    def wait_until_on_target(self, tolerance_arcsec=2, timeout_seconds=None):
+        """
+        Wait until both axes are within tolerance_arcsec of the target.
+        Useful when following a moving target, where the mount never stops slewing.
+        """
+        def on_target(s):
+            return (abs(s.mount.axis0.dist_to_target_arcsec) < tolerance_arcsec and
+                    abs(s.mount.axis1.dist_to_target_arcsec) < tolerance_arcsec)
+
+        return self.wait_for_condition(on_target, timeout_seconds)
+
     ### Methods for testing error handling ######################
 
     def test_command_not_found(self):
@@ -195,7 +256,14 @@ class PWI4:
 
     def request_with_status(self, command, **kwargs):
         response_text = self.request(command, **kwargs)
-        return self.parse_status(response_text)
+
+        if self.comm.metrics is None:
+            return self.parse_status(response_text)
+
+        start = time.time()
+        status = self.parse_status(response_text)
+        self.comm.metrics.Observe(command, "parse", time.time() - start)
+        return status
 
     ### Status parsing utilities ################################
 
@@ -335,12 +403,19 @@ class PWI4HttpCommunicator:
     Manages communication with PWI4 via HTTP.
     """
 
-    def __init__(self, host="localhost", port=8220):
+    def __init__(self, host="localhost", port=8220, metrics=None, transport=None):
         self.host = host
         self.port = port
 
         self.timeout_seconds = 3
 
+        # Optional LD_Metrics to record request counts and latencies in.
+        self.metrics = metrics
+        self.opener = build_opener(TimedHTTPHandler())
+
+        # Optional transport to use instead of the urllib opener.
+        self.transport = transport
+
     def make_url(self, path, **kwargs):
         """
         Utility function that takes a set of keyword=value arguments
@@ -383,36 +458,113 @@ class PWI4HttpCommunicator:
         """
 
         # Construct the URL that we will request
-        url = self.    (path, **kwargs)
+        url = self.make_url(path, **kwargs)
 
         # Open a connection to the server, issue the request, and try to receive the response.
         # The server will return an HTTP Status Code as part of the response.
         # If the status code indicates an error, an HTTPError will be thrown.
+        start_time = time.time()
+        connect_time.seconds = 0.0
+
+        if self.transport is not None:
+            return self.request_with_transport(path, url, start_time)
+
         try:
-            response = urlopen(url, timeout=self.timeout_seconds)
+            response = self.opener.open(url, timeout=self.timeout_seconds)
         except HTTPError as e:
-            if e.code == 404:
-                error_message = "Command not found"
-            elif e.code == 400:
-                error_message = "Bad request"
-            elif e.code == 500:
-                error_message = "Internal server error (possibly a bug in PWI)"
-            else:
-                error_message = str(e)
+            self.record_request(path, start_time, error=True)
 
             try:
                 error_details = e.read()  # Try to read the payload of the response for error information
-                error_message = error_message + ": " + error_details
             except:
-                pass # If that failed, we won't include any further details
-
-            raise Exception(error_message) # TODO: Consider a custom exception here
+                error_details = None # If that failed, we won't include any further details
 
+            raise Exception(self.error_message(e.code, str(e), error_details)) # TODO: Consider a custom exception here
 
         except Exception as e:
             # This will often be a urllib2.URLError to indicate that a connection
             # could not be made to the server, but we'll handle any exception here
+            self.record_request(path, start_time, error=True)
             raise
 
         payload = response.read()
+        self.record_request(path, start_time)
         return payload
+
+    def request_with_transport(self, path, url, start_time):
+        """
+        Same as request(), but through self.transport.
+        """
+
+        # LD_Transport notes connection set up time in LD_Metrics rather
+        # than in connect_time. Drop anything left over from earlier
+        # requests on this thread, then take what this one spent.
+        import LD_Metrics
+        LD_Metrics.Take_Connect_Time()
+
+        try:
+            response = self.transport.Get(url, {})
+        except Exception:
+            LD_Metrics.Take_Connect_Time()
+            self.record_request(path, start_time, error=True)
+            raise
+        connect_time.seconds = LD_Metrics.Take_Connect_Time()
+
+        if response.status_code != 200:
+            self.record_request(path, start_time, error=True)
+            raise Exception(self.error_message(response.status_code, response.reason, response.content))
+
+        self.record_request(path, start_time)
+        return response.content
+
+    def error_message(self, code, description, details):
+        """
+        Describe an HTTP error code from PWI, with any details it sent.
+        """
+
+        if code == 404:
+            error_message = "Command not found"
+        elif code == 400:
+            error_message = "Bad request"
+        elif code == 500:
+            error_message = "Internal server error (possibly a bug in PWI)"
+        else:
+            error_message = description
+
+        if details:
+            error_message = error_message + ": " + details.decode("utf-8", "replace")
+        return error_message
+
+    def record_request(self, path, start_time, error=False):
+        """
+        If collecting metrics, record a request to path which began at
+        start_time, splitting its time into connecting and the rest.
+        """
+
+        if self.metrics is None:
+            return
+
+        elapsed = time.time() - start_time
+        self.metrics.Record_Request(path, error=error)
+        if error:
+            return
+        self.metrics.Observe(path, "connect", connect_time.seconds)
+        self.metrics.Observe(path, "server", elapsed - connect_time.seconds)
+
+
+# How long the last connection opened on this thread took to connect
+connect_time = threading.local()
+
+class TimedHTTPConnection(HTTPConnection):
+    """
+    HTTPConnection that notes how long connect() took, for the metrics.
+    """
+
+    def connect(self):
+        start_time = time.time()
+        HTTPConnection.connect(self)
+        connect_time.seconds = time.time() - start_time
+
+class TimedHTTPHandler(HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(TimedHTTPConnection, req)
@@ -1,5 +1,3 @@
-import time
-
 from pwi4_client import PWI4
 
 
@@ -20,20 +18,17 @@ print("  RA/Dec: %.4f, %.4f" % (s.mount.ra_j2000_hours, s.mount.dec_j2000_degs))
 
 print("Slewing...")
 pwi4.mount_goto_ra_dec_j2000(10, 70)
-while True:
-    s = pwi4.status()
 
+def report_and_check(s):
     print("RA: %.5f hours;  Dec: %.4f degs, Axis0 dist: %.1f arcsec, Axis1 dist: %.1f arcsec" % (
         s.mount.ra_j2000_hours, 
         s.mount.dec_j2000_degs,
         s.mount.axis0.dist_to_target_arcsec,
         s.mount.axis1.dist_to_target_arcsec
     ))
+    return not s.mount.is_slewing
 
-
-    if not s.mount.is_slewing:
-        break
-    time.sleep(0.2)
+pwi4.wait_for_condition(report_and_check)
 
 print("Slew complete. Stopping...")
 pwi4.mount_stop()
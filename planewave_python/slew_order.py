@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+
+"""
+Reorder a list of Alt-Az points (e.g. from pwi4_build_model.create_point_list)
+to cut the total time spent slewing between them.
+
+The route starts with the nearest neighbour tour from the mount's current
+position, then 2-opt (reversing stretches of the route) and Or-opt
+(moving runs of up to three points elsewhere) improve it while they make
+it quicker. The same is done to the original order and the quicker kept.
+The cost of a slew is the time the slower axis takes, each axis speeding
+up, cruising and slowing down at its own rates, with azimuth going the
+short way round.
+
+    from slew_order import SlewModel, optimise_point_order
+    points = optimise_point_order(points, SlewModel(), start=(alt, azm))
+"""
+
+import math
+
+class SlewModel(object):
+    """
+    How long the mount takes to slew between two (alt, azm) points, in
+    seconds. Speeds are degrees/second, accelerations degrees/second^2,
+    and settle_seconds is added to every slew.
+    """
+
+    def __init__(self, alt_speed=10.0, azm_speed=10.0, alt_acceleration=5.0,
+                 azm_acceleration=5.0, settle_seconds=0.5):
+        self.alt_speed = alt_speed
+        self.azm_speed = azm_speed
+        self.alt_acceleration = alt_acceleration
+        self.azm_acceleration = azm_acceleration
+        self.settle_seconds = settle_seconds
+
+    def axis_time(self, distance, speed, acceleration):
+        """
+        Time to move one axis distance degrees from rest to rest.
+        """
+
+        distance = abs(distance)
+        if distance == 0:
+            return 0.0
+
+        # Distance spent speeding up and slowing down to reach full speed
+        ramp_distance = speed * speed / acceleration
+        if distance < ramp_distance:
+            # Never reaches full speed
+            return 2 * math.sqrt(distance / acceleration)
+        return speed / acceleration + distance / speed
+
+    def slew_time(self, from_point, to_point):
+        alt_distance = to_point[0] - from_point[0]
+        # The short way round in azimuth
+        azm_distance = (to_point[1] - from_point[1] + 180) % 360 - 180
+
+        if alt_distance == 0 and azm_distance == 0:
+            return 0.0
+
+        return max(self.axis_time(alt_distance, self.alt_speed, self.alt_acceleration),
+                   self.axis_time(azm_distance, self.azm_speed, self.azm_acceleration)
+                   ) + self.settle_seconds
+
+    def route_time(self, points, start=None):
+        """
+        Total slew time to visit points in order, from start if given.
+        """
+
+        route = list(points)
+        if start is not None:
+            route.insert(0, start)
+        return sum(self.slew_time(route[i], route[i + 1]) for i in range(len(route) - 1))
+
+def order_points(points, model, start=None):
+    """
+    Return points reordered to shorten the total slew time, starting from
+    start (the mount's current position) if given, otherwise from the
+    first point. Never slower than the order they came in.
+    """
+
+    points = list(points)
+    if len(points) < 3 and start is None:
+        return points
+
+    # Position 0 is where the route starts, fixed in place. Without a
+    # start the first point is visited straight away, at no cost, from its
+    # own copy at position 0.
+    nodes = [start if start is not None else points[0]] + points
+    count = len(nodes)
+    cost = [[model.slew_time(a, b) for b in nodes] for a in nodes]
+    first = 1 if start is not None else 2
+
+    # Nearest neighbour tour
+    tour = list(range(first))
+    unvisited = set(range(first, count))
+    while unvisited:
+        last = tour[-1]
+        nearest = min(unvisited, key=lambda node: (cost[last][node], node))
+        tour.append(nearest)
+        unvisited.remove(nearest)
+
+    # Improve that and the original order, and keep the quicker.
+    routes = [_improve(route, cost, first) for route in (tour, list(range(count)))]
+    route = min(routes, key=lambda route: _route_cost(route, cost))
+
+    return [nodes[node] for node in route[1:]]
+
+def _route_cost(route, cost):
+    return sum(cost[route[i]][route[i + 1]] for i in range(len(route) - 1))
+
+def _improve(route, cost, first):
+    """
+    Apply 2-opt and Or-opt moves to route until neither helps. Nodes
+    before position first stay where they are. The route is open ended,
+    so a move at the end only changes one slew.
+    """
+
+    count = len(route)
+
+    def edge(a, b):
+        # Slew from route position a to b, nothing past the end
+        return cost[a][b] if b is not None else 0.0
+
+    improved = True
+    while improved:
+        improved = False
+
+        # 2-opt: reverse route[i:j + 1]
+        for i in range(first, count - 1):
+            for j in range(i + 1, count):
+                after_j = route[j + 1] if j + 1 < count else None
+                before = edge(route[i - 1], route[i]) + edge(route[j], after_j)
+                after = edge(route[i - 1], route[j]) + edge(route[i], after_j)
+                if after < before - 1e-9:
+                    route[i:j + 1] = reversed(route[i:j + 1])
+                    improved = True
+
+        # Or-opt: move a run of up to 3 points elsewhere, either way round
+        for length in (1, 2, 3):
+            i = first
+            while i + length <= count:
+                segment = route[i:i + length]
+                rest = route[:i] + route[i + length:]
+                after_segment = rest[i] if i < len(rest) else None
+                removed = (edge(rest[i - 1], segment[0]) + edge(segment[-1], after_segment)
+                           - edge(rest[i - 1], after_segment))
+
+                best = None
+                for p in range(first, len(rest) + 1):
+                    if p == i:
+                        continue
+                    a = rest[p - 1]
+                    b = rest[p] if p < len(rest) else None
+                    for run in (segment, segment[::-1]):
+                        added = edge(a, run[0]) + edge(run[-1], b) - edge(a, b)
+                        if added < removed - 1e-9 and (best is None or added < best[0]):
+                            best = (added, p, run)
+
+                if best is not None:
+                    _, p, run = best
+                    route[:] = rest[:p] + run + rest[p:]
+                    improved = True
+                i += 1
+
+    return route
+
+def optimise_point_order(points, model=None, start=None):
+    """
+    order_points, printing the predicted slew time before and after.
+    """
+
+    if model is None:
+        model = SlewModel()
+
+    ordered = order_points(points, model, start)
+    before = model.route_time(points, start)
+    after = model.route_time(ordered, start)
+
+    saving = 100.0 * (before - after) / before if before > 0 else 0.0
+    print("Predicted slew time %.1f seconds, %.1f in the original order (%.0f%% saved)" % (
+        after, before, saving))
+    return ordered
+
+if __name__ == "__main__":
+    from pwi4_build_model import create_point_list
+
+    points = create_point_list(3, 20, 80, 6, 5, 355)
+    for (alt, azm) in optimise_point_order(points, start=(45, 0)):
+        print("Altitude %.1f, Azimuth %.1f" % (alt, azm))
@@ -0,0 +1,69 @@
+"""
+Tests of how LD_Command_Queue combines queued /mount/offset requests.
+A wrong merge sends the wrong offset to the mount, so every rule is
+pinned here.
+
+    python -m pytest test_LD_Command_Queue.py
+"""
+
+from LD_Command_Queue import Merge_Offsets
+
+
+def test_Adds_Are_Summed():
+    merged = Merge_Offsets({"axis0_add_arcsec": 1.5}, {"axis0_add_arcsec": 2.25})
+    assert merged == {"axis0_add_arcsec": 3.75}
+
+
+def test_Adds_On_Other_Axes_Stay_Apart():
+    merged = Merge_Offsets({"axis0_add_arcsec": 1}, {"axis1_add_arcsec": -2, "path_add_arcsec": 3})
+    assert merged == {"axis0_add_arcsec": 1, "axis1_add_arcsec": -2, "path_add_arcsec": 3}
+
+
+def test_Later_Rate_Replaces_Earlier():
+    merged = Merge_Offsets({"axis1_set_rate_arcsec_per_sec": 5},
+                           {"axis1_set_rate_arcsec_per_sec": -3})
+    assert merged == {"axis1_set_rate_arcsec_per_sec": -3}
+
+
+def test_Stop_Rate_Replaces_Earlier_Rate():
+    merged = Merge_Offsets({"axis1_set_rate_arcsec_per_sec": 5}, {"axis1_stop_rate": 0})
+    assert merged == {"axis1_stop_rate": 0}
+
+
+def test_Rate_After_Stop_Rate_Replaces_It():
+    merged = Merge_Offsets({"axis0_stop_rate": 0}, {"axis0_set_rate_arcsec_per_sec": 2})
+    assert merged == {"axis0_set_rate_arcsec_per_sec": 2}
+
+
+def test_Rate_And_Add_Are_Kept_Together():
+    merged = Merge_Offsets({"axis0_add_arcsec": 4, "axis0_set_rate_arcsec_per_sec": 1},
+                           {"axis0_add_arcsec": 1, "axis0_set_rate_arcsec_per_sec": 2})
+    assert merged == {"axis0_add_arcsec": 5.0, "axis0_set_rate_arcsec_per_sec": 2}
+
+
+def test_Reset_Discards_Earlier_Actions_On_Its_Axis():
+    merged = Merge_Offsets({"axis0_add_arcsec": 10, "axis0_set_rate_arcsec_per_sec": 1,
+                            "axis1_add_arcsec": 2},
+                           {"axis0_reset": 0})
+    assert merged == {"axis0_reset": 0, "axis1_add_arcsec": 2}
+
+
+def test_Nothing_Merges_After_A_Reset():
+    # PWI4 doesn't say whether it resets before or after adding.
+    assert Merge_Offsets({"axis0_reset": 0}, {"axis0_add_arcsec": 1}) is None
+    assert Merge_Offsets({"axis0_reset": 0}, {"axis0_set_rate_arcsec_per_sec": 1}) is None
+
+
+def test_Reset_With_Another_Action_Is_Not_Merged():
+    assert Merge_Offsets({"axis0_add_arcsec": 1}, {"axis0_reset": 0, "axis0_add_arcsec": 2}) is None
+
+
+def test_Reset_On_Other_Axis_Does_Not_Block():
+    merged = Merge_Offsets({"axis1_reset": 0}, {"axis0_add_arcsec": 1})
+    assert merged == {"axis1_reset": 0, "axis0_add_arcsec": 1}
+
+
+def test_Pending_Is_Not_Changed():
+    pending = {"axis0_add_arcsec": 1}
+    Merge_Offsets(pending, {"axis0_add_arcsec": 2})
+    assert pending == {"axis0_add_arcsec": 1}
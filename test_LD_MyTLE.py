@@ -0,0 +1,80 @@
+"""
+Pins LD_MyTLE's SGP4 to Vallado's verification vectors (tcppver.out
+from "Revisiting Spacetrack Report #3", 2006, WGS72), so a change to
+_SGP4 or TLE_Array._Init can't quietly break propagation.
+
+    python -m pytest test_LD_MyTLE.py
+"""
+
+import numpy as np
+
+import LD_MyTLE
+
+TLE_00005 = """1 00005U 58002B   00179.78495062  .00000023  00000-0  28098-4 0  4753
+2 00005  34.2682 348.7242 1859667 331.7664  19.3264 10.82419157413667"""
+
+TLE_06251 = """1 06251U 62025E   06176.82412014  .00008885  00000-0  12808-3 0  3985
+2 06251  58.0579  54.0425 0030035 139.1568 221.1854 15.56387291  6774"""
+
+# Minutes since epoch, TEME position (km) and velocity (km/s).
+VECTORS_00005 = [
+    (0.0, (7022.46529266, -1400.08296755, 0.03995155),
+     (1.893841015, 6.405893759, 4.534807250)),
+    (360.0, (-7154.03120202, -3783.17682504, -3536.19412294),
+     (4.741887409, -4.151817765, -2.093935425)),
+    (720.0, (-7134.59340119, 6531.68641334, 3260.27186483),
+     (-4.113793027, -2.911922039, -2.557327851)),
+    (1080.0, (5568.53901181, 4492.06992591, 3863.87641983),
+     (-4.209106476, 5.159719888, 2.744852980)),
+    (1440.0, (-938.55923943, -6268.18748831, -4294.02924751),
+     (7.536105209, -0.427127707, 0.989878080)),
+    (4320.0, (-9060.47373569, 4658.70952502, 813.68673153),
+     (-2.232832783, -4.110453490, -3.157345433)),
+    ]
+
+VECTORS_06251 = [
+    (0.0, (3988.31022699, 5498.96657235, 0.90055879),
+     (-3.290032738, 2.357652820, 6.496623475)),
+    (120.0, (-3935.69800083, 409.10980837, 5471.33577327),
+     (-3.374784183, -6.635211043, -1.942056221)),
+    ]
+
+# The vectors are printed to 1e-8 km and 1e-9 km/s.
+POSITION_TOLERANCE = 1e-6
+VELOCITY_TOLERANCE = 1e-8
+
+
+def Check_Vectors(tle, vectors):
+    minutes = np.array([vector[0] for vector in vectors])
+    position, velocity = tle.Propagate(tle.epoch + minutes * 60.0)
+    np.testing.assert_allclose(position, [vector[1] for vector in vectors],
+                               rtol=0, atol=POSITION_TOLERANCE)
+    np.testing.assert_allclose(velocity, [vector[2] for vector in vectors],
+                               rtol=0, atol=VELOCITY_TOLERANCE)
+
+
+def test_00005_Matches_Vallado():
+    # Eccentric (e = 0.186) near earth orbit.
+    Check_Vectors(LD_MyTLE.LD_MyTLE(TLE_00005), VECTORS_00005)
+
+
+def test_06251_Matches_Vallado():
+    # Low orbit with noticeable drag.
+    Check_Vectors(LD_MyTLE.LD_MyTLE(TLE_06251), VECTORS_06251)
+
+
+def test_TLE_Array_Matches_One_At_A_Time():
+    # Both satellites in one array, each with its own row of times.
+    tles = [LD_MyTLE.LD_MyTLE(TLE_00005), LD_MyTLE.LD_MyTLE(TLE_06251)]
+    minutes = np.array([[0.0, 360.0], [0.0, 120.0]])
+    times = np.array([tle.epoch for tle in tles])[:, None] + minutes * 60.0
+
+    position, velocity, errors = LD_MyTLE.TLE_Array(tles).Propagate(times)
+
+    assert not errors.any()
+    expected = [VECTORS_00005[:2], VECTORS_06251[:2]]
+    for row, vectors in enumerate(expected):
+        np.testing.assert_allclose(position[row], [vector[1] for vector in vectors],
+                                   rtol=0, atol=POSITION_TOLERANCE)
+        np.testing.assert_allclose(velocity[row], [vector[2] for vector in vectors],
+                                   rtol=0, atol=VELOCITY_TOLERANCE)